@@ -1,29 +1,104 @@
-from typing import Optional
+from typing import AsyncIterator, Optional, Tuple
 from pydantic import BaseModel
 import uuid
 
 # --- ENTIDADES Y REPOSITORIOS ---
 from app.domain.entities.conversation import Conversation, Message
 from app.domain.repositories.conversation_repository import ConversationRepository
-from app.infrastructure.ai.gemini_client import GeminiClient
+from app.domain.services.history_manager import HistoryManager
+from app.infrastructure.ai.gemini_client import GeminiClient, CHAT_ERROR_MESSAGE
+from app.config.settings import settings
 
 # --- DEFINICIÓN DE CHATRESPONSE (Aquí estaba el error, faltaba esto) ---
 class ChatResponse(BaseModel):
     response: str
     session_id: str
 
+class ConversationAccessError(Exception):
+    """La sesión existe pero es de otro usuario: la ruta debe responder 403."""
+
 class SendMessage:
     def __init__(self, conversation_repository: ConversationRepository, ai_client: GeminiClient):
         self.conversation_repository = conversation_repository
         self.ai_client = ai_client
+        self.history = HistoryManager(
+            ai_client,
+            max_messages=settings.CHAT_HISTORY_MAX_MESSAGES,
+            token_budget=settings.CHAT_HISTORY_TOKEN_BUDGET,
+            summary_batch=settings.CHAT_SUMMARY_BATCH_MESSAGES,
+        )
 
     async def execute(self, message: str, user_id: str, session_id: str = None) -> ChatResponse:
-        
+        conversation, history_context = await self._prepare(message, user_id, session_id)
+
+        # 5. Llamamos a Gemini
+        ai_response_text = await self.ai_client.generate_response(prompt=history_context)
+
+        # 6 y 7. Agregamos la respuesta y GUARDAMOS TODO EN LA BASE DE DATOS
+        # (el mensaje de error de la IA no es una respuesta: no entra al historial)
+        if ai_response_text != CHAT_ERROR_MESSAGE:
+            await self._save_reply(conversation, ai_response_text)
+
+        # 8. Devolvemos la respuesta y el ID (CRÍTICO para el Frontend)
+        return ChatResponse(
+            response=ai_response_text,
+            session_id=conversation.id 
+        )
+
+    async def execute_stream(self, message: str, user_id: str, session_id: str = None) -> Tuple[str, AsyncIterator[str]]:
+        """
+        Versión en streaming: devuelve el session_id y un iterador con los
+        fragmentos de la respuesta. Solo se guarda la respuesta completa,
+        cuando el stream termina.
+        """
+        conversation, history_context = await self._prepare(message, user_id, session_id)
+        return conversation.id, self._stream_and_save(conversation, history_context)
+
+    def stream_reply(self, conversation: Conversation, message: str) -> AsyncIterator[str]:
+        """
+        Turno en streaming sobre una conversación ya abierta (open_conversation),
+        sin volver a leerla: la usa el WebSocket, que la mantiene en la conexión.
+        """
+        conversation.add_message(Message(role="user", content=message))
+        return self._stream_and_save(conversation, self.history.build_context(conversation))
+
+    async def _stream_and_save(self, conversation: Conversation, history_context: str) -> AsyncIterator[str]:
+        # Si el stream falla a mitad, la excepción sale de aquí y no se guarda nada
+        turn_start = len(conversation.messages) - 1
+        saved = False
+        try:
+            chunks = []
+            async for text in self.ai_client.stream_content(history_context):
+                chunks.append(text)
+                yield text
+            reply = "".join(chunks)
+            if reply and reply != CHAT_ERROR_MESSAGE:
+                await self._save_reply(conversation, reply)
+                saved = True
+        finally:
+            if not saved:
+                # El turno sin guardar no queda en la conversación (el WebSocket la reutiliza)
+                del conversation.messages[turn_start:]
+
+    async def _save_reply(self, conversation: Conversation, ai_response_text: str) -> None:
+        bot_msg = Message(role="model", content=ai_response_text)
+        conversation.add_message(bot_msg)
+        # Solo se escriben los dos mensajes del turno (pregunta + respuesta)
+        await self.conversation_repository.append_messages(conversation, conversation.messages[-2:])
+        # Lo que salió de la ventana reciente pasa al resumen (por lotes), fuera de la respuesta;
+        # sin mensajes nuevos, append_messages solo guarda summary y summarized_count
+        self.history.compact_later(conversation, lambda c: self.conversation_repository.append_messages(c, []))
+
+    async def open_conversation(self, user_id: str, session_id: Optional[str], message: str) -> Conversation:
+        """Carga la sesión (solo si es del usuario: si no, ConversationAccessError) o crea una nueva."""
         conversation = None
-        
+
         # 1. Si nos dan un ID, buscamos si ya existe el chat
         if session_id:
             conversation = await self.conversation_repository.get_by_id(session_id)
+            # Seguridad: no se lee ni se escribe en el chat de otro usuario
+            if conversation and conversation.user_id != user_id:
+                raise ConversationAccessError("No tienes permiso para usar este chat")
         
         # 2. Si no existe (o no nos dieron ID), creamos una NUEVA conversación
         if not conversation:
@@ -38,29 +113,17 @@ class SendMessage:
                 user_id=user_id,
                 title=auto_title 
             )
+        return conversation
+
+    async def _prepare(self, message: str, user_id: str, session_id: Optional[str]) -> Tuple[Conversation, str]:
+        conversation = await self.open_conversation(user_id, session_id, message)
 
         # 3. Agregamos el mensaje del usuario a la memoria de la conversación
         user_msg = Message(role="user", content=message)
         conversation.add_message(user_msg)
 
         # 4. Construimos el historial para enviárselo a la IA
-        # (Así la IA recuerda de qué estaban hablando)
-        history_context = ""
-        for msg in conversation.messages:
-            history_context += f"{msg.role}: {msg.content}\n"
-
-        # 5. Llamamos a Gemini
-        ai_response_text = await self.ai_client.generate_response(prompt=history_context)
+        # (Así la IA recuerda de qué estaban hablando): resumen + últimos mensajes
+        history_context = self.history.build_context(conversation)
 
-        # 6. Agregamos la respuesta de la IA a la memoria
-        bot_msg = Message(role="model", content=ai_response_text)
-        conversation.add_message(bot_msg)
-
-        # 7. GUARDAMOS TODO EN LA BASE DE DATOS
-        await self.conversation_repository.save(conversation)
-
-        # 8. Devolvemos la respuesta y el ID (CRÍTICO para el Frontend)
-        return ChatResponse(
-            response=ai_response_text,
-            session_id=conversation.id 
-        )
\ No newline at end of file
+        return conversation, history_context
\ No newline at end of file
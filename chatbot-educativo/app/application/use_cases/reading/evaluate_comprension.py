@@ -1,12 +1,18 @@
+from app.config.settings import settings
+from app.infrastructure.ai import prompt_budget
 from app.infrastructure.ai.gemini_client import GeminiClient
-import json
-import re
+from app.infrastructure.ai.scheduler import LLMOverloadedError
+from app.infrastructure.ai.structured_output import EvaluationResult
 
 class EvaluateComprension:
     def __init__(self, ai_client: GeminiClient):
         self.ai_client = ai_client
 
     async def execute(self, original_text: str, question: str, user_answer: str) -> dict:
+        usage = prompt_budget.track_usage()
+        # Textos largos se recortan en un límite de párrafo (antes se enviaban completos)
+        original_text = prompt_budget.fit("evaluate_comprension", original_text, settings.PROMPT_EVALUATION_TEXT_TOKENS)
+
         # 1. Prompt de Evaluación
         prompt = f"""
         Actúa como un profesor que evalúa comprensión lectora.
@@ -26,19 +32,19 @@ class EvaluateComprension:
         }}
         """
 
-        raw_response = await self.ai_client.generate_response(prompt)
+        # Pregunta/respuesta desproporcionadas: 413 antes de llamar a la IA
+        prompt_budget.check_prompt(prompt)
 
-        # 2. Limpieza Quirúrgica (Igual que en GenerateQuestions)
+        # 2. JSON con esquema (validado con Pydantic, con reintentos de reparación)
         try:
-            start = raw_response.find('{')
-            end = raw_response.rfind('}') + 1
-
-            if start != -1 and end != -1:
-                clean_json = raw_response[start:end]
-                return json.loads(clean_json)
-            else:
-                raise ValueError("No se encontraron llaves JSON")
+            result = await self.ai_client.generate_structured("evaluate_comprension", prompt, EvaluationResult)
+            evaluation = result.model_dump()
+            evaluation["score"] = max(1, min(10, evaluation["score"]))
+            evaluation["budget"] = usage.summary()
+            return evaluation
 
+        except LLMOverloadedError:
+            raise
         except Exception as e:
             print(f"ERROR EVALUACIÓN: {e}")
             return {
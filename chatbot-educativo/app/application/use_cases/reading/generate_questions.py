@@ -1,8 +1,9 @@
 import os
-import json
 import docx  # La librería que acabamos de instalar
 from typing import Dict, Any
 
+from app.infrastructure.ai.structured_output import GeneratedExam
+
 class GenerateQuestions:
     def __init__(self, ai_client, quiz_repo):
         self.ai_client = ai_client
@@ -40,8 +41,6 @@ class GenerateQuestions:
         """
 
         try:
-            response_text = ""
-            
             # --- LÓGICA DE SELECCIÓN DE TIPO ---
             
             # CASO 1: ARCHIVOS WORD (.docx)
@@ -52,8 +51,8 @@ class GenerateQuestions:
                 # Combinamos instrucciones + contenido del Word
                 full_prompt = f"{base_instructions}\n\nCONTENIDO DEL DOCUMENTO:\n{doc_text}"
                 
-                # Enviamos solo texto a Gemini
-                response_text = await self.ai_client.generate_response(prompt=full_prompt)
+                # Enviamos solo texto a Gemini (respuesta validada contra el esquema)
+                exam = await self.ai_client.generate_structured("generate_questions", full_prompt, GeneratedExam)
 
             # CASO 2: PDF O IMÁGENES (.pdf, .jpg, .png)
             else:
@@ -67,14 +66,16 @@ class GenerateQuestions:
                     mime_type = "image/png"
 
                 # Enviamos instrucciones + archivo adjunto a Gemini
-                response_text = await self.ai_client.generate_response(
-                    prompt=base_instructions, 
-                    image_bytes=file_bytes, 
+                exam = await self.ai_client.generate_structured(
+                    "generate_questions",
+                    base_instructions,
+                    GeneratedExam,
+                    image_bytes=file_bytes,
                     mime_type=mime_type
                 )
 
-            # --- LIMPIEZA Y RETORNO (Igual que antes) ---
-            return self._clean_and_parse_json(response_text)
+            # --- RETORNO (ya validado por Pydantic) ---
+            return exam.model_dump()
 
         except Exception as e:
             print(f"Error procesando archivo: {e}")
@@ -89,19 +90,4 @@ class GenerateQuestions:
         for para in doc.paragraphs:
             if para.text.strip(): # Solo párrafos con texto
                 full_text.append(para.text)
-        return "\n".join(full_text)
-
-    def _clean_and_parse_json(self, raw_text: str) -> Dict[str, Any]:
-        """Limpia la respuesta de la IA y la convierte a Diccionario."""
-        clean_text = raw_text.strip()
-        
-        # Quitamos bloques de código Markdown
-        if clean_text.startswith("```json"):
-            clean_text = clean_text[7:]
-        elif clean_text.startswith("```"):
-            clean_text = clean_text[3:]
-        
-        if clean_text.endswith("```"):
-            clean_text = clean_text[:-3]
-
-        return json.loads(clean_text.strip())
\ No newline at end of file
+        return "\n".join(full_text)
\ No newline at end of file
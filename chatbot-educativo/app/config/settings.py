@@ -10,4 +10,120 @@ class Settings:
     JWT_SECRET_KEY: str = os.getenv("JWT_SECRET_KEY")
     GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY")
 
+    # --- CACHÉ DE EXÁMENES (memoria + Mongo) ---
+    QUIZ_CACHE_MAX_ENTRIES: int = int(os.getenv("QUIZ_CACHE_MAX_ENTRIES", "256"))
+    QUIZ_CACHE_TTL_SECONDS: int = int(os.getenv("QUIZ_CACHE_TTL_SECONDS", "86400"))
+
+    # --- PLANIFICADOR DE LLAMADAS A LA IA ---
+    LLM_MAX_IN_FLIGHT: int = int(os.getenv("LLM_MAX_IN_FLIGHT", "8"))
+    LLM_REQUESTS_PER_MINUTE: int = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "60"))
+    LLM_MAX_QUEUE: int = int(os.getenv("LLM_MAX_QUEUE", "100"))
+    LLM_MAX_QUEUE_WAIT_SECONDS: float = float(os.getenv("LLM_MAX_QUEUE_WAIT_SECONDS", "30"))
+
+    # Reintentos para reparar un JSON inválido de la IA antes de descartarlo
+    LLM_JSON_REPAIR_ATTEMPTS: int = int(os.getenv("LLM_JSON_REPAIR_ATTEMPTS", "2"))
+
+    # --- EXÁMENES DE DOCUMENTOS LARGOS (map-reduce por secciones) ---
+    QUIZ_SINGLE_CALL_MAX_CHARS: int = int(os.getenv("QUIZ_SINGLE_CALL_MAX_CHARS", "20000"))
+    QUIZ_SECTION_CHARS: int = int(os.getenv("QUIZ_SECTION_CHARS", "12000"))
+    QUIZ_MAX_SECTIONS: int = int(os.getenv("QUIZ_MAX_SECTIONS", "12"))
+    QUIZ_SECTION_CONCURRENCY: int = int(os.getenv("QUIZ_SECTION_CONCURRENCY", "4"))
+
+    # --- PROVEEDOR DE IA: "gemini" (real) o "fake" (local, sin red, para benchmarks) ---
+    LLM_PROVIDER: str = os.getenv("LLM_PROVIDER", "gemini")
+    FAKE_LLM_LATENCY_MS: float = float(os.getenv("FAKE_LLM_LATENCY_MS", "800"))
+    FAKE_LLM_LATENCY_SIGMA: float = float(os.getenv("FAKE_LLM_LATENCY_SIGMA", "0.5"))
+    FAKE_LLM_STREAM_CHUNK_MS: float = float(os.getenv("FAKE_LLM_STREAM_CHUNK_MS", "30"))
+
+    # --- BANCO DE FEEDBACK FINAL (se rellena con la IA en segundo plano) ---
+    FEEDBACK_BANK_REFRESH_SECONDS: int = int(os.getenv("FEEDBACK_BANK_REFRESH_SECONDS", "21600"))
+    FEEDBACK_BANK_VARIANTS_PER_REFILL: int = int(os.getenv("FEEDBACK_BANK_VARIANTS_PER_REFILL", "3"))
+    FEEDBACK_BANK_MAX_VARIANTS: int = int(os.getenv("FEEDBACK_BANK_MAX_VARIANTS", "20"))
+
+    # --- HISTORIAL DEL CHAT (ventana reciente + resumen acumulado) ---
+    CHAT_HISTORY_MAX_MESSAGES: int = int(os.getenv("CHAT_HISTORY_MAX_MESSAGES", "12"))
+    CHAT_HISTORY_TOKEN_BUDGET: int = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "3000"))
+    CHAT_SUMMARY_BATCH_MESSAGES: int = int(os.getenv("CHAT_SUMMARY_BATCH_MESSAGES", "6"))
+
+    # Mensajes por documento en conversation_messages (0 = todo dentro de la conversación)
+    CHAT_MESSAGE_BUCKET_SIZE: int = int(os.getenv("CHAT_MESSAGE_BUCKET_SIZE", "0"))
+
+    # Sesiones por página en /api/chat/history (sin 'limit' explícito)
+    CHAT_HISTORY_PAGE_SIZE: int = int(os.getenv("CHAT_HISTORY_PAGE_SIZE", "50"))
+    CHAT_HISTORY_MAX_PAGE_SIZE: int = int(os.getenv("CHAT_HISTORY_MAX_PAGE_SIZE", "200"))
+
+    # --- SESIONES DE CHAT ACTIVAS EN MEMORIA (0 entradas = desactivado) ---
+    CHAT_SESSION_CACHE_MAX_ENTRIES: int = int(os.getenv("CHAT_SESSION_CACHE_MAX_ENTRIES", "500"))
+    CHAT_SESSION_IDLE_SECONDS: float = float(os.getenv("CHAT_SESSION_IDLE_SECONDS", "600"))
+    CHAT_FLUSH_INTERVAL_MS: float = float(os.getenv("CHAT_FLUSH_INTERVAL_MS", "500"))
+    CHAT_FLUSH_BATCH: int = int(os.getenv("CHAT_FLUSH_BATCH", "100"))
+    # La caché es por proceso: con varios workers de uvicorn (WEB_CONCURRENCY > 1) otro proceso
+    # puede haber agregado turnos, así que cada acierto se contrasta con Mongo (message_count y
+    # summarized_count, sin traer mensajes). Con un solo worker la caché es la fuente de verdad.
+    WEB_CONCURRENCY: int = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+    # --- TUTOR: PASAJES RELEVANTES DE LA LECCIÓN (BM25) ---
+    TUTOR_PASSAGE_CHARS: int = int(os.getenv("TUTOR_PASSAGE_CHARS", "800"))
+    TUTOR_TOP_K: int = int(os.getenv("TUTOR_TOP_K", "4"))
+    TUTOR_CONTEXT_MAX_CHARS: int = int(os.getenv("TUTOR_CONTEXT_MAX_CHARS", "4000"))
+    TUTOR_INDEX_MAX_LESSONS: int = int(os.getenv("TUTOR_INDEX_MAX_LESSONS", "256"))
+
+    # Caché de respuestas del tutor: similitud mínima (0-1) entre preguntas normalizadas
+    TUTOR_ANSWER_SIMILARITY: float = float(os.getenv("TUTOR_ANSWER_SIMILARITY", "0.75"))
+    TUTOR_ANSWERS_PER_LESSON: int = int(os.getenv("TUTOR_ANSWERS_PER_LESSON", "200"))
+
+    # --- MÉTRICAS (/metrics en formato Prometheus) ---
+    # Precio por 1000 tokens (USD) para estimar el costo; por defecto, gemini-2.5-flash
+    LLM_COST_PER_1K_INPUT: float = float(os.getenv("LLM_COST_PER_1K_INPUT", "0.0003"))
+    LLM_COST_PER_1K_OUTPUT: float = float(os.getenv("LLM_COST_PER_1K_OUTPUT", "0.0025"))
+    # Si se define, /metrics exige "Authorization: Bearer <METRICS_TOKEN>"
+    METRICS_TOKEN: str = os.getenv("METRICS_TOKEN", "")
+
+    # --- PRESUPUESTO DE PROMPTS (tokens estimados, ~4 caracteres por token) ---
+    # Por encima de estos topes se responde 413/422 sin llamar a la IA
+    PROMPT_MAX_INPUT_TOKENS: int = int(os.getenv("PROMPT_MAX_INPUT_TOKENS", "100000"))
+    PROMPT_DOCUMENT_MAX_TOKENS: int = int(os.getenv("PROMPT_DOCUMENT_MAX_TOKENS", "150000"))
+    PROMPT_TOPIC_TOKENS: int = int(os.getenv("PROMPT_TOPIC_TOKENS", "200"))
+    PROMPT_TUTOR_QUESTION_TOKENS: int = int(os.getenv("PROMPT_TUTOR_QUESTION_TOKENS", "500"))
+    LLM_MAX_OUTPUT_TOKENS: int = int(os.getenv("LLM_MAX_OUTPUT_TOKENS", "8192"))
+    QUIZ_TOKENS_PER_QUESTION: int = int(os.getenv("QUIZ_TOKENS_PER_QUESTION", "180"))
+    # Textos que se recortan (en un límite de párrafo) para que quepan
+    PROMPT_EVALUATION_TEXT_TOKENS: int = int(os.getenv("PROMPT_EVALUATION_TEXT_TOKENS", "6000"))
+    PROMPT_SUMMARY_TRANSCRIPT_TOKENS: int = int(os.getenv("PROMPT_SUMMARY_TRANSCRIPT_TOKENS", "4000"))
+    PROMPT_REPAIR_TOKENS: int = int(os.getenv("PROMPT_REPAIR_TOKENS", "5000"))
+
+    # --- EXTRACCIÓN DE PDF/DOCX EN PROCESOS APARTE (0 workers = en un hilo) ---
+    EXTRACTION_WORKERS: int = int(os.getenv("EXTRACTION_WORKERS", "2"))
+    EXTRACTION_TIMEOUT_SECONDS: float = float(os.getenv("EXTRACTION_TIMEOUT_SECONDS", "60"))
+    # Los PDF se leen por bloques de páginas en paralelo; las páginas después de PDF_MAX_PAGES se ignoran
+    PDF_PAGES_PER_CHUNK: int = int(os.getenv("PDF_PAGES_PER_CHUNK", "20"))
+    PDF_MAX_PAGES: int = int(os.getenv("PDF_MAX_PAGES", "300"))
+    # Límites por formato (el formato se detecta por los primeros bytes del archivo, no por la extensión)
+    PDF_MAX_MB: float = float(os.getenv("PDF_MAX_MB", "50"))
+    DOCX_MAX_MB: float = float(os.getenv("DOCX_MAX_MB", "20"))
+    DOCX_TIMEOUT_SECONDS: float = float(os.getenv("DOCX_TIMEOUT_SECONDS", "30"))
+    TXT_MAX_MB: float = float(os.getenv("TXT_MAX_MB", "5"))
+    TXT_TIMEOUT_SECONDS: float = float(os.getenv("TXT_TIMEOUT_SECONDS", "10"))
+    IMAGE_MAX_MB: float = float(os.getenv("IMAGE_MAX_MB", "10"))
+    # Texto ya extraído por SHA-256 del archivo (un mismo PDF subido otra vez no se vuelve a leer)
+    EXTRACTION_CACHE_TTL_SECONDS: int = int(os.getenv("EXTRACTION_CACHE_TTL_SECONDS", "2592000"))
+
+    # --- IMÁGENES ANTES DE MANDARLAS A LA IA (orientación EXIF, tamaño, gris, recompresión) ---
+    IMAGE_MAX_DIMENSION: int = int(os.getenv("IMAGE_MAX_DIMENSION", "1600"))  # 0 = sin redimensionar
+    IMAGE_JPEG_QUALITY: int = int(os.getenv("IMAGE_JPEG_QUALITY", "80"))
+    # Por debajo de esta saturación media (0-1) la imagen es una hoja con texto: se manda en gris (0 = nunca)
+    IMAGE_GRAYSCALE_MAX_SATURATION: float = float(os.getenv("IMAGE_GRAYSCALE_MAX_SATURATION", "0.15"))
+
+    # --- TRABAJOS EN SEGUNDO PLANO (?async=true en /upload, /analyze-text, /create-lesson) ---
+    # 0 = desactivado: ?async=true responde 503 (no hay quien ejecute los trabajos)
+    JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", "2"))
+    JOB_MAX_QUEUED: int = int(os.getenv("JOB_MAX_QUEUED", "100"))
+    JOB_MAX_ATTEMPTS: int = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+    JOB_RETENTION_HOURS: int = int(os.getenv("JOB_RETENTION_HOURS", "24"))
+    JOB_UPLOAD_DIR: str = os.getenv("JOB_UPLOAD_DIR", "uploads/jobs")
+    # Un trabajo 'running' es de su worker mientras este renueve el lease; vencido, otro proceso lo retoma
+    JOB_LEASE_SECONDS: int = int(os.getenv("JOB_LEASE_SECONDS", "60"))
+    # Cada cuánto el SSE de un trabajo vuelve a leer Mongo si no hubo avisos en este proceso
+    JOB_EVENTS_POLL_SECONDS: float = float(os.getenv("JOB_EVENTS_POLL_SECONDS", "2"))
+
 settings = Settings()
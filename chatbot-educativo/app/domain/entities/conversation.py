@@ -15,6 +15,9 @@ class Conversation(BaseModel):
     user_id: str
     title: Optional[str] = None
     messages: List[Message] = []
+    # Memoria larga: resumen de los mensajes antiguos (messages[:summarized_count])
+    summary: Optional[str] = None
+    summarized_count: int = 0
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -1,6 +1,6 @@
 from abc import ABC, abstractmethod
-from typing import List, Optional
-from app.domain.entities.conversation import Conversation
+from typing import List, Optional, Tuple
+from app.domain.entities.conversation import Conversation, Message
 
 class ConversationRepository(ABC):
     
@@ -8,11 +8,28 @@ class ConversationRepository(ABC):
     async def save(self, conversation: Conversation) -> None:
         pass
 
+    async def append_messages(self, conversation: Conversation, new_messages: List[Message]) -> None:
+        # Por defecto se guarda la conversación completa; Mongo lo sobreescribe con $push
+        await self.save(conversation)
+
+    async def append_many(self, batch: List[Tuple[Conversation, List[Message]]]) -> None:
+        for conversation, new_messages in batch:
+            await self.append_messages(conversation, new_messages)
+
     @abstractmethod
     async def get_by_id(self, id: str) -> Optional[Conversation]:
         pass
 
+    async def get_counts(self, id: str) -> Optional[Tuple[int, int]]:
+        # (message_count, summarized_count) guardados; Mongo lo sobreescribe sin traer los mensajes
+        conversation = await self.get_by_id(id)
+        return (len(conversation.messages), conversation.summarized_count) if conversation else None
+
     # Esta es la nueva función que agregamos
     @abstractmethod
     async def get_all_by_user(self, user_id: str) -> List[Conversation]:
-        pass
\ No newline at end of file
+        pass
+
+    @abstractmethod
+    async def list_summaries(self, user_id: str, limit: int = 50, cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+        pass
@@ -0,0 +1,94 @@
+import asyncio
+from typing import Awaitable, Callable, List
+
+from app.domain.entities.conversation import Conversation, Message
+from app.utils.text_chunking import estimate_tokens
+
+
+def format_messages(messages: List[Message]) -> str:
+    return "".join(f"{msg.role}: {msg.content}\n" for msg in messages)
+
+
+# Compactaciones en curso (referencia fuerte: asyncio solo guarda referencias débiles a las tareas)
+_compactions = set()
+
+
+class HistoryManager:
+    """
+    Decide qué parte del historial se envía a la IA en cada turno:
+    - El resumen (conversation.summary) y todos los mensajes aún no resumidos,
+      tal cual, de más nuevo a más viejo sin pasar de `token_budget`.
+    - Lo que queda fuera de los últimos `max_messages` se pliega en el resumen
+      por lotes (solo se envían a resumir los mensajes nuevos), después de
+      responder: no retrasa la respuesta.
+    Así el tamaño del prompt no crece con la duración de la sesión.
+    """
+
+    def __init__(self, ai_client, max_messages: int = 12, token_budget: int = 3000, summary_batch: int = 6):
+        self.ai_client = ai_client
+        self.max_messages = max(2, max_messages)
+        self.token_budget = token_budget
+        self.summary_batch = max(1, summary_batch)
+
+    def _fit_budget(self, messages: List[Message]) -> List[Message]:
+        window = []
+        used = 0
+        # De más nuevo a más viejo; el último mensaje siempre entra
+        for msg in reversed(messages):
+            cost = estimate_tokens(msg.content)
+            if window and used + cost > self.token_budget:
+                break
+            window.append(msg)
+            used += cost
+        window.reverse()
+        return window
+
+    def recent_messages(self, conversation: Conversation) -> List[Message]:
+        """Ventana que se conserva tal cual: lo anterior a ella se pliega en el resumen."""
+        pending = conversation.messages[conversation.summarized_count:]
+        return self._fit_budget(pending[-self.max_messages:])
+
+    def build_context(self, conversation: Conversation) -> str:
+        context = ""
+        if conversation.summary:
+            context += f"Resumen de la conversación anterior: {conversation.summary}\n"
+        # Todo lo no resumido (también lo que espera a completar un lote): nada queda en un hueco
+        return context + format_messages(self._fit_budget(conversation.messages[conversation.summarized_count:]))
+
+    async def compact(self, conversation: Conversation) -> bool:
+        """
+        Pliega en el resumen los mensajes que ya quedaron fuera de la ventana.
+        Espera a tener `summary_batch` mensajes para no llamar a la IA en cada turno.
+        Devuelve True si el resumen cambió.
+        """
+        window_start = len(conversation.messages) - len(self.recent_messages(conversation))
+        to_fold = conversation.messages[conversation.summarized_count:window_start]
+        if len(to_fold) < self.summary_batch:
+            return False
+
+        try:
+            summary = await self.ai_client.summarize_conversation(conversation.summary, format_messages(to_fold))
+        except Exception as e:
+            # Sin resumen nuevo seguimos con la ventana; se reintenta en el próximo turno
+            print(f"⚠️ No se pudo resumir el historial: {e}")
+            return False
+        if not summary:
+            return False
+
+        conversation.summary = summary
+        conversation.summarized_count = window_start
+        return True
+
+    def compact_later(self, conversation: Conversation, persist: Callable[[Conversation], Awaitable[None]]) -> asyncio.Task:
+        """compact() en segundo plano; si el resumen cambió, persist(conversation) lo guarda. Devuelve la tarea."""
+        async def run():
+            try:
+                if await self.compact(conversation):
+                    await persist(conversation)
+            except Exception as e:
+                print(f"⚠️ No se pudo guardar el resumen del historial: {e}")
+
+        task = asyncio.create_task(run())
+        _compactions.add(task)
+        task.add_done_callback(_compactions.discard)
+        return task
@@ -0,0 +1,189 @@
+import asyncio
+import random
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+# Rangos de nota (score/total). Cada banda tiene sus propias variantes de feedback.
+BUCKETS = [
+    ("bajo", 0.0, 0.4, "acertó menos del 40% de las preguntas"),
+    ("medio", 0.4, 0.7, "acertó entre el 40% y el 70% de las preguntas"),
+    ("alto", 0.7, 0.9, "acertó entre el 70% y el 90% de las preguntas"),
+    ("excelente", 0.9, 1.01, "acertó el 90% o más de las preguntas"),
+]
+
+# Variantes iniciales: el endpoint responde aunque la IA nunca haya rellenado el banco
+SEED_TEMPLATES: Dict[str, List[str]] = {
+    "bajo": [
+        "1. **Evaluación:** ¡Buen intento con \"{topic}\"!\n2. **Análisis:** Obtuviste {score}/{total}; la lectura pide leer entre líneas y eso se entrena.\n3. **Consejo:** Vuelve al texto y subraya la idea principal de cada párrafo antes de responder.",
+        "1. **Evaluación:** Este examen sobre \"{topic}\" fue un reto.\n2. **Análisis:** Con {score}/{total} ya sabes qué partes repasar.\n3. **Consejo:** Lee cada pregunta dos veces y busca la pista exacta en el texto.",
+    ],
+    "medio": [
+        "1. **Evaluación:** ¡Buen esfuerzo en \"{topic}\"!\n2. **Análisis:** Tu {score}/{total} muestra que entiendes lo literal; falta afinar las inferencias.\n3. **Consejo:** Pregúntate \"¿qué quiso decir el autor?\" al final de cada párrafo.",
+        "1. **Evaluación:** ¡Vas por buen camino con \"{topic}\"!\n2. **Análisis:** {score}/{total} es una base sólida para seguir creciendo.\n3. **Consejo:** Relaciona las ideas del texto entre sí antes de elegir una opción.",
+    ],
+    "alto": [
+        "1. **Evaluación:** ¡Muy buen trabajo en \"{topic}\"!\n2. **Análisis:** Con {score}/{total} demuestras buena comprensión y pensamiento crítico.\n3. **Consejo:** Revisa las preguntas falladas: suelen esconder un matiz del texto.",
+        "1. **Evaluación:** ¡Gran resultado sobre \"{topic}\"!\n2. **Análisis:** {score}/{total} indica que lees con atención a los detalles.\n3. **Consejo:** Practica resumiendo el texto en una sola frase.",
+    ],
+    "excelente": [
+        "1. **Evaluación:** ¡Excelente trabajo en \"{topic}\"!\n2. **Análisis:** {score}/{total}: comprendes lo literal, lo inferencial y lo crítico.\n3. **Consejo:** Atrévete con un texto de mayor dificultad.",
+        "1. **Evaluación:** ¡Impecable con \"{topic}\"!\n2. **Análisis:** Tu {score}/{total} refleja una lectura profunda y cuidadosa.\n3. **Consejo:** Explica el texto a un compañero para consolidar lo aprendido.",
+    ],
+}
+
+
+def bucket_for(score: int, total: int) -> str:
+    ratio = score / total if total else 0.0
+    for name, low, high, _ in BUCKETS:
+        if low <= ratio < high:
+            return name
+    return BUCKETS[-1][0] if ratio >= 1 else BUCKETS[0][0]
+
+
+def render(template: str, score: int, total: int, topic: str) -> str:
+    # replace (y no str.format) porque las plantillas generadas pueden traer llaves sueltas
+    return template.replace("{topic}", topic).replace("{score}", str(score)).replace("{total}", str(total))
+
+
+def is_valid_template(template: str) -> bool:
+    return isinstance(template, str) and "{topic}" in template and 40 <= len(template) <= 900
+
+
+# Documento (sin 'bucket') con la hora del último relleno
+REFILL_MARKER_ID = "last_refill"
+
+
+class FeedbackBank:
+    """
+    Banco de variantes de feedback por banda de nota, persistido en Mongo.
+    /feedback-analysis sirve desde memoria (milisegundos); la IA solo se usa
+    en segundo plano para rellenar y renovar el banco. La hora del último relleno
+    se guarda en Mongo: un reinicio (o cada worker de uvicorn) solo vuelve a
+    llamar a la IA si el banco está vacío o pasaron refresh_seconds.
+    """
+
+    def __init__(
+        self,
+        db_provider: Optional[Callable] = None,
+        refresh_seconds: int = 21600,
+        variants_per_refill: int = 3,
+        max_variants: int = 20,
+        collection_name: str = "feedback_bank",
+    ):
+        self.db_provider = db_provider
+        self.refresh_seconds = refresh_seconds
+        self.variants_per_refill = variants_per_refill
+        self.max_variants = max_variants
+        self.collection_name = collection_name
+
+        self.templates: Dict[str, List[str]] = {name: list(SEED_TEMPLATES[name]) for name, *_ in BUCKETS}
+        self._task: Optional[asyncio.Task] = None
+        self.last_refill: Optional[datetime] = None
+        self.served = 0
+        self.refills = 0
+
+    # --- SERVIR ---
+    def get_feedback(self, score: int, total: int, topic: str) -> str:
+        self.served += 1
+        template = random.choice(self.templates[bucket_for(score, total)])
+        return render(template, score, total, topic)
+
+    # --- PERSISTENCIA ---
+    def _collection(self):
+        if self.db_provider is None:
+            return None
+        try:
+            return self.db_provider()[self.collection_name]
+        except Exception as e:
+            print(f"⚠️ Banco de feedback sin Mongo: {e}")
+            return None
+
+    async def load(self):
+        collection = self._collection()
+        if collection is None:
+            return
+        try:
+            empty = False
+            for name, *_ in BUCKETS:
+                cursor = collection.find({"bucket": name}).sort("created_at", -1).limit(self.max_variants)
+                stored = [doc["template"] for doc in await cursor.to_list(self.max_variants)]
+                if stored:
+                    self.templates[name] = stored
+                else:
+                    empty = True
+            marker = await collection.find_one({"_id": REFILL_MARKER_ID})
+            # Una banda sin variantes guardadas cuenta como banco vacío: toca rellenar
+            self.last_refill = None if empty or marker is None else marker["refilled_at"]
+        except Exception as e:
+            print(f"⚠️ Error cargando banco de feedback: {e}")
+
+    def seconds_until_refill(self) -> float:
+        if self.last_refill is None:
+            return 0.0
+        return self.refresh_seconds - (datetime.utcnow() - self.last_refill).total_seconds()
+
+    async def _store(self, bucket: str, new_templates: List[str]):
+        collection = self._collection()
+        if collection is None:
+            return
+        now = datetime.utcnow()
+        await collection.insert_many([{"bucket": bucket, "template": t, "created_at": now} for t in new_templates])
+        # Nos quedamos con las max_variants más recientes
+        old = await collection.find({"bucket": bucket}, {"_id": 1}).sort("created_at", -1).skip(self.max_variants).to_list(None)
+        if old:
+            await collection.delete_many({"_id": {"$in": [doc["_id"] for doc in old]}})
+
+    # --- RELLENO EN SEGUNDO PLANO ---
+    async def refill(self, ai_client):
+        for name, _, _, description in BUCKETS:
+            try:
+                generated = await ai_client.generate_feedback_templates(description, self.variants_per_refill)
+            except Exception as e:
+                print(f"⚠️ No se pudo rellenar el banco de feedback ({name}): {e}")
+                continue
+            valid = [t for t in dict.fromkeys(generated) if is_valid_template(t) and t not in self.templates[name]]
+            if not valid:
+                continue
+            self.templates[name] = (valid + self.templates[name])[: self.max_variants]
+            try:
+                await self._store(name, valid)
+            except Exception as e:
+                print(f"⚠️ Error guardando banco de feedback: {e}")
+        self.refills += 1
+        self.last_refill = datetime.utcnow()
+        collection = self._collection()
+        if collection is not None:
+            try:
+                await collection.update_one({"_id": REFILL_MARKER_ID}, {"$set": {"refilled_at": self.last_refill}}, upsert=True)
+            except Exception as e:
+                print(f"⚠️ Error guardando banco de feedback: {e}")
+
+    async def _run(self, ai_client):
+        while True:
+            # Se relee Mongo en cada vuelta: otro worker pudo rellenar el banco mientras tanto
+            await self.load()
+            wait = self.seconds_until_refill()
+            if wait <= 0:
+                await self.refill(ai_client)
+                wait = self.refresh_seconds
+            await asyncio.sleep(wait)
+
+    def start(self, ai_client):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(ai_client))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "served": self.served,
+            "refills": self.refills,
+            "variants": {name: len(items) for name, items in self.templates.items()},
+        }
@@ -1,52 +1,192 @@
-import os
-import google.generativeai as genai
 from dotenv import load_dotenv
-import json
 import re
+import math
+import asyncio
+import hashlib
+import time
+from typing import AsyncIterator, Optional, Type
+from pydantic import BaseModel
+
+from app.config.settings import settings
+from app.infrastructure.ai.providers import LLMProvider, build_provider
+from app.infrastructure.ai.quiz_cache import QuizCache
+from app.infrastructure.ai.single_flight import SingleFlight
+from app.infrastructure.ai.scheduler import LLMScheduler, LLMOverloadedError
+from app.infrastructure.ai.structured_output import (
+    QuizPayload, LessonWithQuiz, FeedbackTemplates, StructuredOutputError, parse_model, parse_metrics
+)
+from app.infrastructure.ai.feedback_bank import FeedbackBank
+from app.infrastructure.ai import image_preprocessing, llm_metrics, prompt_budget
+from app.infrastructure.ai.image_preprocessing import prepare_image
+from app.infrastructure.database.mongo_connection import get_database
+from app.utils.text_chunking import split_into_sections
 
 load_dotenv()
 
+# Examen de respaldo cuando la IA devuelve un JSON que no se puede interpretar
+FALLBACK_QUIZ = [{
+    "question": "Ocurrió un error al procesar el texto.",
+    "options": ["Reintentar", "Error", "Error", "Error"],
+    "answer": "Reintentar",
+    "explanation": "La IA no pudo estructurar el examen correctamente."
+}]
+
+# Caché compartida por todos los clientes del proceso (memoria + Mongo)
+quiz_cache = QuizCache(
+    db_provider=get_database,
+    max_entries=settings.QUIZ_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.QUIZ_CACHE_TTL_SECONDS,
+)
+
+# Banco de feedback final por banda de nota (ver generate_final_feedback)
+feedback_bank = FeedbackBank(
+    db_provider=get_database,
+    refresh_seconds=settings.FEEDBACK_BANK_REFRESH_SECONDS,
+    variants_per_refill=settings.FEEDBACK_BANK_VARIANTS_PER_REFILL,
+    max_variants=settings.FEEDBACK_BANK_MAX_VARIANTS,
+)
+
+CHAT_ERROR_MESSAGE = "Lo siento, estoy teniendo problemas para conectar con mi cerebro digital. Intenta de nuevo."
+
 class GeminiClient:
-    def __init__(self):
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            print("⚠️ ADVERTENCIA: GEMINI_API_KEY no encontrada")
-        
-        genai.configure(api_key=api_key)
+    """
+    Fachada de IA que usan las rutas y casos de uso. La llamada real la hace
+    un LLMProvider (Gemini o el simulado local, según LLM_PROVIDER).
+    """
+    def __init__(self, provider: Optional[LLMProvider] = None):
+        self.provider = provider or build_provider()
+        self.model_name = self.provider.default_model
+        self.closed = False
 
-        # Usamos gemini-2.5-flash (Tu configuración original)
-        self.model_name = 'gemini-2.5-flash' 
-        
-        try:
-            self.model = genai.GenerativeModel(
-                model_name=self.model_name,
-                system_instruction="Eres EduBot, un profesor experto. Tu objetivo es evaluar y enseñar comprensión lectora con precisión pedagógica."
-            )
-            print(f"✅ IA Conectada: {self.model_name}")
-        except Exception as e:
-            print(f"❌ Error conectando 2.5, usando fallback: {e}")
-            self.model = genai.GenerativeModel('gemini-1.5-flash')
+        # Llamadas idénticas en curso comparten una sola petición a Gemini
+        self.single_flight = SingleFlight()
+        # Límite global de concurrencia + solicitudes por minuto + cola acotada
+        self.scheduler = LLMScheduler(
+            max_in_flight=settings.LLM_MAX_IN_FLIGHT,
+            requests_per_minute=settings.LLM_REQUESTS_PER_MINUTE,
+            max_queue=settings.LLM_MAX_QUEUE,
+            max_wait_seconds=settings.LLM_MAX_QUEUE_WAIT_SECONDS,
+        )
 
-    def _clean_json(self, text: str):
-        """Limpieza robusta."""
-        try:
-            text = text.replace("```json", "").replace("```", "").strip()
-            start = text.find("[")
-            end = text.rfind("]")
-            if start != -1 and end != -1:
-                return json.loads(text[start : end + 1])
-            return json.loads(text)
-        except Exception as e:
-            print(f"⚠️ Error JSON IA: {e}")
-            return [{
-                "question": "Ocurrió un error al procesar el texto.",
-                "options": ["Reintentar", "Error", "Error", "Error"],
-                "answer": "Reintentar",
-                "explanation": "La IA no pudo estructurar el examen correctamente."
-            }]
+    async def aclose(self):
+        """Hook de apagado: cancela llamadas pendientes y cierra el proveedor."""
+        await self.single_flight.cancel_all()
+        await self.provider.aclose()
+        self.closed = True
+        print("🔌 IA desconectada")
+
+    def stats(self) -> dict:
+        return {
+            "provider": self.provider.name,
+            "quiz_cache": quiz_cache.stats(),
+            "feedback_bank": feedback_bank.stats(),
+            "single_flight": self.single_flight.stats(),
+            "scheduler": self.scheduler.stats(),
+            "structured_output": parse_metrics.stats(),
+            "images": image_preprocessing.stats.summary(),
+        }
+
+    def check_capacity(self):
+        """Lanza LLMOverloadedError si la cola de la IA está llena."""
+        self.scheduler.check_capacity()
+
+    # --- PUNTO ÚNICO DE LLAMADA A LA IA ---
+    @staticmethod
+    def _flight_key(method: str, model_name: str, contents, generation_config) -> str:
+        digest = hashlib.sha256()
+        digest.update(f"{method}|{model_name}|{generation_config!r}|".encode("utf-8"))
+        parts = contents if isinstance(contents, list) else [contents]
+        for part in parts:
+            if isinstance(part, dict) and isinstance(part.get("data"), bytes):
+                digest.update(str(part.get("mime_type")).encode("utf-8"))
+                digest.update(part["data"])
+            else:
+                digest.update(str(part).encode("utf-8"))
+            digest.update(b"\x00")
+        return digest.hexdigest()
+
+    async def _generate(self, method: str, contents, generation_config: Optional[dict] = None, model_name: Optional[str] = None) -> str:
+        """
+        Todas las llamadas (no streaming) pasan por aquí. Si ya hay una llamada
+        idéntica en curso (mismo método, prompt y configuración), se espera esa
+        en vez de hacer otra petición.
+        """
+        prompt_budget.check_prompt(contents)
+        prompt_budget.record_call(contents)
+        model_name = model_name or self.model_name
+        key = self._flight_key(method, model_name, contents, generation_config)
+
+        async def call():
+            async with self.scheduler.slot():
+                # Métricas por llamada real (las agrupadas por single-flight cuentan una vez)
+                start = time.perf_counter()
+                prompt_chars = llm_metrics.prompt_size(contents)
+                try:
+                    response = await self.provider.generate(method, contents, generation_config, model_name)
+                except LLMOverloadedError:
+                    llm_metrics.record_call(method, "overloaded", time.perf_counter() - start, prompt_chars)
+                    raise
+                except Exception:
+                    llm_metrics.record_call(method, "error", time.perf_counter() - start, prompt_chars)
+                    raise
+                llm_metrics.record_call(
+                    method, "ok", time.perf_counter() - start, prompt_chars,
+                    len(response.text or ""), response.prompt_tokens, response.output_tokens,
+                )
+                return response.text
+
+        # Las llamadas agrupadas ocupan un solo lugar en el planificador
+        return await self.single_flight.do(key, call)
+
+    # --- SALIDA JSON CON ESQUEMA (Pydantic) ---
+    async def generate_structured(
+        self,
+        method: str,
+        prompt: str,
+        schema: Type[BaseModel],
+        image_bytes: Optional[bytes] = None,
+        mime_type: Optional[str] = None,
+        temperature: Optional[float] = None,
+    ) -> BaseModel:
+        """
+        Pide a Gemini un JSON que cumpla 'schema' (response_schema) y lo valida.
+        Si no valida, en vez de tirar la generación le pedimos que repare su
+        propio JSON (solo texto, sin reenviar la imagen), hasta
+        LLM_JSON_REPAIR_ATTEMPTS veces. Si aún falla: StructuredOutputError.
+        """
+        config = {"response_mime_type": "application/json", "response_schema": schema}
+        if temperature is not None:
+            config["temperature"] = temperature
+        contents = prompt if image_bytes is None else [prompt, {"mime_type": mime_type, "data": image_bytes}]
+        raw_text = await self._generate(method, contents, generation_config=config)
+
+        repair_budget = settings.LLM_JSON_REPAIR_ATTEMPTS
+        for attempt in range(repair_budget + 1):
+            try:
+                result = parse_model(schema, raw_text)
+                parse_metrics.record(method, "repaired" if attempt else "ok")
+                return result
+            except ValueError as e:
+                parse_metrics.record(method, "parse_failures")
+                print(f"⚠️ JSON inválido en {method} (intento {attempt + 1}): {str(e)[:200]}")
+                if attempt == repair_budget:
+                    break
+                repair_prompt = f"""
+                El siguiente JSON no cumple el esquema requerido.
+                ERROR DE VALIDACIÓN: {str(e)[:1000]}
+                Devuelve SOLO el JSON corregido, conservando todo el contenido válido.
+
+                JSON:
+                {prompt_budget.fit(f"{method}:repair", raw_text, settings.PROMPT_REPAIR_TOKENS)}
+                """
+                raw_text = await self._generate(f"{method}:repair", repair_prompt, generation_config=config)
+
+        parse_metrics.record(method, "exhausted")
+        raise StructuredOutputError(f"{method}: la IA no devolvió un JSON válido")
 
     # --- 1. GENERAR LECCIÓN (INTACTO) ---
     async def generate_lesson_content(self, topic: str,difficulty: str = "Medio") -> str:
+        prompt_budget.check_field("El tema", topic, settings.PROMPT_TOPIC_TOKENS)
         prompt = f"""
         Actúa como un docente experto de secundaria.
         Escribe un artículo educativo breve y moderno sobre: "{topic}".
@@ -65,16 +205,56 @@ class GeminiClient:
         Usa formato Markdown limpio.
         """
         try:
-            response = await self.model.generate_content_async(prompt)
-            return response.text
+            return await self._generate("generate_lesson_content", prompt)
+        except LLMOverloadedError:
+            raise
         except Exception as e:
+            llm_metrics.record_outcome("generate_lesson_content", "fallback")
             return f"No se pudo generar el contenido. Error: {e}"
 
     # --- 2. EXAMEN DESDE TEXTO (AGREGADO num_questions) ---
     async def generate_quiz(self, text_content: str, num_questions: int = 5, difficulty: str = "Medio"):
+        quiz, _ = await self.generate_quiz_cached(text_content, num_questions, difficulty)
+        return quiz
+
+    async def generate_quiz_cached(self, text_content: str, num_questions: int = 5, difficulty: str = "Medio"):
+        """
+        Igual que generate_quiz, pero primero consulta la caché por contenido.
+        Devuelve (quiz, "hit" | "miss"). En un acierto no se llama a la IA.
+        Documentos o exámenes que no caben en el presupuesto: PromptBudgetError.
+        """
+        prompt_budget.check_document(text_content, num_questions)
+        key = QuizCache.build_key(text_content, num_questions, difficulty, self.model_name)
+        cached = await quiz_cache.get(key)
+        if cached is not None:
+            return cached, "hit"
+
+        quiz = await self._generate_quiz(text_content, num_questions, difficulty)
+        # Solo guardamos exámenes válidos (ni vacíos ni el de error)
+        if quiz and quiz != FALLBACK_QUIZ:
+            await quiz_cache.set(key, quiz)
+        return quiz, "miss"
+
+    async def _generate_quiz(self, text_content: str, num_questions: int = 5, difficulty: str = "Medio"):
+        # Documentos largos: map-reduce por secciones en vez de truncar el texto
+        if len(text_content) > settings.QUIZ_SINGLE_CALL_MAX_CHARS:
+            return await self._generate_quiz_chunked(text_content, num_questions, difficulty)
+        try:
+            return await self._quiz_from_text("generate_quiz", text_content, num_questions, difficulty)
+        except LLMOverloadedError:
+            raise
+        except StructuredOutputError:
+            llm_metrics.record_outcome("generate_quiz", "fallback")
+            return [dict(q) for q in FALLBACK_QUIZ]
+        except Exception as e:
+            print(f"❌ Error Quiz Texto: {e}")
+            llm_metrics.record_outcome("generate_quiz", "fallback")
+            return []
+
+    async def _quiz_from_text(self, method: str, text_content: str, num_questions: int, difficulty: str, section_note: str = "") -> list:
         # NOTA: Inyectamos {num_questions} pero mantenemos TU prompt original
         prompt = f"""
-        Genera un examen de EXACTAMENTE {num_questions} preguntas basado en este texto.
+        Genera un examen de EXACTAMENTE {num_questions} preguntas basado en este texto.{section_note}
         NIVEL DE DIFICULTAD: {difficulty}
         - Fácil: Preguntas directas y literales. Opciones obvias.
         - Medio: Mezcla de literales e inferenciales.
@@ -91,30 +271,175 @@ class GeminiClient:
         - Ejemplo CORRECTO: "Es correcta porque en el segundo párrafo el autor menciona que los árboles mueren de pie, lo que simboliza resistencia."
         -no se deben de repetir las respuestas, cada pregunta debe ser única y no genérica. todo respectivo al texto 
 
-        FORMATO JSON ARRAY OBLIGATORIO:
-        [
-            {{
-                "question": "¿Pregunta?",
-                "options": ["A) ...", "B) ...", "C) ...", "D) ..."],
-                "answer": "A) ...", 
-                "explanation": "Explicación detallada..."
-            }}
-        ]
+        FORMATO JSON OBLIGATORIO:
+        {{
+            "questions": [
+                {{
+                    "question": "¿Pregunta?",
+                    "options": ["A) ...", "B) ...", "C) ...", "D) ..."],
+                    "answer": "A) ...", 
+                    "explanation": "Explicación detallada..."
+                }}
+            ]
+        }}
+
+        TEXTO: "{text_content}"
+        """
+        payload = await self.generate_structured(method, prompt, QuizPayload, temperature=0.2)
+        return [q.model_dump() for q in payload.questions]
 
-        TEXTO: "{text_content[:20000]}"
+    async def _generate_quiz_chunked(self, text_content: str, num_questions: int, difficulty: str) -> list:
         """
+        MAP: preguntas candidatas por sección, en paralelo (con límite).
+        REDUCE: se eligen exactamente num_questions repartidas entre secciones.
+        Si faltan (secciones fallidas o repetidas) se piden las que faltan en una llamada más.
+        """
+        section_chars = max(settings.QUIZ_SECTION_CHARS, math.ceil(len(text_content) / settings.QUIZ_MAX_SECTIONS))
+        sections = split_into_sections(text_content, section_chars)
+
+        # Si hay más secciones que preguntas, tomamos secciones espaciadas a lo largo del documento
+        if len(sections) > num_questions:
+            step = len(sections) / num_questions
+            sections = [sections[int(i * step)] for i in range(num_questions)]
+
+        # Una candidata extra por sección para poder descartar repetidas
+        per_section = math.ceil(num_questions / len(sections)) + 1
+        limiter = asyncio.Semaphore(settings.QUIZ_SECTION_CONCURRENCY)
+
+        async def map_section(index: int, section: str) -> list:
+            async with limiter:
+                note = f"\n        (Es la sección {index + 1} de {len(sections)} de un documento más largo.)"
+                return await self._quiz_from_text("generate_quiz_section", section, per_section, difficulty, note)
+
+        print(f"📚 Examen por secciones: {len(text_content)} caracteres -> {len(sections)} secciones")
+        results = await asyncio.gather(*[map_section(i, sec) for i, sec in enumerate(sections)], return_exceptions=True)
+
+        candidates = [r for r in results if isinstance(r, list)]
+        errors = [r for r in results if isinstance(r, BaseException)]
+        for error in errors:
+            print(f"⚠️ Sección de examen fallida: {error}")
+
+        quiz = self._merge_section_quizzes(candidates, num_questions)
+        if quiz and len(quiz) < num_questions:
+            # La sección con menos candidatas (o una que falló) es la menos representada
+            counts = [len(r) if isinstance(r, list) else 0 for r in results]
+            quiz = await self._top_up_quiz(quiz, sections[counts.index(min(counts))], num_questions, difficulty)
+        if quiz:
+            return quiz
+        overloaded = next((e for e in errors if isinstance(e, LLMOverloadedError)), None)
+        if overloaded:
+            raise overloaded
+        llm_metrics.record_outcome("generate_quiz_section", "fallback")
+        return [dict(q) for q in FALLBACK_QUIZ]
+
+    async def _top_up_quiz(self, quiz: list, section: str, num_questions: int, difficulty: str) -> list:
+        """Completa el examen hasta num_questions con preguntas nuevas de una sección."""
+        missing = num_questions - len(quiz)
+        asked = "\n".join(f"        - {q['question']}" for q in quiz)
+        note = f"\n        (Es parte de un documento más largo. NO repitas estas preguntas ya hechas:\n{asked})"
         try:
-            response = await self.model.generate_content_async(
-                prompt,
-                generation_config=genai.types.GenerationConfig(temperature=0.2)
-            )
-            return self._clean_json(response.text)
+            # Una de más para poder descartar una repetida
+            extra = await self._quiz_from_text("generate_quiz_topup", section, missing + 1, difficulty, note)
         except Exception as e:
-            print(f"❌ Error Quiz Texto: {e}")
-            return []
+            # Mejor un examen algo más corto que ninguno
+            print(f"⚠️ No se pudo completar el examen ({len(quiz)}/{num_questions}): {e}")
+            llm_metrics.record_outcome("generate_quiz_topup", "fallback")
+            return quiz
+        return self._merge_section_quizzes([quiz + extra], num_questions)
+
+    @staticmethod
+    def _merge_section_quizzes(candidates: list, num_questions: int) -> list:
+        """Round-robin entre secciones (en orden del documento), sin preguntas repetidas."""
+        merged, seen = [], set()
+        for round_index in range(max((len(c) for c in candidates), default=0)):
+            for section_questions in candidates:
+                if len(merged) == num_questions:
+                    return merged
+                if round_index >= len(section_questions):
+                    continue
+                question = section_questions[round_index]
+                fingerprint = re.sub(r"\W+", " ", question["question"].lower()).strip()
+                if fingerprint in seen:
+                    continue
+                seen.add(fingerprint)
+                merged.append(question)
+        return merged
+
+    # --- 2.B LECCIÓN + EXAMEN EN UNA SOLA LLAMADA ---
+    @staticmethod
+    def _is_valid_quiz(quiz, num_questions: int) -> bool:
+        """El examen debe tener exactamente num_questions preguntas completas."""
+        if not isinstance(quiz, list) or len(quiz) != num_questions:
+            return False
+        for q in quiz:
+            if not isinstance(q, dict):
+                return False
+            options = q.get("options")
+            if not q.get("question") or not q.get("answer") or not q.get("explanation"):
+                return False
+            if not isinstance(options, list) or len(options) < 2:
+                return False
+        return True
+
+    async def generate_lesson_with_quiz(self, topic: str, num_questions: int = 5, difficulty: str = "Medio") -> Optional[dict]:
+        """
+        Genera el artículo y su examen en una sola llamada (un objeto JSON).
+        Devuelve {"content": ..., "quiz": [...]} o None si la salida no pasa la
+        validación; en ese caso la ruta usa el camino de dos pasos.
+        """
+        prompt_budget.check_field("El tema", topic, settings.PROMPT_TOPIC_TOKENS)
+        prompt_budget.check_questions(num_questions)
+        prompt = f"""
+        Actúa como un docente experto de secundaria.
+        PARTE 1 - ARTÍCULO: Escribe un artículo educativo breve y moderno sobre: "{topic}".
+        NIVEL DE DIFICULTAD: {difficulty}
+        - Si es "Fácil": Usa lenguaje muy simple, analogías divertidas y párrafos cortos (para niños/principiantes).
+        - Si es "Medio": Tono estándar de secundaria, vocabulario académico moderado.
+        - Si es "Difícil": Tono universitario/técnico, análisis profundo y vocabulario avanzado.
+        Requisitos: vocabulario claro, enfoque actual, estructura (Título atractivo, Introducción,
+        3 Puntos Clave, Conclusión reflexiva), máximo 350 palabras, formato Markdown limpio.
+
+        PARTE 2 - EXAMEN: Genera un examen de EXACTAMENTE {num_questions} preguntas basado SOLO en el artículo de la parte 1.
+        - Preguntas de Nivel Literal, Inferencial y Crítico (distribuidas según la dificultad).
+        - NO USES PREGUNTAS GENÉRICAS. Cada pregunta con opciones únicas, sin repetir respuestas.
+        - "explanation" debe explicar POR QUÉ la opción es correcta citando una pista concreta del artículo.
+
+        FORMATO JSON OBLIGATORIO (un solo objeto):
+        {{
+            "content": "Artículo completo en Markdown",
+            "quiz": [
+                {{
+                    "question": "¿Pregunta?",
+                    "options": ["A) ...", "B) ...", "C) ...", "D) ..."],
+                    "answer": "A) ...",
+                    "explanation": "Explicación detallada..."
+                }}
+            ]
+        }}
+        """
+        try:
+            result = await self.generate_structured("generate_lesson_with_quiz", prompt, LessonWithQuiz, temperature=0.4)
+        except LLMOverloadedError:
+            raise
+        except Exception as e:
+            print(f"⚠️ Lección+Examen combinado inválido: {e}")
+            llm_metrics.record_outcome("generate_lesson_with_quiz", "fallback")
+            return None
+
+        content = result.content
+        quiz = [q.model_dump() for q in result.quiz]
+        if len(content.strip()) < 10 or not self._is_valid_quiz(quiz, num_questions):
+            print("⚠️ Lección+Examen combinado no pasó la validación, usando dos pasos.")
+            llm_metrics.record_outcome("generate_lesson_with_quiz", "fallback")
+            return None
+
+        # Dejamos el examen en la caché, como si se hubiera generado desde el texto
+        await quiz_cache.set(QuizCache.build_key(content, num_questions, difficulty, self.model_name), quiz)
+        return {"content": content, "quiz": quiz}
 
     # --- 3. EXAMEN DESDE IMAGEN (AGREGADO num_questions) ---
     async def generate_quiz_from_image(self, image_bytes: bytes, mime_type: str, num_questions: int = 5,difficulty: str = "Medio"):
+        prompt_budget.check_questions(num_questions)
         prompt = f"""
         Analiza esta imagen educativa. Genera un examen de {num_questions} preguntas.
         NIVEL DE DIFICULTAD: {difficulty}.
@@ -126,55 +451,161 @@ class GeminiClient:
         -Tambien aquí, la explicación NO puede ser genérica. Debe citar elementos específicos de la imagen (colores, formas, datos) o la lógica visual que justifica la respuesta correcta.
         -no se deben de repetir las respuestas, cada pregunta debe ser única y no genérica. Deben ser específicas de la imagen.
 
-        FORMATO JSON ARRAY OBLIGATORIO:
-        [
-            {{
-                "question": "¿Pregunta?",
-                "options": ["A) ...", "B) ...", "C) ...", "D) ..."],
-                "answer": "A) ...",
-                "explanation": "Explicación detallada."
-            }}
-        ]
+        FORMATO JSON OBLIGATORIO:
+        {{
+            "questions": [
+                {{
+                    "question": "¿Pregunta?",
+                    "options": ["A) ...", "B) ...", "C) ...", "D) ..."],
+                    "answer": "A) ...",
+                    "explanation": "Explicación detallada."
+                }}
+            ]
+        }}
         """
+        image_bytes, mime_type = await prepare_image(image_bytes, mime_type)
         try:
-            response = await self.model.generate_content_async([
-                prompt,
-                {"mime_type": mime_type, "data": image_bytes}
-            ])
-            return self._clean_json(response.text)
+            payload = await self.generate_structured(
+                "generate_quiz_from_image", prompt, QuizPayload,
+                image_bytes=image_bytes, mime_type=mime_type
+            )
+            return [q.model_dump() for q in payload.questions]
+        except LLMOverloadedError:
+            raise
+        except StructuredOutputError:
+            llm_metrics.record_outcome("generate_quiz_from_image", "fallback")
+            return [dict(q) for q in FALLBACK_QUIZ]
         except Exception as e:
             print(f"❌ Error Quiz Imagen: {e}")
+            llm_metrics.record_outcome("generate_quiz_from_image", "fallback")
             return []
 
-    # --- 4. FEEDBACK FINAL (INTACTO) ---
+    # --- 4. FEEDBACK FINAL (desde el banco precalculado) ---
     async def generate_final_feedback(self, score: int, total: int, topic: str) -> str:
+        # Solo depende de la nota y el tema: se sirve del banco, sin llamar a la IA
+        try:
+            return feedback_bank.get_feedback(score, total, topic)
+        except Exception:
+            return "¡Sigue practicando! La lectura es clave."
+
+    async def generate_feedback_templates(self, band_description: str, count: int = 3) -> list:
+        """Genera variantes de feedback para una banda de nota (lo usa el relleno del banco)."""
         prompt = f"""
-        Un estudiante obtuvo {score}/{total} en un examen sobre "{topic}".
-        
+        Un estudiante {band_description} de un examen de comprensión lectora.
+
         Actúa como su tutor personal. Tu respuesta será leída directamente por el alumno.
-        Escribe un feedback de 3 partes (usa Markdown):
-        
+        Escribe {count} variantes distintas de un feedback de 3 partes (usa Markdown):
+
         1. **Evaluación:** (Ej: "¡Excelente trabajo!" o "Buen esfuerzo").
         2. **Análisis:** Explica brevemente qué significa su nota (si falló, anímalo a leer entre líneas; si acertó, felicita su pensamiento crítico).
         3. **Consejo:** Un tip rápido para mejorar en la próxima lectura.
-        
-        Extensión: Máximo 80 palabras.
+
+        Son plantillas: escribe literalmente {{topic}} donde va el tema del examen
+        y {{score}}/{{total}} donde va la nota. Extensión: Máximo 80 palabras cada una.
+        Responde en JSON: {{"templates": ["...", "..."]}}
         """
-        try:
-            response = await self.model.generate_content_async(prompt)
-            return response.text
-        except Exception:
-            return "¡Sigue practicando! La lectura es clave."
-        
+        payload = await self.generate_structured("generate_feedback_templates", prompt, FeedbackTemplates, temperature=0.9)
+        return payload.templates
+
     async def generate_content(self, prompt: str) -> str:
         """Genera una respuesta de texto simple para el chat"""
+        # Fuera del try: un prompt que no cabe es un 413, no un fallo de la IA
+        prompt_budget.check_prompt(prompt)
         try:
             # Usamos el modelo para generar contenido (asíncrono)
-            response = await self.model.generate_content_async(prompt)
-            return response.text
+            return await self._generate("generate_content", prompt)
+        except LLMOverloadedError:
+            raise
         except Exception as e:
             print(f"Error en Gemini Chat: {e}")
-            return "Lo siento, estoy teniendo problemas para conectar con mi cerebro digital. Intenta de nuevo."
+            llm_metrics.record_outcome("generate_content", "fallback")
+            return CHAT_ERROR_MESSAGE
+
+    async def generate_response(self, prompt: str, image_bytes: Optional[bytes] = None, mime_type: Optional[str] = None) -> str:
+        """Respuesta de texto (opcionalmente con un archivo adjunto). La usan los casos de uso."""
+        if image_bytes is None:
+            return await self.generate_content(prompt)
+        prompt_budget.check_prompt(prompt)
+        image_bytes, mime_type = await prepare_image(image_bytes, mime_type)
+        try:
+            return await self._generate("generate_response", [
+                prompt,
+                {"mime_type": mime_type, "data": image_bytes}
+            ])
+        except LLMOverloadedError:
+            raise
+        except Exception as e:
+            print(f"Error en Gemini (adjunto): {e}")
+            llm_metrics.record_outcome("generate_response", "fallback")
+            return CHAT_ERROR_MESSAGE
+
+    async def summarize_conversation(self, previous_summary: Optional[str], transcript: str) -> str:
+        """Actualiza el resumen de un chat con mensajes nuevos. Los errores se propagan."""
+        transcript = prompt_budget.fit("summarize_conversation", transcript, settings.PROMPT_SUMMARY_TRANSCRIPT_TOKENS)
+        prompt = f"""
+        Resume una conversación entre un estudiante (user) y su tutor (model).
+
+        RESUMEN HASTA AHORA:
+        {previous_summary or "(vacío)"}
+
+        MENSAJES NUEVOS:
+        {transcript}
+
+        Devuelve el resumen actualizado en español, máximo 150 palabras.
+        Conserva los temas tratados, las dudas del estudiante y lo que ya se le explicó.
+        """
+        return (await self._generate("summarize_conversation", prompt, {"temperature": 0.2})).strip()
+
+    async def stream_content(self, prompt: str) -> AsyncIterator[str]:
+        """
+        Igual que generate_content pero va entregando los fragmentos de texto
+        a medida que Gemini los genera (stream=True).
+        """
+        prompt_budget.check_prompt(prompt)
+        prompt_budget.record_call(prompt)
+        first_chunk = True
+        response_chars = 0
+        start = time.perf_counter()
+        try:
+            # El stream ocupa un lugar del planificador mientras dura
+            async with self.scheduler.slot():
+                start = time.perf_counter()
+                async for text in self.provider.stream("stream_content", prompt):
+                    if first_chunk:
+                        llm_metrics.record_first_token("stream_content", time.perf_counter() - start)
+                    first_chunk = False
+                    response_chars += len(text)
+                    yield text
+        except LLMOverloadedError:
+            llm_metrics.record_call("stream_content", "overloaded", time.perf_counter() - start, len(prompt))
+            raise
+        except Exception as e:
+            print(f"Error en Gemini Stream: {e}")
+            llm_metrics.record_call("stream_content", "error", time.perf_counter() - start, len(prompt), response_chars)
+            # Respuesta cortada a mitad: se propaga para que el cliente reciba 'error' y no se guarde
+            if not first_chunk:
+                raise
+            # Si todavía no se envió nada, el alumno al menos ve el mensaje de error
+            llm_metrics.record_outcome("stream_content", "fallback")
+            yield CHAT_ERROR_MESSAGE
+            return
+        llm_metrics.record_call("stream_content", "ok", time.perf_counter() - start, len(prompt), response_chars)
+
+# --- CLIENTE COMPARTIDO (creado en el lifespan de app/main.py) ---
+_shared_client: Optional[GeminiClient] = None
+
+def init_gemini_client() -> GeminiClient:
+    global _shared_client
+    if _shared_client is None or _shared_client.closed:
+        _shared_client = GeminiClient()
+    return _shared_client
+
+async def close_gemini_client():
+    global _shared_client
+    if _shared_client is not None:
+        await _shared_client.aclose()
+        _shared_client = None
 
-def get_gemini_client():
-    return GeminiClient()
\ No newline at end of file
+def get_gemini_client() -> GeminiClient:
+    # Si el lifespan no corrió (scripts, pruebas), lo creamos al vuelo una sola vez
+    return init_gemini_client()
\ No newline at end of file
@@ -0,0 +1,119 @@
+import asyncio
+import io
+import time
+from typing import Tuple
+
+from app.config.settings import settings
+from app.infrastructure.metrics import registry
+
+try:
+    from PIL import Image, ImageOps, ImageStat
+except ImportError:
+    Image = None
+
+image_bytes = registry.counter(
+    "vision_image_bytes_total", "Bytes de imágenes para la IA antes (in) y después (out) de prepararlas", ("stage",),
+)
+image_preprocess_duration = registry.histogram(
+    "vision_image_preprocess_seconds", "Tiempo de preparar una imagen para la IA", (), (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5),
+)
+
+
+class ImageStats:
+    def __init__(self):
+        self.images = 0
+        self.kept = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.total_seconds = 0.0
+
+    def summary(self) -> dict:
+        return {
+            "images": self.images,
+            "kept_original": self.kept,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "reduction": round(1 - self.bytes_out / self.bytes_in, 4) if self.bytes_in else 0.0,
+            "avg_ms": round(self.total_seconds / self.images * 1000, 1) if self.images else 0.0,
+        }
+
+
+stats = ImageStats()
+
+
+def _is_text_heavy(image) -> bool:
+    """Foto de una hoja: casi sin color (saturación media baja en una miniatura)."""
+    if settings.IMAGE_GRAYSCALE_MAX_SATURATION <= 0:
+        return False
+    # Muestreo sin promediar: una miniatura suavizada mezcla los colores y todo parece gris
+    sample = image.resize((128, 128), Image.NEAREST).convert("RGB")
+    saturation = ImageStat.Stat(sample.convert("HSV").getchannel("S")).mean[0] / 255
+    return saturation <= settings.IMAGE_GRAYSCALE_MAX_SATURATION
+
+
+def preprocess_image(data: bytes, mime_type: str) -> Tuple[bytes, str, str]:
+    """
+    Prepara una imagen para la IA: la endereza según EXIF, la reduce a
+    IMAGE_MAX_DIMENSION, la pasa a gris si es una hoja con texto y la recomprime
+    como JPEG. Devuelve (bytes, mime_type, descripción). Si algo falla, o el
+    resultado no es más pequeño, se devuelve la original.
+    """
+    if Image is None:
+        return data, mime_type, "sin Pillow"
+    try:
+        with Image.open(io.BytesIO(data)) as opened:
+            original_size = opened.size
+            limit = settings.IMAGE_MAX_DIMENSION
+            resized = bool(limit) and max(original_size) > limit
+            if resized:
+                # JPEG: el decodificador ya reduce (1/2, 1/4, 1/8) sin bajar del tamaño final
+                scale = limit / max(original_size)
+                opened.draft("RGB", (int(original_size[0] * scale), int(original_size[1] * scale)))
+            # Fotos del móvil: la orientación viene en EXIF, no en los píxeles
+            rotated = opened.getexif().get(0x0112, 1) != 1
+            image = ImageOps.exif_transpose(opened)
+            if resized:
+                image.thumbnail((limit, limit), Image.LANCZOS)
+
+            if image.mode in ("RGBA", "LA", "P"):
+                # Transparencias sobre fondo blanco (JPEG no tiene canal alfa)
+                image = image.convert("RGBA")
+                background = Image.new("RGB", image.size, "white")
+                background.paste(image, mask=image.getchannel("A"))
+                image = background
+            gray = image.mode == "L" or _is_text_heavy(image)
+            image = image.convert("L" if gray else "RGB")
+
+            out = io.BytesIO()
+            image.save(out, "JPEG", quality=settings.IMAGE_JPEG_QUALITY, optimize=True)
+            result = out.getvalue()
+    except Exception as e:
+        print(f"⚠️ No se pudo preparar la imagen: {e}")
+        return data, mime_type, "original (error)"
+
+    # Una captura pequeña puede crecer al pasar a JPEG: solo la cambiamos si gana algo o si había que girarla/reducirla
+    if len(result) >= len(data) and not (resized or rotated):
+        return data, mime_type, "original"
+    description = f"{original_size[0]}x{original_size[1]} -> {image.size[0]}x{image.size[1]}{', gris' if gray else ''}"
+    return result, "image/jpeg", description
+
+
+async def prepare_image(data: bytes, mime_type: str) -> Tuple[bytes, str]:
+    """preprocess_image en un hilo (Pillow suelta el GIL al decodificar y redimensionar)."""
+    start = time.perf_counter()
+    result, result_mime, description = await asyncio.to_thread(preprocess_image, data, mime_type)
+    elapsed = time.perf_counter() - start
+
+    stats.images += 1
+    stats.kept += result is data
+    stats.bytes_in += len(data)
+    stats.bytes_out += len(result)
+    stats.total_seconds += elapsed
+    image_bytes.inc("in", amount=len(data))
+    image_bytes.inc("out", amount=len(result))
+    image_preprocess_duration.observe(elapsed)
+
+    change = (len(result) / len(data) - 1) * 100 if data else 0.0
+    print(f"🖼️ Imagen para la IA: {len(data) / 1024:.0f} KB -> {len(result) / 1024:.0f} KB ({change:+.0f}%),"
+          f" {description}, {elapsed * 1000:.0f} ms")
+    return result, result_mime
@@ -0,0 +1,70 @@
+import hashlib
+from collections import OrderedDict
+from typing import List
+
+from app.config.settings import settings
+from app.utils.bm25 import BM25Index
+from app.utils.text_chunking import split_into_sections
+
+
+class LessonIndexStore:
+    """
+    Índices BM25 por lección para el tutor. Se indexa por hash del contenido:
+    todas las copias de una lectura asignada (una por alumno) comparten índice.
+    """
+
+    def __init__(self, max_lessons: int = 256, passage_chars: int = 800):
+        self.max_lessons = max_lessons
+        self.passage_chars = passage_chars
+        self._indexes: "OrderedDict[str, BM25Index]" = OrderedDict()
+        self.built = 0
+        self.reused = 0
+
+    @staticmethod
+    def content_key(content: str) -> str:
+        return hashlib.sha256((content or "").encode("utf-8")).hexdigest()
+
+    def get_index(self, content: str) -> BM25Index:
+        key = self.content_key(content)
+        index = self._indexes.get(key)
+        if index is not None:
+            self._indexes.move_to_end(key)
+            self.reused += 1
+            return index
+
+        index = BM25Index(split_into_sections(content, self.passage_chars))
+        self._indexes[key] = index
+        self.built += 1
+        while len(self._indexes) > self.max_lessons:
+            self._indexes.popitem(last=False)
+        return index
+
+    def relevant_passages(self, content: str, question: str, k: int = 4, max_chars: int = 4000) -> List[str]:
+        """
+        Los k pasajes más relevantes para la pregunta, en el orden en que aparecen
+        en la lección y sin pasar de max_chars. Si nada coincide, el inicio de la lección.
+        """
+        index = self.get_index(content)
+        if not index.passages:
+            return []
+        hits = [i for i, _ in index.search(question, k)] or list(range(min(k, len(index.passages))))
+
+        selected = []
+        used = 0
+        for i in hits:  # de más a menos relevante
+            passage = index.passages[i]
+            if selected and used + len(passage) > max_chars:
+                break
+            selected.append(i)
+            used += len(passage)
+        return [index.passages[i][:max_chars] for i in sorted(selected)]
+
+    def stats(self) -> dict:
+        return {"lessons": len(self._indexes), "built": self.built, "reused": self.reused}
+
+
+# Compartido por todas las peticiones del proceso
+lesson_indexes = LessonIndexStore(
+    max_lessons=settings.TUTOR_INDEX_MAX_LESSONS,
+    passage_chars=settings.TUTOR_PASSAGE_CHARS,
+)
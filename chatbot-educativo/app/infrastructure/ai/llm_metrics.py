@@ -0,0 +1,63 @@
+from typing import Optional
+
+from app.config.settings import settings
+from app.infrastructure.metrics import current_route, registry
+
+LATENCY_BUCKETS = (0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120)
+SIZE_BUCKETS = (500, 2000, 8000, 20000, 50000, 100000, 250000)
+
+llm_call_duration = registry.histogram(
+    "llm_call_duration_seconds", "Duración de cada llamada al proveedor de IA",
+    ("method", "route", "outcome"), LATENCY_BUCKETS,
+)
+llm_prompt_chars = registry.histogram(
+    "llm_prompt_chars", "Tamaño del prompt enviado (caracteres)", ("method",), SIZE_BUCKETS,
+)
+llm_response_chars = registry.histogram(
+    "llm_response_chars", "Tamaño de la respuesta recibida (caracteres)", ("method",), SIZE_BUCKETS,
+)
+llm_tokens = registry.counter(
+    "llm_tokens_total", "Tokens según los metadatos de la respuesta", ("method", "route", "kind"),
+)
+llm_cost = registry.counter(
+    "llm_cost_usd_total", "Costo estimado en USD (LLM_COST_PER_1K_*)", ("method", "route"),
+)
+llm_outcomes = registry.counter(
+    "llm_outcomes_total", "Resultado por método: ok, error, overloaded, fallback, parse_error, repaired, exhausted",
+    ("method", "route", "outcome"),
+)
+llm_first_token = registry.histogram(
+    "llm_stream_first_token_seconds", "Tiempo al primer fragmento en streaming", ("method", "route"), LATENCY_BUCKETS,
+)
+
+
+def prompt_size(contents) -> int:
+    parts = contents if isinstance(contents, list) else [contents]
+    return sum(len(p) if isinstance(p, str) else len(p.get("data", b"")) if isinstance(p, dict) else 0 for p in parts)
+
+
+def record_call(method: str, outcome: str, duration: float, prompt_chars: int,
+                response_chars: Optional[int] = None, prompt_tokens: Optional[int] = None,
+                output_tokens: Optional[int] = None):
+    route = current_route.get()
+    llm_call_duration.observe(duration, method, route, outcome)
+    llm_outcomes.inc(method, route, outcome)
+    llm_prompt_chars.observe(prompt_chars, method)
+    if response_chars is not None:
+        llm_response_chars.observe(response_chars, method)
+    if prompt_tokens:
+        llm_tokens.inc(method, route, "prompt", amount=prompt_tokens)
+    if output_tokens:
+        llm_tokens.inc(method, route, "output", amount=output_tokens)
+    cost = (prompt_tokens or 0) / 1000 * settings.LLM_COST_PER_1K_INPUT + (output_tokens or 0) / 1000 * settings.LLM_COST_PER_1K_OUTPUT
+    if cost:
+        llm_cost.inc(method, route, amount=cost)
+
+
+def record_outcome(method: str, outcome: str):
+    """Resultados a nivel de método (fallback, parse_error...), además del de cada llamada."""
+    llm_outcomes.inc(method, current_route.get(), outcome)
+
+
+def record_first_token(method: str, seconds: float):
+    llm_first_token.observe(seconds, method, current_route.get())
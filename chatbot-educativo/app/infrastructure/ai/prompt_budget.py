@@ -0,0 +1,106 @@
+import contextvars
+from typing import List, Optional
+
+from app.config.settings import settings
+from app.utils.text_chunking import estimate_tokens, fit_to_tokens
+
+
+class PromptBudgetError(Exception):
+    """La petición no cabe en el presupuesto: se rechaza (413/422) sin llamar a la IA."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class BudgetUsage:
+    """Tokens estimados de los prompts enviados durante una petición (metadatos de la respuesta)."""
+
+    def __init__(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.truncated: List[str] = []
+
+    def add(self, contents):
+        self.calls += 1
+        self.prompt_tokens += _text_tokens(contents)
+
+    def summary(self) -> dict:
+        return {
+            "calls": self.calls,
+            "prompt_tokens": self.prompt_tokens,
+            "max_prompt_tokens": settings.PROMPT_MAX_INPUT_TOKENS,
+            "truncated": sorted(set(self.truncated)),
+        }
+
+
+# Uso de la petición actual (None fuera de track_usage); las tareas hijas comparten el objeto
+_usage: contextvars.ContextVar = contextvars.ContextVar("prompt_budget_usage", default=None)
+
+
+def track_usage() -> BudgetUsage:
+    usage = BudgetUsage()
+    _usage.set(usage)
+    return usage
+
+
+def _text_tokens(contents) -> int:
+    # Solo cuenta el texto; las imágenes adjuntas tienen su propio límite
+    parts = contents if isinstance(contents, list) else [contents]
+    return sum(estimate_tokens(p) for p in parts if isinstance(p, str))
+
+
+def check_prompt(contents) -> int:
+    """Rechaza (413) prompts por encima de PROMPT_MAX_INPUT_TOKENS."""
+    tokens = _text_tokens(contents)
+    if tokens > settings.PROMPT_MAX_INPUT_TOKENS:
+        raise PromptBudgetError(413, f"El contenido es demasiado largo para la IA (~{tokens} tokens, máximo {settings.PROMPT_MAX_INPUT_TOKENS}).")
+    return tokens
+
+
+def record_call(contents):
+    usage = _usage.get()
+    if usage is not None:
+        usage.add(contents)
+
+
+def fit(method: str, text: str, max_tokens: int) -> str:
+    """Recorta 'text' a max_tokens en un límite de párrafo y lo anota en el uso de la petición."""
+    fitted, truncated = fit_to_tokens(text, max_tokens)
+    if truncated:
+        usage = _usage.get()
+        if usage is not None:
+            usage.truncated.append(method)
+        print(f"✂️ {method}: texto recortado a ~{max_tokens} tokens ({len(text)} -> {len(fitted)} caracteres)")
+    return fitted
+
+
+def check_questions(num_questions: int):
+    """Rechaza (422) exámenes cuya salida no cabe en LLM_MAX_OUTPUT_TOKENS."""
+    if num_questions < 1:
+        raise PromptBudgetError(422, "El examen debe tener al menos 1 pregunta.")
+    max_questions = settings.LLM_MAX_OUTPUT_TOKENS // settings.QUIZ_TOKENS_PER_QUESTION
+    if num_questions > max_questions:
+        raise PromptBudgetError(422, f"Se pueden generar como máximo {max_questions} preguntas por examen.")
+
+
+def check_document(text: str, num_questions: Optional[int] = None):
+    """Documento para examen: tope total (413) y número de preguntas (422)."""
+    if num_questions is not None:
+        check_questions(num_questions)
+    check_document_size(len(text))
+
+
+def check_document_size(chars: int):
+    """Igual que check_document, por número de caracteres (para documentos que se leen por partes)."""
+    tokens = chars // 4 + 1
+    if tokens > settings.PROMPT_DOCUMENT_MAX_TOKENS:
+        raise PromptBudgetError(413, f"El documento es demasiado largo (~{tokens} tokens, máximo {settings.PROMPT_DOCUMENT_MAX_TOKENS}).")
+
+
+def check_field(label: str, text: str, max_tokens: int):
+    """Campos cortos del usuario (tema, pregunta): se rechazan (413) en vez de recortarlos."""
+    tokens = estimate_tokens(text)
+    if tokens > max_tokens:
+        raise PromptBudgetError(413, f"{label} es demasiado largo (~{tokens} tokens, máximo {max_tokens}).")
@@ -0,0 +1,17 @@
+from app.config.settings import settings
+from app.infrastructure.ai.providers.base import LLMProvider, LLMResponse
+
+
+def build_provider(name: str = None) -> LLMProvider:
+    """Elige el backend de IA según LLM_PROVIDER ('gemini' por defecto, 'fake' para pruebas)."""
+    name = (name or settings.LLM_PROVIDER).lower()
+    if name == "fake":
+        from app.infrastructure.ai.providers.fake_provider import FakeProvider
+        print(f"🧪 IA simulada (latencia ~{settings.FAKE_LLM_LATENCY_MS} ms)")
+        return FakeProvider(
+            latency_ms=settings.FAKE_LLM_LATENCY_MS,
+            latency_sigma=settings.FAKE_LLM_LATENCY_SIGMA,
+            stream_chunk_ms=settings.FAKE_LLM_STREAM_CHUNK_MS,
+        )
+    from app.infrastructure.ai.providers.gemini_provider import GeminiProvider
+    return GeminiProvider()
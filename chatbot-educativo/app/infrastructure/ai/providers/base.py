@@ -0,0 +1,34 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
+
+
+@dataclass
+class LLMResponse:
+    text: str
+    prompt_tokens: Optional[int] = None
+    output_tokens: Optional[int] = None
+
+
+class LLMProvider(ABC):
+    """
+    Backend de IA detrás de GeminiClient. GeminiClient se encarga de la caché,
+    el agrupado de llamadas y el planificador; el proveedor solo hace la llamada.
+
+    - contents: un str (prompt) o una lista [prompt, {"mime_type": ..., "data": bytes}].
+    - generation_config: dict con temperature / response_mime_type / response_schema.
+    """
+
+    name: str = "base"
+    default_model: str = ""
+
+    @abstractmethod
+    async def generate(self, method: str, contents, generation_config: Optional[dict] = None, model_name: Optional[str] = None) -> LLMResponse:
+        pass
+
+    @abstractmethod
+    def stream(self, method: str, contents, model_name: Optional[str] = None) -> AsyncIterator[str]:
+        pass
+
+    async def aclose(self) -> None:
+        pass
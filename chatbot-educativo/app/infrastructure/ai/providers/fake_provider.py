@@ -0,0 +1,169 @@
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+from typing import AsyncIterator, List, Optional, Union, get_args, get_origin
+
+from pydantic import BaseModel
+
+from app.infrastructure.ai.providers.base import LLMProvider, LLMResponse
+
+LETTERS = "ABCD"
+LABELS = {
+    "question": "Pregunta",
+    "explanation": "Explicación",
+    "feedback": "Comentario",
+    "correction": "Corrección",
+    "title": "Título",
+}
+
+
+def _prompt_text(contents) -> str:
+    parts = contents if isinstance(contents, list) else [contents]
+    return "\n".join(p for p in parts if isinstance(p, str))
+
+
+class FakeProvider(LLMProvider):
+    """
+    Proveedor local sin red para pruebas de carga y benchmarks.
+    - Respuestas deterministas: el mismo prompt siempre da el mismo resultado.
+    - Si se pide response_schema, devuelve un JSON válido para ese esquema.
+    - Latencia artificial log-normal (mediana latency_ms, dispersión latency_sigma).
+    """
+
+    name = "fake"
+    default_model = "fake-edubot"
+
+    def __init__(self, latency_ms: float = 800, latency_sigma: float = 0.5, stream_chunk_ms: float = 30, seed: int = 0):
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.stream_chunk_ms = stream_chunk_ms
+        self._latency_rng = random.Random(seed)
+
+    # --- LATENCIA ---
+    def _latency_seconds(self) -> float:
+        if self.latency_ms <= 0:
+            return 0.0
+        return self.latency_ms * math.exp(self._latency_rng.gauss(0, self.latency_sigma)) / 1000
+
+    # --- CONTENIDO DETERMINISTA ---
+    @staticmethod
+    def _rng(method: str, prompt: str) -> random.Random:
+        seed = hashlib.sha256(f"{method}|{prompt}".encode("utf-8")).hexdigest()
+        return random.Random(int(seed[:16], 16))
+
+    @staticmethod
+    def _topic(prompt: str) -> str:
+        match = re.search(r'sobre:?\s*"([^"]+)"', prompt)
+        if match:
+            return match.group(1)
+        # Exámenes: usamos las primeras palabras del texto a evaluar
+        match = re.search(r'TEXTO:\s*"\s*([^"\s]+(?:\s+[^"\s]+){0,3})', prompt)
+        if match:
+            return match.group(1)
+        words = re.findall(r"\w+", prompt)
+        return " ".join(words[:4]) or "el tema"
+
+    @staticmethod
+    def _num_items(prompt: str) -> int:
+        match = re.search(r"(\d+)\s+preguntas", prompt)
+        return max(1, int(match.group(1))) if match else 5
+
+    def _article(self, topic: str, rng: random.Random) -> str:
+        points = "\n".join(
+            f"{i}. **Idea clave {i} sobre {topic}:** explicación simulada número {rng.randint(100, 999)}."
+            for i in range(1, 4)
+        )
+        return (
+            f"# {topic.title()}\n\n"
+            f"Este es un artículo simulado sobre {topic} para pruebas de carga.\n\n"
+            f"{points}\n\n"
+            f"**Conclusión:** {topic} es un tema importante (variante {rng.randint(1, 99)})."
+        )
+
+    def _string(self, name: str, rng: random.Random, topic: str, index: int) -> str:
+        if name == "content":
+            return self._article(topic, rng)
+        if name == "templates":
+            return (
+                f"1. **Evaluación:** ¡Buen trabajo con \"{{topic}}\"! ({rng.randint(1, 99)})\n"
+                "2. **Análisis:** Obtuviste {score}/{total}.\n"
+                "3. **Consejo:** Relee los párrafos clave antes de responder."
+            )
+        if name == "options":
+            return f"{LETTERS[index % 4]}) Opción {index + 1} sobre {topic} ({rng.randint(10, 99)})"
+        return f"{LABELS.get(name, name.capitalize())} simulada sobre {topic} #{rng.randint(1000, 9999)}"
+
+    def _value(self, name: str, annotation, rng: random.Random, topic: str, num_items: int, index: int = 0):
+        origin = get_origin(annotation)
+        if origin is Union:
+            options = [a for a in get_args(annotation) if a is not type(None)]
+            return None if name == "correction" and rng.random() < 0.5 else self._value(name, options[0], rng, topic, num_items, index)
+        if origin in (list, List):
+            item_type = get_args(annotation)[0]
+            is_model = isinstance(item_type, type) and issubclass(item_type, BaseModel)
+            count = num_items if is_model else 4
+            return [self._value(name, item_type, rng, topic, num_items, i) for i in range(count)]
+        if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+            return self._build(annotation, rng, topic, num_items)
+        if annotation is int:
+            return rng.randint(1, 10)
+        if annotation is float:
+            return round(rng.random(), 3)
+        if annotation is bool:
+            return rng.random() < 0.5
+        return self._string(name, rng, topic, index)
+
+    def _build(self, schema, rng: random.Random, topic: str, num_items: int) -> dict:
+        values = {
+            name: self._value(name, field.annotation, rng, topic, num_items)
+            for name, field in schema.model_fields.items()
+        }
+        # Coherencia mínima: la respuesta correcta es una de las opciones
+        options = values.get("options")
+        if options:
+            correct = rng.randrange(len(options))
+            if "answer" in values:
+                values["answer"] = options[correct]
+            if "correct_letter" in values:
+                values["correct_letter"] = LETTERS[correct % 4]
+        return values
+
+    def _text(self, method: str, prompt: str, rng: random.Random) -> str:
+        topic = self._topic(prompt)
+        if method == "generate_lesson_content":
+            return self._article(topic, rng)
+        if method == "generate_final_feedback":
+            return (
+                "1. **Evaluación:** ¡Buen esfuerzo!\n"
+                f"2. **Análisis:** Tu resultado sobre \"{topic}\" muestra avances (variante {rng.randint(1, 99)}).\n"
+                "3. **Consejo:** Relee los párrafos clave antes de responder."
+            )
+        if method == "summarize_conversation":
+            return f"Resumen simulado de la conversación (variante {rng.randint(1, 999)})."
+        return f"Respuesta simulada del tutor sobre {topic}. Idea {rng.randint(1, 999)}: revisa la lección con calma."
+
+    # --- API DEL PROVEEDOR ---
+    async def generate(self, method: str, contents, generation_config: Optional[dict] = None, model_name: Optional[str] = None) -> LLMResponse:
+        await asyncio.sleep(self._latency_seconds())
+        prompt = _prompt_text(contents)
+        rng = self._rng(method, prompt)
+        schema = (generation_config or {}).get("response_schema")
+        if schema is not None:
+            text = json.dumps(self._build(schema, rng, self._topic(prompt), self._num_items(prompt)), ensure_ascii=False)
+        else:
+            text = self._text(method, prompt, rng)
+        return LLMResponse(text=text, prompt_tokens=len(prompt) // 4, output_tokens=len(text) // 4)
+
+    async def stream(self, method: str, contents, model_name: Optional[str] = None) -> AsyncIterator[str]:
+        prompt = _prompt_text(contents)
+        text = self._text(method, prompt, self._rng(method, prompt))
+        # La latencia artificial es el tiempo al primer token
+        await asyncio.sleep(self._latency_seconds())
+        words = text.split(" ")
+        for i in range(0, len(words), 3):
+            if i:
+                await asyncio.sleep(self.stream_chunk_ms / 1000)
+            yield " ".join(words[i : i + 3]) + (" " if i + 3 < len(words) else "")
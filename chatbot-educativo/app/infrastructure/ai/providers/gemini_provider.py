@@ -0,0 +1,76 @@
+import os
+from typing import AsyncIterator, Optional
+
+import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+
+from app.infrastructure.ai.providers.base import LLMProvider, LLMResponse
+from app.infrastructure.ai.scheduler import LLMOverloadedError
+
+SYSTEM_INSTRUCTION = "Eres EduBot, un profesor experto. Tu objetivo es evaluar y enseñar comprensión lectora con precisión pedagógica."
+
+
+class GeminiProvider(LLMProvider):
+    name = "gemini"
+
+    def __init__(self, model_name: str = "gemini-2.5-flash"):
+        api_key = os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            print("⚠️ ADVERTENCIA: GEMINI_API_KEY no encontrada")
+
+        genai.configure(api_key=api_key)
+
+        # Modelos "calientes": uno por (nombre, instrucción de sistema)
+        self._models = {}
+
+        # Usamos gemini-2.5-flash (Tu configuración original)
+        self.default_model = model_name
+        try:
+            self.get_model(self.default_model)
+            print(f"✅ IA Conectada: {self.default_model}")
+        except Exception as e:
+            print(f"❌ Error conectando 2.5, usando fallback: {e}")
+            self.default_model = 'gemini-1.5-flash'
+            self.get_model(self.default_model)
+
+    def get_model(self, model_name: Optional[str] = None, system_instruction: Optional[str] = SYSTEM_INSTRUCTION):
+        """Devuelve un GenerativeModel reutilizable (se construye solo la primera vez)."""
+        key = (model_name or self.default_model, system_instruction)
+        model = self._models.get(key)
+        if model is None:
+            model = genai.GenerativeModel(model_name=key[0], system_instruction=system_instruction)
+            self._models[key] = model
+        return model
+
+    async def generate(self, method: str, contents, generation_config: Optional[dict] = None, model_name: Optional[str] = None) -> LLMResponse:
+        model = self.get_model(model_name)
+        try:
+            response = await model.generate_content_async(contents, generation_config=generation_config)
+        except google_exceptions.ResourceExhausted as e:
+            # Cuota del proveedor agotada: que la ruta responda 429, no un texto de relleno
+            raise LLMOverloadedError(60, f"Cuota de Gemini agotada: {e}")
+
+        usage = getattr(response, "usage_metadata", None)
+        return LLMResponse(
+            text=response.text,
+            prompt_tokens=getattr(usage, "prompt_token_count", None),
+            output_tokens=getattr(usage, "candidates_token_count", None),
+        )
+
+    async def stream(self, method: str, contents, model_name: Optional[str] = None) -> AsyncIterator[str]:
+        model = self.get_model(model_name)
+        try:
+            response = await model.generate_content_async(contents, stream=True)
+        except google_exceptions.ResourceExhausted as e:
+            raise LLMOverloadedError(60, f"Cuota de Gemini agotada: {e}")
+        async for chunk in response:
+            try:
+                text = chunk.text
+            except ValueError:
+                # Fragmento sin texto (p. ej. solo metadatos de seguridad)
+                continue
+            if text:
+                yield text
+
+    async def aclose(self) -> None:
+        self._models.clear()
@@ -0,0 +1,151 @@
+import copy
+import hashlib
+import json
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+# Si cambiamos el prompt de generate_quiz, subimos esta versión para que
+# los exámenes viejos dejen de servirse desde la caché.
+QUIZ_PROMPT_VERSION = "v2"
+
+
+class QuizCache:
+    """
+    Caché de dos niveles para exámenes generados por la IA:
+    1. LRU en memoria (por proceso) con límite de tamaño y TTL.
+    2. Colección de Mongo con índice TTL, compartida entre workers y
+       persistente entre reinicios.
+    """
+
+    def __init__(
+        self,
+        db_provider: Optional[Callable] = None,
+        max_entries: int = 256,
+        ttl_seconds: int = 86400,
+        collection_name: str = "quiz_cache",
+    ):
+        self.db_provider = db_provider
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.collection_name = collection_name
+
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._indexes_ready = False
+
+        self.hits_memory = 0
+        self.hits_mongo = 0
+        self.misses = 0
+
+    # --- CLAVE DE CONTENIDO ---
+    @staticmethod
+    def build_key(text: str, num_questions: int, difficulty: str, model_name: str = "") -> str:
+        """SHA-256 del texto normalizado + parámetros de generación."""
+        normalized = unicodedata.normalize("NFC", text or "")
+        normalized = re.sub(r"\s+", " ", normalized).strip()
+        payload = json.dumps(
+            {
+                "v": QUIZ_PROMPT_VERSION,
+                "model": model_name,
+                "n": int(num_questions),
+                "difficulty": (difficulty or "").strip().lower(),
+                "text": normalized,
+            },
+            ensure_ascii=False,
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    # --- NIVEL 2: MONGO ---
+    def _collection(self):
+        if self.db_provider is None:
+            return None
+        try:
+            return self.db_provider()[self.collection_name]
+        except Exception as e:
+            print(f"⚠️ Caché de exámenes sin Mongo: {e}")
+            return None
+
+    async def _ensure_indexes(self, collection):
+        if self._indexes_ready:
+            return
+        # expireAfterSeconds=0 -> Mongo borra el documento al llegar a 'expires_at'
+        await collection.create_index("expires_at", expireAfterSeconds=0)
+        self._indexes_ready = True
+
+    # --- NIVEL 1: MEMORIA ---
+    def _memory_get(self, key: str):
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        expires_at, quiz = entry
+        if expires_at < time.monotonic():
+            del self._memory[key]
+            return None
+        self._memory.move_to_end(key)
+        return quiz
+
+    def _memory_set(self, key: str, quiz: list):
+        self._memory[key] = (time.monotonic() + self.ttl_seconds, quiz)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    # --- API PÚBLICA ---
+    async def get(self, key: str) -> Optional[list]:
+        quiz = self._memory_get(key)
+        if quiz is not None:
+            self.hits_memory += 1
+            # Copia profunda: las rutas modifican las preguntas (barajan opciones)
+            return copy.deepcopy(quiz)
+
+        collection = self._collection()
+        if collection is not None:
+            try:
+                doc = await collection.find_one({"_id": key})
+                if doc and doc.get("expires_at", datetime.utcnow()) > datetime.utcnow():
+                    self._memory_set(key, doc["quiz"])
+                    self.hits_mongo += 1
+                    return copy.deepcopy(doc["quiz"])
+            except Exception as e:
+                print(f"⚠️ Error leyendo caché de exámenes: {e}")
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, quiz: list) -> None:
+        quiz = copy.deepcopy(quiz)
+        self._memory_set(key, quiz)
+
+        collection = self._collection()
+        if collection is None:
+            return
+        try:
+            await self._ensure_indexes(collection)
+            now = datetime.utcnow()
+            await collection.replace_one(
+                {"_id": key},
+                {
+                    "_id": key,
+                    "quiz": quiz,
+                    "created_at": now,
+                    "expires_at": now + timedelta(seconds=self.ttl_seconds),
+                },
+                upsert=True,
+            )
+        except Exception as e:
+            print(f"⚠️ Error guardando caché de exámenes: {e}")
+
+    def stats(self) -> dict:
+        hits = self.hits_memory + self.hits_mongo
+        total = hits + self.misses
+        return {
+            "hits_memory": self.hits_memory,
+            "hits_mongo": self.hits_mongo,
+            "misses": self.misses,
+            "hit_ratio": round(hits / total, 4) if total else 0.0,
+            "entries_memory": len(self._memory),
+        }
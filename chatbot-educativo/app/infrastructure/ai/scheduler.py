@@ -0,0 +1,119 @@
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+
+
+class LLMOverloadedError(Exception):
+    """La IA está saturada: la ruta debe responder 429 con Retry-After."""
+
+    def __init__(self, retry_after: float, reason: str = "Demasiadas solicitudes a la IA"):
+        super().__init__(reason)
+        self.retry_after = max(1, math.ceil(retry_after))
+        self.reason = reason
+
+
+class TokenBucket:
+    """Limita las solicitudes por minuto. Cada llamada consume una ficha."""
+
+    def __init__(self, requests_per_minute: int, burst: int):
+        self.rate = requests_per_minute / 60.0  # fichas por segundo
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def ready(self) -> bool:
+        """¿Hay ficha ahora mismo y nadie esperando delante?"""
+        if self._lock.locked():
+            return False
+        self._refill()
+        return self.tokens >= 1
+
+    async def take(self):
+        # El lock hace que los que esperan ficha salgan en orden de llegada
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class LLMScheduler:
+    """
+    Planificador delante de todas las llamadas a Gemini:
+    - Semáforo con un máximo de llamadas simultáneas.
+    - Token bucket con solicitudes por minuto.
+    - Cola de espera acotada (esperar lugar o esperar ficha): si está llena
+      (o la espera es muy larga), se lanza LLMOverloadedError en vez de degradar la respuesta.
+    """
+
+    def __init__(self, max_in_flight: int = 8, requests_per_minute: int = 60, max_queue: int = 100, max_wait_seconds: float = 30):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_wait_seconds = max_wait_seconds
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self._bucket = TokenBucket(requests_per_minute, burst=max_in_flight)
+
+        self.waiting = 0
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    def retry_after(self) -> float:
+        # Tiempo aproximado para vaciar la cola al ritmo del token bucket
+        return (self.waiting + 1) / self._bucket.rate
+
+    def check_capacity(self):
+        """Rechaza de inmediato si la cola ya está llena (útil antes de abrir un stream)."""
+        if self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise LLMOverloadedError(self.retry_after())
+
+    async def _acquire(self):
+        await self._semaphore.acquire()
+        try:
+            await self._bucket.take()
+        except BaseException:
+            self._semaphore.release()
+            raise
+
+    @asynccontextmanager
+    async def slot(self):
+        if self._semaphore.locked() or not self._bucket.ready():
+            # No hay lugar libre o se acabaron las fichas del minuto: pasamos a la cola de espera (acotada)
+            self.check_capacity()
+        # Con lugar libre también se acota: la ficha puede tardar (otro la tomó entre medias)
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._acquire(), timeout=self.max_wait_seconds)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise LLMOverloadedError(self.retry_after(), "La IA tardó demasiado en atender la solicitud")
+        finally:
+            self.waiting -= 1
+
+        self.admitted += 1
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+        }
@@ -0,0 +1,48 @@
+import asyncio
+from typing import Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    """
+    Agrupa llamadas idénticas que están en curso al mismo tiempo.
+    La primera ejecuta la llamada real; las demás esperan esa misma tarea
+    y reciben su resultado (o su error).
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.executed = 0   # Llamadas reales a la IA
+        self.coalesced = 0  # Llamadas que se ahorraron esperando a otra
+
+    async def do(self, key: str, fn: Callable[[], Awaitable]):
+        task = self._inflight.get(key)
+        if task is None:
+            # La llamada real corre en su propia tarea: si el primer cliente
+            # se desconecta, los demás siguen esperando el resultado.
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+            self.executed += 1
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Marcamos el error como "leído" aunque todos los clientes se hayan ido
+        if not task.cancelled():
+            task.exception()
+
+    async def cancel_all(self):
+        tasks = list(self._inflight.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._inflight),
+        }
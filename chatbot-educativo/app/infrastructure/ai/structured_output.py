@@ -0,0 +1,90 @@
+import json
+from collections import defaultdict
+from typing import List, Optional, Type, TypeVar
+
+from pydantic import BaseModel, ValidationError
+
+from app.infrastructure.ai import llm_metrics
+
+# --- ESQUEMAS DE SALIDA DE LA IA ---
+# Se envían a Gemini como response_schema y luego validan la respuesta.
+
+class QuizQuestion(BaseModel):
+    question: str
+    options: List[str]
+    answer: str
+    explanation: str
+
+class QuizPayload(BaseModel):
+    questions: List[QuizQuestion]
+
+class LessonWithQuiz(BaseModel):
+    content: str
+    quiz: List[QuizQuestion]
+
+class ExamQuestion(BaseModel):
+    question: str
+    options: List[str]
+    correct_letter: str
+
+class GeneratedExam(BaseModel):
+    title: str
+    questions: List[ExamQuestion]
+
+class EvaluationResult(BaseModel):
+    score: int
+    feedback: str
+    correction: Optional[str]  # null si la respuesta es perfecta
+
+class FeedbackTemplates(BaseModel):
+    templates: List[str]  # con los marcadores {topic}, {score} y {total}
+
+
+T = TypeVar("T", bound=BaseModel)
+
+
+class StructuredOutputError(Exception):
+    """La IA no devolvió un JSON válido ni después de los intentos de reparación."""
+
+
+def parse_model(schema: Type[T], raw_text: str) -> T:
+    """
+    Valida la respuesta contra el esquema. Con response_schema casi siempre
+    llega JSON puro, pero toleramos bloques ```json y texto alrededor.
+    """
+    text = (raw_text or "").strip()
+    if text.startswith("```"):
+        text = text.replace("```json", "").replace("```", "").strip()
+    try:
+        return schema.model_validate_json(text)
+    except ValidationError as first_error:
+        start = min([i for i in (text.find("{"), text.find("[")) if i != -1], default=-1)
+        end = max(text.rfind("}"), text.rfind("]"))
+        if start == -1 or end <= start:
+            raise first_error
+        data = json.loads(text[start : end + 1])
+        # Respuestas viejas de exámenes: lista suelta en vez de {"questions": [...]}
+        if isinstance(data, list) and "questions" in schema.model_fields:
+            data = {"questions": data}
+        return schema.model_validate(data)
+
+
+PROMETHEUS_OUTCOMES = {"parse_failures": "parse_error", "repaired": "repaired", "exhausted": "exhausted"}
+
+class ParseMetrics:
+    """Contadores por método: respuestas válidas, fallos de parseo, reparaciones."""
+
+    def __init__(self):
+        self.counters = defaultdict(lambda: {"ok": 0, "parse_failures": 0, "repaired": 0, "exhausted": 0})
+
+    def record(self, method: str, outcome: str):
+        self.counters[method][outcome] += 1
+        if outcome != "ok":
+            # También en /metrics (el "ok" de la llamada ya lo cuenta GeminiClient)
+            llm_metrics.record_outcome(method, PROMETHEUS_OUTCOMES[outcome])
+
+    def stats(self) -> dict:
+        return {method: dict(values) for method, values in self.counters.items()}
+
+
+parse_metrics = ParseMetrics()
@@ -0,0 +1,135 @@
+from collections import OrderedDict
+from typing import FrozenSet, Optional
+
+from app.config.settings import settings
+from app.utils.text_normalization import INTERROGATIVES, NEGATIONS, key_tokens
+
+
+def normalize_question(question: str) -> str:
+    """'¿Qué es la Fotosíntesis?' y 'que es fotosintesis' -> 'que fotosintesi' (se conservan negaciones, interrogativos y números)."""
+    return " ".join(key_tokens(question))
+
+
+def meaning_markers(normalized: str) -> FrozenSet[str]:
+    """Negaciones, interrogativos y números: dos preguntas parecidas que difieren en ellos no son la misma."""
+    return frozenset(w for w in normalized.split() if w.isdigit() or w in NEGATIONS or w in INTERROGATIVES)
+
+
+def char_ngrams(text: str, n: int = 3) -> FrozenSet[str]:
+    padded = f" {text} "
+    if len(padded) <= n:
+        return frozenset([padded])
+    return frozenset(padded[i:i + n] for i in range(len(padded) - n + 1))
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class _LessonAnswers:
+    def __init__(self, label: str):
+        self.label = label
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()  # normalizada -> (ngrams, respuesta)
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+
+
+class TutorAnswerCache:
+    """
+    Respuestas del tutor por lección (clave = hash del contenido de la lección).
+    Dos preguntas son "la misma" si, normalizadas (sin tildes, minúsculas, sin
+    palabras vacías), coinciden exactamente o sus trigramas de caracteres tienen
+    una similitud de Jaccard >= threshold.
+    """
+
+    def __init__(self, threshold: float = 0.75, max_lessons: int = 256, max_answers_per_lesson: int = 200):
+        self.threshold = threshold
+        self.max_lessons = max_lessons
+        self.max_answers_per_lesson = max_answers_per_lesson
+        self._lessons: "OrderedDict[str, _LessonAnswers]" = OrderedDict()
+
+    def _lesson(self, lesson_key: str, label: str) -> _LessonAnswers:
+        lesson = self._lessons.get(lesson_key)
+        if lesson is None:
+            lesson = _LessonAnswers(label)
+            self._lessons[lesson_key] = lesson
+            while len(self._lessons) > self.max_lessons:
+                self._lessons.popitem(last=False)
+        self._lessons.move_to_end(lesson_key)
+        return lesson
+
+    @staticmethod
+    def _cacheable(normalized: str) -> bool:
+        # Preguntas sin contenido ("¿y eso?", "¿no?") dependen del contexto: no se cachean
+        return bool(set(normalized.split()) - meaning_markers(normalized))
+
+    def get(self, lesson_key: str, question: str, label: str = "") -> Optional[str]:
+        normalized = normalize_question(question)
+        if not self._cacheable(normalized):
+            return None
+        lesson = self._lesson(lesson_key, label)
+
+        entry = lesson.entries.get(normalized)
+        if entry is not None:
+            lesson.entries.move_to_end(normalized)
+            lesson.hits += 1
+            return entry[1]
+
+        grams = char_ngrams(normalized)
+        markers = meaning_markers(normalized)
+        best_key, best_score = None, 0.0
+        for key, (other_grams, _) in lesson.entries.items():
+            if meaning_markers(key) != markers:
+                continue
+            score = jaccard(grams, other_grams)
+            if score > best_score:
+                best_key, best_score = key, score
+        if best_key is not None and best_score >= self.threshold:
+            lesson.entries.move_to_end(best_key)
+            lesson.hits += 1
+            lesson.near_hits += 1
+            return lesson.entries[best_key][1]
+
+        lesson.misses += 1
+        return None
+
+    def set(self, lesson_key: str, question: str, answer: str, label: str = ""):
+        normalized = normalize_question(question)
+        if not self._cacheable(normalized) or not answer:
+            return
+        lesson = self._lesson(lesson_key, label)
+        lesson.entries[normalized] = (char_ngrams(normalized), answer)
+        lesson.entries.move_to_end(normalized)
+        while len(lesson.entries) > self.max_answers_per_lesson:
+            lesson.entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        lessons = []
+        for key, lesson in self._lessons.items():
+            total = lesson.hits + lesson.misses
+            lessons.append({
+                "lesson": lesson.label or key[:12],
+                "answers": len(lesson.entries),
+                "hits": lesson.hits,
+                "near_hits": lesson.near_hits,
+                "misses": lesson.misses,
+                "hit_ratio": round(lesson.hits / total, 3) if total else 0.0,
+            })
+        lessons.sort(key=lambda item: item["hits"] + item["misses"], reverse=True)
+        hits = sum(item["hits"] for item in lessons)
+        total = hits + sum(item["misses"] for item in lessons)
+        return {
+            "hit_ratio": round(hits / total, 3) if total else 0.0,
+            "lessons": lessons,
+        }
+
+
+# Compartida por todas las peticiones del proceso
+tutor_answers = TutorAnswerCache(
+    threshold=settings.TUTOR_ANSWER_SIMILARITY,
+    max_lessons=settings.TUTOR_INDEX_MAX_LESSONS,
+    max_answers_per_lesson=settings.TUTOR_ANSWERS_PER_LESSON,
+)
@@ -1,10 +1,36 @@
-from typing import Optional, List
-from app.domain.entities.conversation import Conversation
+import base64
+import json
+from collections import defaultdict
+from datetime import datetime
+from typing import Optional, List, Tuple
+from pymongo import ReturnDocument, UpdateOne
+from app.config.settings import settings
+from app.domain.entities.conversation import Conversation, Message
 from app.domain.repositories.conversation_repository import ConversationRepository
 
+_bucket_indexes_ready = False
+_summary_indexes_ready = False
+
+
+# --- CURSOR DE PAGINACIÓN (opaco para el frontend) ---
+def encode_cursor(updated_at: datetime, conversation_id: str) -> str:
+    raw = json.dumps({"u": updated_at.isoformat(), "i": conversation_id})
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Lanza ValueError si el cursor no es válido."""
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(raw["u"]), raw["i"]
+    except Exception as e:
+        raise ValueError(f"Cursor inválido: {e}")
+
 class MongoConversationRepository(ConversationRepository):
-    def __init__(self, db):
+    def __init__(self, db, bucket_size: Optional[int] = None):
         self.collection = db["conversations"]
+        # Sesiones largas: mensajes repartidos en documentos de 'bucket_size' mensajes
+        self.messages_collection = db["conversation_messages"]
+        self.bucket_size = settings.CHAT_MESSAGE_BUCKET_SIZE if bucket_size is None else bucket_size
 
     # --- 1. FUNCIÓN SAVE (LA QUE FALTABA) ---
     async def save(self, conversation: Conversation) -> None:
@@ -17,6 +43,7 @@ class MongoConversationRepository(ConversationRepository):
         # Eliminamos el campo 'id' duplicado para no confundir a Mongo
         if "id" in conversation_dict:
             del conversation_dict["id"]
+        conversation_dict["message_count"] = len(conversation.messages)
 
         # Guardamos en la BD.
         # replace_one con upsert=True significa: 
@@ -27,12 +54,102 @@ class MongoConversationRepository(ConversationRepository):
             upsert=True
         )
 
+    # --- 1.B GUARDADO INCREMENTAL (solo los mensajes nuevos) ---
+    @staticmethod
+    def _append_update(conversation: Conversation, docs: List[dict]) -> dict:
+        fields = {"summary": conversation.summary, "summarized_count": conversation.summarized_count}
+        if docs:
+            # Sin mensajes (solo resumen nuevo) la sesión no cambia de posición en la barra lateral
+            fields["updated_at"] = conversation.updated_at
+        return {
+            "$set": fields,
+            "$inc": {"message_count": len(docs)},
+            "$setOnInsert": {
+                "user_id": conversation.user_id,
+                "title": conversation.title,
+                "created_at": conversation.created_at,
+            },
+        }
+
+    async def append_messages(self, conversation: Conversation, new_messages: List[Message]) -> None:
+        """
+        Agrega los mensajes nuevos de un turno sin reescribir el documento.
+        $push es atómico: dos turnos simultáneos en la misma sesión no se pisan.
+        """
+        docs = [m.model_dump() for m in new_messages]
+        update = self._append_update(conversation, docs)
+
+        if self.bucket_size <= 0:
+            update["$push"] = {"messages": {"$each": docs}}
+            await self.collection.update_one({"_id": conversation.id}, update, upsert=True)
+            return
+
+        # Con buckets: el contador del documento principal reserva las posiciones
+        updated = await self.collection.find_one_and_update(
+            {"_id": conversation.id}, update, upsert=True,
+            projection={"message_count": 1}, return_document=ReturnDocument.AFTER,
+        )
+        start = updated["message_count"] - len(docs)
+        await self._push_to_buckets(conversation.id, start, docs)
+
+    async def append_many(self, batch: List[Tuple[Conversation, List[Message]]]) -> None:
+        """Varias sesiones de una vez (lo usa la escritura diferida de SessionCache)."""
+        if not batch:
+            return
+        if self.bucket_size > 0:
+            for conversation, new_messages in batch:
+                await self.append_messages(conversation, new_messages)
+            return
+
+        operations = []
+        for conversation, new_messages in batch:
+            docs = [m.model_dump() for m in new_messages]
+            update = self._append_update(conversation, docs)
+            update["$push"] = {"messages": {"$each": docs}}
+            operations.append(UpdateOne({"_id": conversation.id}, update, upsert=True))
+        await self.collection.bulk_write(operations, ordered=False)
+
+    async def _push_to_buckets(self, conversation_id: str, start: int, docs: List[dict]) -> None:
+        global _bucket_indexes_ready
+        if not _bucket_indexes_ready:
+            await self.messages_collection.create_index([("conversation_id", 1), ("bucket", 1)], unique=True)
+            _bucket_indexes_ready = True
+
+        buckets = defaultdict(list)
+        for offset, doc in enumerate(docs):
+            seq = start + offset
+            buckets[seq // self.bucket_size].append({**doc, "seq": seq})
+        for bucket, items in buckets.items():
+            await self.messages_collection.update_one(
+                {"conversation_id": conversation_id, "bucket": bucket},
+                {"$push": {"messages": {"$each": items}}},
+                upsert=True,
+            )
+
+    async def _load_bucketed_messages(self, conversation_id: str) -> List[dict]:
+        cursor = self.messages_collection.find({"conversation_id": conversation_id}).sort("bucket", 1)
+        messages = []
+        async for bucket in cursor:
+            messages.extend(sorted(bucket.get("messages", []), key=lambda m: m.get("seq", 0)))
+        return messages
+
     # --- 2. FUNCIÓN GET ONE (Ya arreglada) ---
     async def get_by_id(self, id: str) -> Optional[Conversation]:
         # Buscamos usando _id (que es donde guardamos tu UUID)
         doc = await self.collection.find_one({"_id": id})
         
         if doc:
+            embedded = doc.get("messages", [])
+            if "message_count" not in doc:
+                # Documento antiguo (guardado con replace_one): fijamos el contador una vez
+                await self.collection.update_one(
+                    {"_id": id, "message_count": {"$exists": False}},
+                    {"$set": {"message_count": len(embedded)}},
+                )
+            elif doc["message_count"] > len(embedded):
+                # El resto de mensajes vive en conversation_messages
+                doc["messages"] = embedded + await self._load_bucketed_messages(id)
+
             # Transformamos de vuelta para que Pydantic lo entienda
             doc["id"] = str(doc["_id"])
             del doc["_id"]
@@ -40,6 +157,14 @@ class MongoConversationRepository(ConversationRepository):
         
         return None
 
+    # --- 2.B CONTADORES (para validar la caché de sesiones entre workers) ---
+    async def get_counts(self, id: str) -> Optional[Tuple[int, int]]:
+        doc = await self.collection.find_one({"_id": id}, {"message_count": 1, "summarized_count": 1})
+        if doc is None or "message_count" not in doc:
+            # Documento antiguo sin contador: no se puede comparar, get_by_id lo fija
+            return None
+        return doc["message_count"], doc.get("summarized_count", 0)
+
     # --- 3. FUNCIÓN GET ALL (Ya arreglada) ---
     async def get_all_by_user(self, user_id: str) -> List[Conversation]:
         cursor = self.collection.find({"user_id": user_id}).sort("created_at", -1)
@@ -53,6 +178,57 @@ class MongoConversationRepository(ConversationRepository):
             conversations.append(Conversation(**doc))
         return conversations
     
+    # --- 3.B RESÚMENES PAGINADOS (barra lateral) ---
+    async def list_summaries(self, user_id: str, limit: int = 50, cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+        """
+        Lista de sesiones sin mensajes: id, title, created_at, updated_at y message_count.
+        Paginación por clave (updated_at, _id) descendente: cada página cuesta lo mismo
+        sin importar cuántas sesiones tenga el alumno. Devuelve (página, siguiente_cursor).
+        """
+        global _summary_indexes_ready
+        if not _summary_indexes_ready:
+            await self.collection.create_index([("user_id", 1), ("updated_at", -1), ("_id", -1)])
+            _summary_indexes_ready = True
+
+        # Solo chats: las lecturas asignadas comparten colección pero no tienen updated_at
+        match = {"user_id": user_id, "updated_at": {"$exists": True}}
+        if cursor:
+            last_updated, last_id = decode_cursor(cursor)
+            match["$or"] = [
+                {"updated_at": {"$lt": last_updated}},
+                {"updated_at": last_updated, "_id": {"$lt": last_id}},
+            ]
+
+        pipeline = [
+            {"$match": match},
+            {"$sort": {"updated_at": -1, "_id": -1}},
+            {"$limit": limit + 1},
+            {"$project": {
+                "_id": 1,
+                "title": 1,
+                "created_at": 1,
+                "updated_at": 1,
+                "message_count": {"$ifNull": ["$message_count", {"$size": {"$ifNull": ["$messages", []]}}]},
+            }},
+        ]
+        docs = await self.collection.aggregate(pipeline).to_list(limit + 1)
+
+        page = [
+            {
+                "id": str(doc["_id"]),
+                "title": doc.get("title"),
+                "created_at": doc.get("created_at"),
+                "updated_at": doc["updated_at"],
+                "message_count": doc["message_count"],
+            }
+            for doc in docs[:limit]
+        ]
+        next_cursor = None
+        if len(docs) > limit:
+            last = page[-1]
+            next_cursor = encode_cursor(last["updated_at"], last["id"])
+        return page, next_cursor
+
     async def delete(self, conversation_id: str, user_id: str) -> bool:
         print(f"Intentando borrar Chat ID: {conversation_id} del Usuario: {user_id}")
         
@@ -66,4 +242,6 @@ class MongoConversationRepository(ConversationRepository):
         })
         
         print(f"✅ Resultado borrado: {result.deleted_count} documentos eliminados.")
+        if result.deleted_count > 0:
+            await self.messages_collection.delete_many({"conversation_id": conversation_id})
         return result.deleted_count > 0
\ No newline at end of file
@@ -0,0 +1,269 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.config.settings import settings
+from app.domain.entities.conversation import Conversation, Message
+from app.domain.repositories.conversation_repository import ConversationRepository
+
+
+class SessionCache:
+    """
+    Conversaciones activas en memoria + escritura diferida (write-behind) a Mongo.
+    - LRU con expulsión por inactividad (idle_seconds); las sesiones con escrituras
+      pendientes no se expulsan hasta que se guardan.
+    - Los mensajes nuevos se encolan y se escriben en lote cada flush_interval
+      segundos como máximo (varios turnos de una sesión = un solo $push).
+    - Es por proceso. Con validate=True (varios workers) cada acierto se contrasta
+      con los contadores de Mongo y, si otro proceso escribió la sesión, se recarga.
+    """
+
+    def __init__(
+        self,
+        repository_factory: Callable[[], ConversationRepository],
+        max_entries: int = 500,
+        idle_seconds: float = 600,
+        flush_interval: float = 0.5,
+        flush_batch: int = 100,
+        validate: bool = False,
+    ):
+        self.repository_factory = repository_factory
+        self.max_entries = max_entries
+        self.idle_seconds = idle_seconds
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self.validate = validate
+
+        self._entries: "OrderedDict[str, Tuple[Conversation, float]]" = OrderedDict()
+        self._pending: Dict[str, List[Message]] = {}
+        self._flush_lock = asyncio.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+        self.flushes = 0
+        self.flushed_messages = 0
+        self.flush_errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    # --- LECTURA ---
+    def get(self, conversation_id: str) -> Optional[Conversation]:
+        entry = self._entries.get(conversation_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        conversation, _ = entry
+        self._entries[conversation_id] = (conversation, time.monotonic())
+        self._entries.move_to_end(conversation_id)
+        self.hits += 1
+        # Copia con su propia lista: cada turno agrega a su copia, el orden real lo fija append()
+        return conversation.model_copy(update={"messages": list(conversation.messages)})
+
+    def put(self, conversation: Conversation):
+        if not self.enabled:
+            return
+        self._entries[conversation.id] = (conversation.model_copy(update={"messages": list(conversation.messages)}), time.monotonic())
+        self._entries.move_to_end(conversation.id)
+        self._evict()
+
+    def _evict(self):
+        now = time.monotonic()
+        for conversation_id in list(self._entries):
+            _, last_used = self._entries[conversation_id]
+            over_capacity = len(self._entries) > self.max_entries
+            if not over_capacity and now - last_used < self.idle_seconds:
+                # Orden LRU: el resto es más reciente
+                break
+            if conversation_id in self._pending:
+                continue
+            del self._entries[conversation_id]
+            self.evictions += 1
+
+    # --- ESCRITURA DIFERIDA ---
+    def append(self, conversation: Conversation, new_messages: List[Message]):
+        entry = self._entries.get(conversation.id)
+        if entry is None:
+            cached = conversation.model_copy(update={"messages": list(conversation.messages)})
+        else:
+            cached = entry[0]
+            cached.messages.extend(new_messages)
+            if new_messages:
+                cached.updated_at = conversation.updated_at
+            # El resumen solo avanza (un turno viejo no pisa uno más nuevo)
+            if conversation.summarized_count >= cached.summarized_count:
+                cached.summary = conversation.summary
+                cached.summarized_count = conversation.summarized_count
+        self._entries[conversation.id] = (cached, time.monotonic())
+        self._entries.move_to_end(conversation.id)
+
+        self._pending.setdefault(conversation.id, []).extend(new_messages)
+        self._ensure_worker()
+        if len(self._pending) >= self.flush_batch:
+            self._wakeup.set()
+        self._evict()
+
+    def discard(self, conversation_id: str):
+        self._entries.pop(conversation_id, None)
+        self._pending.pop(conversation_id, None)
+
+    def has_pending(self, conversation_id: Optional[str] = None) -> bool:
+        if conversation_id is None:
+            return bool(self._pending)
+        return conversation_id in self._pending
+
+    def is_current(self, conversation: Conversation, stored: Optional[Tuple[int, int]]) -> bool:
+        """¿Coincide la copia en caché con los contadores guardados en Mongo (más lo que falta escribir)?"""
+        if stored is None:
+            return False
+        message_count, summarized_count = stored
+        unwritten = len(self._pending.get(conversation.id, []))
+        return message_count == len(conversation.messages) - unwritten and summarized_count <= conversation.summarized_count
+
+    async def flush(self):
+        """Escribe en Mongo todo lo pendiente (en un solo lote)."""
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, {}
+            batch = []
+            for conversation_id, messages in pending.items():
+                entry = self._entries.get(conversation_id)
+                if entry is not None:
+                    batch.append((entry[0], messages))
+            try:
+                await self.repository_factory().append_many(batch)
+                self.flushes += 1
+                self.flushed_messages += sum(len(messages) for _, messages in batch)
+            except Exception as e:
+                # Se reencolan delante de lo nuevo para no perder ni desordenar mensajes
+                self.flush_errors += 1
+                print(f"⚠️ Error guardando conversaciones (se reintenta): {e}")
+                for conversation_id, messages in pending.items():
+                    self._pending[conversation_id] = messages + self._pending.get(conversation_id, [])
+                raise
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                # shield: cancelar el worker (apagado) no corta una escritura a medias
+                await asyncio.shield(self.flush())
+            except Exception:
+                pass
+            self._evict()
+
+    def _ensure_worker(self):
+        if self._worker is None or self._worker.done():
+            self._wakeup = asyncio.Event()
+            self._worker = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Apagado: detiene el worker y guarda todo lo pendiente."""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        if self._pending:
+            count = sum(len(m) for m in self._pending.values())
+            await self.flush()
+            print(f"💾 Conversaciones guardadas al apagar: {count} mensajes")
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+            "evictions": self.evictions,
+            "pending_sessions": len(self._pending),
+            "flushes": self.flushes,
+            "flushed_messages": self.flushed_messages,
+            "flush_errors": self.flush_errors,
+        }
+
+
+class CachedConversationRepository(ConversationRepository):
+    """Repositorio de conversaciones que lee y escribe a través de SessionCache."""
+
+    def __init__(self, inner: ConversationRepository, cache: SessionCache):
+        self.inner = inner
+        self.cache = cache
+
+    async def save(self, conversation: Conversation) -> None:
+        # Guardado completo: lo pendiente va primero para no reordenar mensajes
+        if self.cache.has_pending():
+            await self.cache.flush()
+        await self.inner.save(conversation)
+        self.cache.put(conversation)
+
+    async def append_messages(self, conversation: Conversation, new_messages: List[Message]) -> None:
+        if not self.cache.enabled:
+            await self.inner.append_messages(conversation, new_messages)
+            return
+        self.cache.append(conversation, new_messages)
+
+    async def get_by_id(self, id: str) -> Optional[Conversation]:
+        conversation = self.cache.get(id)
+        if conversation is not None and self.cache.validate and not self.cache.is_current(conversation, await self.inner.get_counts(id)):
+            # Otro worker escribió la sesión: lo nuestro pendiente va primero y se recarga de Mongo
+            self.cache.stale += 1
+            if self.cache.has_pending(id):
+                await self.cache.flush()
+            self.cache.discard(id)
+            conversation = None
+        if conversation is None:
+            conversation = await self.inner.get_by_id(id)
+            if conversation is not None:
+                self.cache.put(conversation)
+        return conversation
+
+    async def get_all_by_user(self, user_id: str) -> List[Conversation]:
+        if self.cache.has_pending():
+            await self.cache.flush()
+        return await self.inner.get_all_by_user(user_id)
+
+    async def list_summaries(self, user_id: str, limit: int = 50, cursor: Optional[str] = None):
+        # La barra lateral debe ver los turnos que aún están en la cola
+        if self.cache.has_pending():
+            await self.cache.flush()
+        return await self.inner.list_summaries(user_id, limit, cursor)
+
+    async def delete(self, conversation_id: str, user_id: str) -> bool:
+        # Una sesión recién creada puede estar solo en la cola
+        if self.cache.has_pending():
+            await self.cache.flush()
+        self.cache.discard(conversation_id)
+        return await self.inner.delete(conversation_id, user_id)
+
+
+def _default_repository() -> ConversationRepository:
+    from app.config.database import db
+    from app.infrastructure.database.mongo.conversation_repository_impl import MongoConversationRepository
+    return MongoConversationRepository(db.get_db())
+
+
+# Caché compartida por todas las peticiones del proceso (se vacía en el lifespan)
+session_cache = SessionCache(
+    repository_factory=_default_repository,
+    max_entries=settings.CHAT_SESSION_CACHE_MAX_ENTRIES,
+    idle_seconds=settings.CHAT_SESSION_IDLE_SECONDS,
+    flush_interval=settings.CHAT_FLUSH_INTERVAL_MS / 1000,
+    flush_batch=settings.CHAT_FLUSH_BATCH,
+    validate=settings.WEB_CONCURRENCY > 1,
+)
@@ -0,0 +1,114 @@
+import re
+import unicodedata
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from app.config.settings import settings
+from app.infrastructure.files.extractors import DocumentFormat
+
+# Si cambia la forma de extraer o normalizar el texto, subimos esta versión para
+# que lo extraído antes deje de servirse desde la caché.
+EXTRACTION_VERSION = "v1"
+
+
+def normalize_extracted_text(text: str) -> str:
+    """NFC, sin espacios al final de cada línea y con como mucho una línea en blanco seguida."""
+    text = unicodedata.normalize("NFC", text or "")
+    text = re.sub(r"[ \t\r\f\v]+\n", "\n", text)
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    return text.strip()
+
+
+class ExtractionCache:
+    """
+    Texto extraído de documentos subidos, por SHA-256 de los bytes del archivo.
+    - Vive en Mongo (colección 'extraction_cache', con índice TTL): compartido
+      entre workers y persistente entre reinicios.
+    - Guarda el texto normalizado y el número de páginas leídas.
+    - Una entrada de otra versión del extractor, o con otro tope de páginas,
+      cuenta como fallo.
+    """
+
+    def __init__(self, db_provider: Optional[Callable] = None, ttl_seconds: int = 2592000,
+                 collection_name: str = "extraction_cache"):
+        self.db_provider = db_provider
+        self.ttl_seconds = ttl_seconds
+        self.collection_name = collection_name
+        self._indexes_ready = False
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _version(fmt: DocumentFormat) -> str:
+        # El tope de páginas cambia el texto de un PDF: forma parte de la versión
+        return f"{EXTRACTION_VERSION}:{fmt.name}:{fmt.max_pages or 0}"
+
+    def _collection(self):
+        if self.db_provider is None:
+            return None
+        try:
+            return self.db_provider()[self.collection_name]
+        except Exception as e:
+            print(f"⚠️ Caché de extracción sin Mongo: {e}")
+            return None
+
+    async def _ensure_indexes(self, collection):
+        if self._indexes_ready:
+            return
+        await collection.create_index("expires_at", expireAfterSeconds=0)
+        self._indexes_ready = True
+
+    async def get(self, digest: str, fmt: DocumentFormat) -> Optional[dict]:
+        """{'text', 'pages'} de un documento ya extraído, o None."""
+        collection = self._collection()
+        if collection is not None:
+            try:
+                doc = await collection.find_one({"_id": digest})
+                if doc and doc.get("version") == self._version(fmt) and doc.get("expires_at", datetime.utcnow()) > datetime.utcnow():
+                    self.hits += 1
+                    return {"text": doc["text"], "pages": doc.get("pages")}
+            except Exception as e:
+                print(f"⚠️ Error leyendo caché de extracción: {e}")
+        self.misses += 1
+        return None
+
+    async def set(self, digest: str, fmt: DocumentFormat, text: str, pages: Optional[int]) -> None:
+        collection = self._collection()
+        if collection is None:
+            return
+        try:
+            await self._ensure_indexes(collection)
+            now = datetime.utcnow()
+            await collection.replace_one(
+                {"_id": digest},
+                {
+                    "_id": digest,
+                    "version": self._version(fmt),
+                    "kind": fmt.name,
+                    "text": text,
+                    "pages": pages,
+                    "created_at": now,
+                    "expires_at": now + timedelta(seconds=self.ttl_seconds),
+                },
+                upsert=True,
+            )
+        except Exception as e:
+            print(f"⚠️ Error guardando caché de extracción: {e}")
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+def _default_db():
+    from app.infrastructure.database.mongo_connection import get_database
+    return get_database()
+
+
+# Compartida por todo el proceso
+extraction_cache = ExtractionCache(db_provider=_default_db, ttl_seconds=settings.EXTRACTION_CACHE_TTL_SECONDS)
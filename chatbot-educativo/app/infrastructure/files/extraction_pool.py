@@ -0,0 +1,215 @@
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import AsyncIterator, Optional, Tuple, Union
+
+from app.config.settings import settings
+from app.infrastructure.files.extractors import DocumentFormat, get_format
+
+
+class ExtractionTimeoutError(Exception):
+    """El documento tardó más de timeout_seconds en procesarse."""
+
+
+def _warm_up() -> bool:
+    # Al importar este módulo el worker ya cargó pypdf y python-docx
+    return True
+
+
+async def spool_upload(upload, suffix: str = "") -> Tuple[str, str]:
+    """
+    Copia el archivo subido a un temporal en disco, por bloques (nunca entero en memoria),
+    y calcula su SHA-256 en la misma pasada. Devuelve (ruta, sha256).
+    Quien lo llama debe borrar el temporal al terminar.
+    """
+    def copy() -> Tuple[str, str]:
+        digest = hashlib.sha256()
+        fd, path = tempfile.mkstemp(prefix="upload-", suffix=suffix)
+        with os.fdopen(fd, "wb") as out:
+            upload.file.seek(0)
+            while True:
+                block = upload.file.read(1024 * 1024)
+                if not block:
+                    break
+                digest.update(block)
+                out.write(block)
+        return path, digest.hexdigest()
+    return await asyncio.to_thread(copy)
+
+
+class ExtractionPool:
+    """
+    Extracción de texto (formatos del registro de extractors) en un pool de procesos, fuera del event loop.
+    - Los documentos se leen desde disco (los workers mapean el archivo con mmap),
+      no se copian los bytes entre procesos.
+    - Un formato paginado (PDF) se reparte en bloques de pages_per_chunk páginas que
+      se extraen en paralelo; las páginas se entregan en orden, a medida que llegan.
+    - Como mucho max_workers bloques a la vez en todo el proceso.
+    - Cada documento tiene el tope de tiempo de su formato. Un proceso no se puede
+      interrumpir, así que si un bloque en marcha vence el tope se recicla el pool
+      (se matan sus procesos); los bloques de otros documentos en ese pool se
+      reintentan una vez. Si el tope vence esperando un hueco no se recicla nada.
+    - Si el pool no está iniciado (scripts, pruebas) se usa un hilo.
+    """
+
+    def __init__(self, max_workers: int = 2, timeout_seconds: float = 60, pages_per_chunk: int = 20):
+        self.max_workers = max_workers
+        self.timeout_seconds = timeout_seconds
+        self.pages_per_chunk = max(1, pages_per_chunk)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+        self.completed = 0
+        self.pages = 0
+        self.timeouts = 0
+        self.restarts = 0
+        self.total_seconds = 0.0
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        # 'spawn': no heredamos los hilos/sockets del servidor (Motor, uvicorn) en los workers
+        return ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+    async def start(self):
+        if self._pool is not None or self.max_workers <= 0:
+            return
+        self._pool = self._new_pool()
+        self._slots = asyncio.Semaphore(self.max_workers)
+        # Arrancamos los procesos ahora para que la primera subida no pague el arranque
+        loop = asyncio.get_running_loop()
+        try:
+            await asyncio.gather(*[loop.run_in_executor(self._pool, _warm_up) for _ in range(self.max_workers)])
+            print(f"📄 Pool de extracción listo ({self.max_workers} procesos)")
+        except Exception as e:
+            print(f"⚠️ No se pudo calentar el pool de extracción: {e}")
+
+    async def stop(self):
+        if self._pool is None:
+            return
+        pool, self._pool = self._pool, None
+        self._terminate(pool)
+
+    @staticmethod
+    def _terminate(pool: ProcessPoolExecutor):
+        processes = list((getattr(pool, "_processes", None) or {}).values())
+        pool.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    def _recycle(self, broken: ProcessPoolExecutor):
+        # Solo la primera tarea que detecta el problema crea el pool nuevo
+        if self._pool is broken:
+            self._pool = self._new_pool()
+            self.restarts += 1
+        self._terminate(broken)
+
+    async def _run(self, deadline: float, timeout_seconds: float, func, *args):
+        """Ejecuta func(*args) en el pool con el tiempo que le queda al documento."""
+        if self._pool is None:
+            return await asyncio.to_thread(func, *args)
+
+        # El tope cuenta también la espera por un hueco, pero si se agota esperando el
+        # bloque nunca llegó a un proceso: no hay nada que matar ni pool que reciclar
+        try:
+            await asyncio.wait_for(self._slots.acquire(), deadline - time.monotonic())
+        except asyncio.TimeoutError:
+            raise self._timed_out(timeout_seconds, args[0]) from None
+        try:
+            for attempt in range(2):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise self._timed_out(timeout_seconds, args[0])
+                pool = self._pool
+                try:
+                    future = asyncio.get_running_loop().run_in_executor(pool, func, *args)
+                    return await asyncio.wait_for(future, remaining)
+                except asyncio.TimeoutError:
+                    # El bloque sí corría y se pasó del tope: solo se detiene matando sus procesos
+                    self._recycle(pool)
+                    raise self._timed_out(timeout_seconds, args[0]) from None
+                except BrokenProcessPool:
+                    # Otro documento agotó su tiempo y se recicló el pool: reintentamos una vez
+                    self._recycle(pool)
+                    if attempt:
+                        raise
+        finally:
+            self._slots.release()
+
+    def _timed_out(self, timeout_seconds: float, path) -> ExtractionTimeoutError:
+        self.timeouts += 1
+        print(f"⏱️ Extracción cancelada tras {timeout_seconds:.0f} s ({os.path.basename(str(path))})")
+        return ExtractionTimeoutError(f"El documento tardó más de {timeout_seconds:.0f} s en procesarse.")
+
+    async def iter_text(self, fmt: DocumentFormat, path: str) -> AsyncIterator[str]:
+        """
+        Texto del documento por bloques, en orden (páginas en los formatos paginados).
+        Si se deja de iterar, se cancelan los bloques pendientes. Un archivo ilegible no produce texto.
+        """
+        timeout = fmt.timeout_seconds or self.timeout_seconds
+        start = time.monotonic()
+        deadline = start + timeout
+        try:
+            if fmt.paged:
+                total = await self._run(deadline, timeout, fmt.count_pages, path)
+            else:
+                blocks = await self._run(deadline, timeout, fmt.extract, path)
+        except (ExtractionTimeoutError, BrokenProcessPool):
+            raise
+        except Exception as e:
+            print(f"❌ Error leyendo {fmt.name.upper()}: {e}")
+            return
+
+        if not fmt.paged:
+            for text in blocks:
+                yield text
+        else:
+            if fmt.max_pages and total > fmt.max_pages:
+                print(f"✂️ {fmt.name.upper()} de {total} páginas: se leen solo las primeras {fmt.max_pages}")
+                total = fmt.max_pages
+            chunks = deque((first, min(first + self.pages_per_chunk, total)) for first in range(0, total, self.pages_per_chunk))
+            window = max(1, self.max_workers)
+            pending = deque()
+            try:
+                while chunks or pending:
+                    while chunks and len(pending) < window:
+                        first, last = chunks.popleft()
+                        pending.append(asyncio.create_task(self._run(deadline, timeout, fmt.extract, path, first, last)))
+                    for text in await pending.popleft():
+                        self.pages += 1
+                        yield text
+            finally:
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+        self.completed += 1
+        self.total_seconds += time.monotonic() - start
+
+    async def extract(self, fmt: Union[DocumentFormat, str], path: str) -> str:
+        """Texto completo de un documento en disco (fmt: formato del registro o su nombre, p. ej. 'pdf')."""
+        if isinstance(fmt, str):
+            fmt = get_format(fmt)
+        return "\n".join([text async for text in self.iter_text(fmt, path)])
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.max_workers if self._pool is not None else 0,
+            "completed": self.completed,
+            "pages": self.pages,
+            "timeouts": self.timeouts,
+            "restarts": self.restarts,
+            "avg_ms": round(self.total_seconds / self.completed * 1000, 1) if self.completed else 0.0,
+        }
+
+
+# Compartido por todo el proceso (se arranca y se detiene en el lifespan)
+extraction_pool = ExtractionPool(
+    max_workers=settings.EXTRACTION_WORKERS,
+    timeout_seconds=settings.EXTRACTION_TIMEOUT_SECONDS,
+    pages_per_chunk=settings.PDF_PAGES_PER_CHUNK,
+)
@@ -0,0 +1,200 @@
+import codecs
+import mmap
+import zipfile
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Optional
+
+from app.config.settings import settings
+
+# Intentamos importar. Si fallan, no rompemos el servidor, pero avisamos.
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
+
+try:
+    import docx
+except ImportError:
+    docx = None
+
+# Bytes del principio del archivo que se miran para reconocer el formato
+SNIFF_BYTES = 4096
+MB = 1024 * 1024
+
+
+class ExtractionLimitError(Exception):
+    """El archivo supera los límites de su formato: la ruta responde 413."""
+
+
+# --- LECTORES (se ejecutan en los procesos del pool: funciones de módulo, reciben una ruta) ---
+@contextmanager
+def _open_pdf(path: str):
+    """PdfReader sobre el archivo mapeado en memoria (no se copia entero a la RAM)."""
+    if PdfReader is None:
+        raise RuntimeError("Librería 'pypdf' no instalada.")
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        yield PdfReader(mapped)
+
+def count_pdf_pages(path: str) -> int:
+    with _open_pdf(path) as reader:
+        return len(reader.pages)
+
+def iter_pdf_pages(path: str, start: int = 0, stop: Optional[int] = None) -> Iterator[str]:
+    """Texto de las páginas [start, stop) de un PDF en disco, una por una."""
+    with _open_pdf(path) as reader:
+        stop = len(reader.pages) if stop is None else min(stop, len(reader.pages))
+        for index in range(start, stop):
+            try:
+                yield reader.pages[index].extract_text() or ""
+            except Exception as e:
+                print(f"⚠️ Página {index + 1} ilegible: {e}")
+                yield ""
+
+def extract_pdf_pages(path: str, start: int, stop: int) -> List[str]:
+    # Lo que ejecuta cada worker del pool de extracción (un bloque de páginas)
+    return list(iter_pdf_pages(path, start, stop))
+
+def extract_docx_paragraphs(path: str) -> List[str]:
+    if docx is None:
+        raise RuntimeError("Librería 'python-docx' no instalada.")
+    return [para.text for para in docx.Document(path).paragraphs]
+
+def _text_encoding(head: bytes) -> Optional[str]:
+    """'utf-8-sig' o 'cp1252' (Windows en español) si 'head' parece texto; None si es binario."""
+    if b"\x00" in head:
+        return None
+    try:
+        # Incremental: un carácter cortado al final de 'head' no cuenta como error
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=False)
+        return "utf-8-sig"
+    except UnicodeDecodeError:
+        pass
+    if all(b >= 0x20 or b in b"\t\n\r\f" for b in head):
+        return "cp1252"
+    return None
+
+def iter_text_blocks(path: str, block_chars: int = 65536) -> Iterator[str]:
+    """Un .txt por bloques de líneas completas (~block_chars caracteres cada uno)."""
+    with open(path, "rb") as f:
+        encoding = _text_encoding(f.read(SNIFF_BYTES)) or "utf-8"
+    with open(path, encoding=encoding, errors="replace") as f:
+        lines, size = [], 0
+        for line in f:
+            lines.append(line.rstrip("\r\n"))
+            size += len(line)
+            if size >= block_chars:
+                yield "\n".join(lines)
+                lines, size = [], 0
+        if lines:
+            yield "\n".join(lines)
+
+def extract_text_blocks(path: str) -> List[str]:
+    return list(iter_text_blocks(path))
+
+
+# --- RECONOCIMIENTO POR FIRMA (magic bytes) ---
+def _is_pdf(path: str, head: bytes) -> bool:
+    # Algunos generadores dejan basura antes de la cabecera: basta con que esté en el primer KB
+    return b"%PDF-" in head[:1024]
+
+def _is_docx(path: str, head: bytes) -> bool:
+    if not head.startswith(b"PK\x03\x04"):
+        return False
+    try:
+        with zipfile.ZipFile(path) as z:
+            return "word/document.xml" in z.namelist()
+    except zipfile.BadZipFile:
+        return False
+
+def _is_png(path: str, head: bytes) -> bool:
+    return head.startswith(b"\x89PNG\r\n\x1a\n")
+
+def _is_jpeg(path: str, head: bytes) -> bool:
+    return head.startswith(b"\xff\xd8\xff")
+
+def _is_webp(path: str, head: bytes) -> bool:
+    return head[:4] == b"RIFF" and head[8:12] == b"WEBP"
+
+def _is_text(path: str, head: bytes) -> bool:
+    return bool(head.strip()) and _text_encoding(head) is not None
+
+
+class DocumentFormat:
+    """
+    Un formato de archivo: cómo reconocerlo, cómo leerlo y sus límites.
+    - extract(path) -> bloques de texto; los formatos paginados (count_pages)
+      usan extract(path, start, stop) -> páginas, para leerlos por partes.
+    - Sin extract es una imagen: no se extrae texto, se manda a la IA con mime_type.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        mime_type: str,
+        sniff: Callable[[str, bytes], bool],
+        extract: Optional[Callable] = None,
+        count_pages: Optional[Callable[[str], int]] = None,
+        max_bytes: int = 10 * MB,
+        max_pages: Optional[int] = None,
+        timeout_seconds: float = 60,
+    ):
+        self.name = name
+        self.mime_type = mime_type
+        self.sniff = sniff
+        self.extract = extract
+        self.count_pages = count_pages
+        self.max_bytes = max_bytes
+        self.max_pages = max_pages
+        self.timeout_seconds = timeout_seconds
+
+    @property
+    def is_image(self) -> bool:
+        return self.extract is None
+
+    @property
+    def paged(self) -> bool:
+        return self.count_pages is not None
+
+    def check_size(self, size: int):
+        if size > self.max_bytes:
+            raise ExtractionLimitError(
+                f"El archivo {self.name.upper()} es demasiado grande ({size / MB:.1f} MB, máximo {self.max_bytes / MB:.0f} MB).")
+
+
+# Registro de formatos, en el orden en que se prueban (el texto plano va al final: es el comodín)
+FORMATS: "OrderedDict[str, DocumentFormat]" = OrderedDict()
+
+def register_format(fmt: DocumentFormat):
+    FORMATS[fmt.name] = fmt
+    if "txt" in FORMATS and fmt.name != "txt":
+        FORMATS.move_to_end("txt")
+
+def get_format(name: str) -> DocumentFormat:
+    return FORMATS[name]
+
+def sniff_format(path: str) -> Optional[DocumentFormat]:
+    """El formato de un archivo según sus primeros bytes (la extensión no cuenta); None si no se reconoce."""
+    with open(path, "rb") as f:
+        head = f.read(SNIFF_BYTES)
+    for fmt in FORMATS.values():
+        if fmt.sniff(path, head):
+            return fmt
+    return None
+
+
+register_format(DocumentFormat(
+    "pdf", "application/pdf", _is_pdf, extract=extract_pdf_pages, count_pages=count_pdf_pages,
+    max_bytes=int(settings.PDF_MAX_MB * MB), max_pages=settings.PDF_MAX_PAGES, timeout_seconds=settings.EXTRACTION_TIMEOUT_SECONDS,
+))
+register_format(DocumentFormat(
+    "docx", "application/vnd.openxmlformats-officedocument.wordprocessingml.document", _is_docx,
+    extract=extract_docx_paragraphs, max_bytes=int(settings.DOCX_MAX_MB * MB), timeout_seconds=settings.DOCX_TIMEOUT_SECONDS,
+))
+register_format(DocumentFormat(
+    "txt", "text/plain", _is_text, extract=extract_text_blocks,
+    max_bytes=int(settings.TXT_MAX_MB * MB), timeout_seconds=settings.TXT_TIMEOUT_SECONDS,
+))
+register_format(DocumentFormat("png", "image/png", _is_png, max_bytes=int(settings.IMAGE_MAX_MB * MB)))
+register_format(DocumentFormat("jpeg", "image/jpeg", _is_jpeg, max_bytes=int(settings.IMAGE_MAX_MB * MB)))
+register_format(DocumentFormat("webp", "image/webp", _is_webp, max_bytes=int(settings.IMAGE_MAX_MB * MB)))
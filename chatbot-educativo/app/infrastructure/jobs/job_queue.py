@@ -0,0 +1,447 @@
+import asyncio
+import os
+import shutil
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional
+
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+from app.config.settings import settings
+from app.infrastructure.ai.scheduler import LLMOverloadedError
+
+# Estados de un trabajo
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+FINISHED = (DONE, FAILED)
+
+# handler(job, progress) -> resultado (dict). progress(stage, percent) guarda el avance.
+JobHandler = Callable[[dict, Callable[[str, int], Awaitable[None]]], Awaitable[dict]]
+
+
+class JobQueueFullError(Exception):
+    """Demasiados trabajos en cola: la ruta debe responder 429 con Retry-After."""
+
+    def __init__(self, retry_after: int = 10):
+        super().__init__("Hay demasiados trabajos en cola")
+        self.retry_after = retry_after
+
+
+class JobQueueDisabledError(Exception):
+    """Sin workers (JOB_WORKERS=0) nadie ejecutaría el trabajo: la ruta debe responder 503."""
+
+    def __init__(self):
+        super().__init__("Los trabajos en segundo plano están desactivados en este servidor")
+
+
+class JobQueue:
+    """
+    Trabajos largos (subir archivo, analizar texto, crear lección) fuera de la petición HTTP.
+    - El estado y el avance viven en Mongo (colección 'jobs'): se consultan por
+      polling o SSE y sobreviven a un reinicio.
+    - Un número fijo de workers en este proceso ejecuta los trabajos; el resto espera en cola.
+    - Un trabajo 'running' lleva el worker que lo ejecuta (worker_id) y un lease
+      (lease_until) que este renueva mientras trabaja. Solo se retoman los 'running'
+      con el lease vencido (su proceso murió), al arrancar y cada lease_seconds;
+      los que ya gastaron max_attempts se marcan como fallidos. Si el worker pierde
+      el lease, cancela el trabajo y sus escrituras finales no cuentan.
+    - Los archivos subidos se guardan en upload_dir hasta que el trabajo termina.
+    """
+
+    def __init__(
+        self,
+        db_provider: Callable,
+        workers: int = 2,
+        max_queued: int = 100,
+        max_attempts: int = 3,
+        retention_hours: int = 24,
+        upload_dir: str = "uploads/jobs",
+        lease_seconds: int = 60,
+        collection_name: str = "jobs",
+    ):
+        self.db_provider = db_provider
+        self.workers = workers
+        self.max_queued = max_queued
+        self.max_attempts = max_attempts
+        self.retention_hours = retention_hours
+        self.upload_dir = upload_dir
+        self.lease_seconds = lease_seconds
+        self.collection_name = collection_name
+        # Identifica a este proceso en los trabajos que toma (varios uvicorn/hosts comparten la colección)
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+        self.handlers: Dict[str, JobHandler] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks = []
+        self._updates: Dict[str, asyncio.Event] = {}
+        self._indexes_ready = False
+
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.resumed = 0
+
+    def register(self, kind: str, handler: JobHandler):
+        self.handlers[kind] = handler
+
+    def _collection(self):
+        return self.db_provider()[self.collection_name]
+
+    async def _ensure_indexes(self):
+        if self._indexes_ready:
+            return
+        collection = self._collection()
+        await collection.create_index([("status", 1), ("created_at", 1)])
+        await collection.create_index([("status", 1), ("lease_until", 1)])
+        # Único solo para los trabajos con Idempotency-Key: dos envíos simultáneos no crean dos trabajos
+        idempotency = [("user_id", 1), ("idempotency_key", 1)]
+        options = {"unique": True, "partialFilterExpression": {"idempotency_key": {"$type": "string"}}}
+        try:
+            await collection.create_index(idempotency, **options)
+        except OperationFailure:
+            # Había un índice anterior (no único) con las mismas claves: se reemplaza
+            await collection.drop_index(idempotency)
+            await collection.create_index(idempotency, **options)
+        # Los trabajos terminados se borran solos pasado 'expires_at'
+        await collection.create_index("expires_at", expireAfterSeconds=0)
+        self._indexes_ready = True
+
+    # --- ENVÍO ---
+    async def submit(self, kind: str, user_id: str, payload: dict, upload_path: Optional[str] = None,
+                     idempotency_key: Optional[str] = None) -> dict:
+        """
+        Guarda el trabajo y lo encola. Con la misma Idempotency-Key devuelve el trabajo existente
+        (lo decide el índice único al insertar, así que vale también para envíos simultáneos).
+        upload_path (un temporal) pasa a ser del trabajo: se mueve a upload_dir.
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"Tipo de trabajo desconocido: {kind}")
+        if self.workers <= 0:
+            raise JobQueueDisabledError()
+        await self._ensure_indexes()
+        collection = self._collection()
+        duplicate = {"user_id": user_id, "idempotency_key": idempotency_key}
+
+        if self._queue is not None and self._queue.qsize() >= self.max_queued:
+            # Un reintento de un trabajo ya aceptado no se rechaza por la cola llena
+            existing = await collection.find_one(duplicate) if idempotency_key else None
+            if existing:
+                return existing
+            raise JobQueueFullError()
+
+        job_id = uuid.uuid4().hex
+        if upload_path is not None:
+            stored = os.path.join(self.upload_dir, job_id)
+            await asyncio.to_thread(self._store_upload, upload_path, stored)
+            upload_path = stored
+
+        now = datetime.utcnow()
+        job = {
+            "_id": job_id,
+            "kind": kind,
+            "user_id": user_id,
+            "status": QUEUED,
+            "stage": "en cola",
+            "progress": 0,
+            "payload": payload,
+            "upload_path": upload_path,
+            "result": None,
+            "error": None,
+            "attempts": 0,
+            "created_at": now,
+            "updated_at": now,
+        }
+        if idempotency_key:
+            job["idempotency_key"] = idempotency_key
+        try:
+            await collection.insert_one(job)
+        except DuplicateKeyError:
+            # Ya hay un trabajo con esa Idempotency-Key: el archivo de este envío sobra
+            if upload_path is not None:
+                await asyncio.to_thread(self._discard_upload, upload_path)
+            existing = await collection.find_one(duplicate)
+            if existing is None:
+                raise
+            return existing
+        self.submitted += 1
+        if self._queue is not None:
+            self._queue.put_nowait(job_id)
+        return job
+
+    @staticmethod
+    def _store_upload(source: str, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.move(source, path)
+
+    @staticmethod
+    def _discard_upload(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    # --- CONSULTA ---
+    async def get(self, job_id: str, user_id: Optional[str] = None) -> Optional[dict]:
+        query = {"_id": job_id}
+        if user_id is not None:
+            query["user_id"] = user_id
+        return await self._collection().find_one(query, {"payload": 0, "upload_path": 0})
+
+    async def wait_for_update(self, job_id: str, timeout: float):
+        """Espera a que el trabajo avance en este proceso (o a timeout, por si corre en otro)."""
+        event = self._updates.setdefault(job_id, asyncio.Event())
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            event.clear()
+
+    def _notify(self, job_id: str):
+        event = self._updates.get(job_id)
+        if event is not None:
+            event.set()
+
+    async def _update(self, job_id: str, fields: dict, owner: Optional[dict] = None) -> bool:
+        """Con owner (el trabajo tal como se tomó) solo escribe si este worker aún tiene el lease."""
+        fields["updated_at"] = datetime.utcnow()
+        query = self._owned(owner) if owner is not None else {"_id": job_id}
+        result = await self._collection().update_one(query, {"$set": fields})
+        self._notify(job_id)
+        return result.matched_count > 0
+
+    # --- EJECUCIÓN ---
+    def _lease(self) -> datetime:
+        return datetime.utcnow() + timedelta(seconds=self.lease_seconds)
+
+    def _owned(self, job: dict) -> dict:
+        """Filtro del trabajo mientras siga en manos de esta toma (attempts cambia en cada _claim)."""
+        return {"_id": job["_id"], "status": RUNNING, "worker_id": self.worker_id, "attempts": job["attempts"]}
+
+    async def _claim(self, job_id: str) -> Optional[dict]:
+        """Pasa el trabajo de 'queued' a 'running' con lease de este worker (si otro ya lo tomó, devuelve None)."""
+        return await self._collection().find_one_and_update(
+            {"_id": job_id, "status": QUEUED},
+            {"$set": {"status": RUNNING, "stage": "iniciando", "worker_id": self.worker_id,
+                      "lease_until": self._lease(), "updated_at": datetime.utcnow()},
+             "$inc": {"attempts": 1}},
+            return_document=True,
+        )
+
+    async def _heartbeat(self, job: dict, work: Optional[asyncio.Task] = None) -> bool:
+        """
+        Renueva el lease mientras el trabajo corre (un tercio del lease: sobrevive a un par de fallos).
+        Si el lease ya no es de este worker (otro proceso lo retomó), cancela work y devuelve True.
+        """
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                renewed = await self._collection().update_one(self._owned(job), {"$set": {"lease_until": self._lease()}})
+            except Exception as e:
+                print(f"⚠️ No se pudo renovar el lease del trabajo {job['_id']}: {e}")
+                continue
+            if not renewed.matched_count:
+                print(f"⚠️ Trabajo {job['_id']}: el lease ya no es de este worker, se cancela")
+                if work is not None:
+                    work.cancel()
+                return True
+
+    async def _run_job(self, job_id: str):
+        job = await self._claim(job_id)
+        if job is None:
+            return
+        self._notify(job_id)
+        handler = self.handlers.get(job["kind"])
+
+        async def progress(stage: str, percent: int):
+            await self._update(job_id, {"stage": stage, "progress": percent}, owner=job)
+
+        if handler is None:
+            await self._finish(job, FAILED, error=f"Tipo de trabajo desconocido: {job['kind']}", owned=True)
+            return
+        # El handler corre en su propia tarea para que el heartbeat pueda cancelarlo si pierde el lease
+        work = asyncio.create_task(handler(job, progress))
+        heartbeat = asyncio.create_task(self._heartbeat(job, work))
+        try:
+            result = await work
+        except LLMOverloadedError as e:
+            if job["attempts"] < self.max_attempts:
+                # IA saturada: vuelve a la cola tras el Retry-After en vez de fallar
+                if await self._update(job_id, {"status": QUEUED, "stage": "esperando a la IA"}, owner=job):
+                    asyncio.get_running_loop().call_later(e.retry_after, self._enqueue, job_id)
+                return
+            await self._finish(job, FAILED, error=e.reason, owned=True)
+        except asyncio.CancelledError:
+            if heartbeat.done() and not heartbeat.cancelled() and heartbeat.result():
+                # Lease perdido: el trabajo (y su archivo) ya es de otro worker
+                return
+            # Apagado: se queda 'running' y se retoma cuando venza el lease
+            raise
+        except Exception as e:
+            detail = getattr(e, "detail", None) or str(e) or type(e).__name__
+            print(f"❌ Trabajo {job_id} ({job['kind']}) falló: {detail}")
+            await self._finish(job, FAILED, error=str(detail), owned=True)
+        else:
+            await self._finish(job, DONE, result=result, owned=True)
+        finally:
+            heartbeat.cancel()
+
+    async def _finish(self, job: dict, status: str, result: Optional[dict] = None, error: Optional[str] = None,
+                      owned: bool = False):
+        """owned: lo cierra el worker que lo ejecuta; si entretanto perdió el lease, no escribe nada."""
+        fields = {
+            "status": status,
+            "stage": "terminado" if status == DONE else "error",
+            "result": result,
+            "error": error,
+            "finished_at": datetime.utcnow(),
+            "expires_at": datetime.utcnow() + timedelta(hours=self.retention_hours),
+        }
+        if status == DONE:
+            fields["progress"] = 100
+        if not await self._update(job["_id"], fields, owner=job if owned else None):
+            print(f"⚠️ Trabajo {job['_id']}: otro worker lo retomó, no se guarda este resultado")
+            return
+        if status == DONE:
+            self.completed += 1
+        else:
+            self.failed += 1
+        if job.get("upload_path"):
+            try:
+                os.remove(job["upload_path"])
+            except OSError:
+                pass
+        self._updates.pop(job["_id"], None)
+
+    def _enqueue(self, job_id: str):
+        if self._queue is not None:
+            self._queue.put_nowait(job_id)
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run_job(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ Error en worker de trabajos ({job_id}): {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _reclaim(self) -> list:
+        """
+        Devuelve a la cola los 'running' con el lease vencido (sin lease: de antes de
+        existir el campo). Si ya gastaron max_attempts se marcan como fallidos: un
+        trabajo que tumba al proceso no se reintenta para siempre. Devuelve los IDs reencolados en Mongo.
+        """
+        collection = self._collection()
+        now = datetime.utcnow()
+        expired = {"status": RUNNING, "$or": [{"lease_until": {"$lt": now}}, {"lease_until": {"$exists": False}}]}
+        reclaimed = []
+        for job in await collection.find(expired, {"payload": 0}).to_list(None):
+            if job.get("attempts", 0) >= self.max_attempts:
+                await self._finish(job, FAILED, error="El trabajo se interrumpió demasiadas veces")
+                continue
+            # El filtro repite la condición: si el dueño renovó el lease entre medias, no se toca
+            result = await collection.update_one(
+                {"_id": job["_id"], **expired},
+                {"$set": {"status": QUEUED, "stage": "reanudado", "updated_at": now},
+                 "$unset": {"worker_id": "", "lease_until": ""}},
+            )
+            if result.modified_count:
+                reclaimed.append(job["_id"])
+        return reclaimed
+
+    async def _reaper(self):
+        """Retoma periódicamente los trabajos de otros procesos que murieron sin terminarlos."""
+        while True:
+            await asyncio.sleep(self.lease_seconds)
+            try:
+                reclaimed = await self._reclaim()
+                for job_id in reclaimed:
+                    self._enqueue(job_id)
+                self.resumed += len(reclaimed)
+                if reclaimed:
+                    print(f"🔁 Trabajos retomados (lease vencido): {len(reclaimed)}")
+            except Exception as e:
+                print(f"⚠️ No se pudieron revisar los leases de trabajos: {e}")
+
+    async def resume(self):
+        """Reencola lo que quedó pendiente y los 'running' cuyo worker dejó vencer el lease."""
+        collection = self._collection()
+        await self._reclaim()
+        pending = await collection.find({"status": QUEUED}, {"_id": 1}).sort("created_at", 1).to_list(None)
+        for doc in pending:
+            self._enqueue(doc["_id"])
+        self.resumed += len(pending)
+        if pending:
+            print(f"🔁 Trabajos reanudados: {len(pending)}")
+
+    async def start(self):
+        if self._tasks or self.workers <= 0:
+            return
+        self._queue = asyncio.Queue()
+        try:
+            await self._ensure_indexes()
+            await self.resume()
+        except Exception as e:
+            print(f"⚠️ No se pudieron reanudar trabajos pendientes: {e}")
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._reaper()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        self._queue = None
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers if self._tasks else 0,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "resumed": self.resumed,
+        }
+
+
+def public_job(job: dict) -> dict:
+    """Lo que ve el cliente de un trabajo (sin payload ni rutas internas)."""
+    return {
+        "job_id": job["_id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "stage": job.get("stage"),
+        "progress": job.get("progress", 0),
+        "result": job.get("result"),
+        "error": job.get("error"),
+        "created_at": job.get("created_at"),
+        "updated_at": job.get("updated_at"),
+    }
+
+
+def _default_db():
+    from app.infrastructure.database.mongo_connection import get_database
+    return get_database()
+
+
+# Cola compartida por todo el proceso (se arranca y se detiene en el lifespan)
+job_queue = JobQueue(
+    db_provider=_default_db,
+    workers=settings.JOB_WORKERS,
+    max_queued=settings.JOB_MAX_QUEUED,
+    max_attempts=settings.JOB_MAX_ATTEMPTS,
+    retention_hours=settings.JOB_RETENTION_HOURS,
+    upload_dir=settings.JOB_UPLOAD_DIR,
+    lease_seconds=settings.JOB_LEASE_SECONDS,
+)
@@ -5,9 +5,11 @@ from app.config.database import db
 # --- IMPORTS DE INFRAESTRUCTURA ---
 from app.infrastructure.database.mongo.user_repository_impl import MongoUserRepository
 from app.infrastructure.database.mongo.conversation_repository_impl import MongoConversationRepository
+from app.infrastructure.database.session_cache import CachedConversationRepository, session_cache
 from app.infrastructure.database.mongo.quiz_repository_impl import MongoQuizRepository
 from app.infrastructure.security.jwt_handler import JWTHandler
 from app.infrastructure.ai.gemini_client import GeminiClient
+from app.infrastructure.ai import gemini_client
 
 # --- IMPORTS DE CASOS DE USO ---
 from app.application.use_cases.auth.register_user import RegisterUser
@@ -31,7 +33,8 @@ def get_jwt_handler():
     return JWTHandler()
 
 def get_gemini_client() -> GeminiClient:
-    return GeminiClient()
+    # Cliente único de la app (ver lifespan en app/main.py)
+    return gemini_client.get_gemini_client()
 
 # ==========================================
 # 2. REPOSITORIOS
@@ -40,7 +43,8 @@ def get_user_repository(db=Depends(get_db)):
     return MongoUserRepository(db)
 
 def get_conversation_repository(db=Depends(get_db)):
-    return MongoConversationRepository(db)
+    # Sesiones activas desde memoria; Mongo se actualiza en segundo plano
+    return CachedConversationRepository(MongoConversationRepository(db), session_cache)
 
 def get_quiz_repository(db=Depends(get_db)):
     return MongoQuizRepository(db)
@@ -48,14 +52,12 @@ def get_quiz_repository(db=Depends(get_db)):
 # ==========================================
 # 3. MIDDLEWARE DE SEGURIDAD (CRÍTICO)
 # ==========================================
-async def get_current_user(
-    creds: HTTPAuthorizationCredentials = Depends(security), 
-    jwt_handler: JWTHandler = Depends(get_jwt_handler),
-    user_repo: MongoUserRepository = Depends(get_user_repository)
-) -> User:
+async def authenticate_token(token: str, jwt_handler: JWTHandler, user_repo: MongoUserRepository) -> User:
+    """Token JWT -> User. Lo usan las rutas HTTP y el WebSocket del chat (una vez por conexión)."""
     try:
-        token = creds.credentials 
-        payload = jwt_handler.decode_token(token)
+        payload = jwt_handler.verify_token(token) if token else None
+        if payload is None:
+            raise ValueError("Token inválido o expirado")
         email: str = payload.get("sub")
         
         if email is None:
@@ -75,6 +77,13 @@ async def get_current_user(
     
     return user
 
+async def get_current_user(
+    creds: HTTPAuthorizationCredentials = Depends(security), 
+    jwt_handler: JWTHandler = Depends(get_jwt_handler),
+    user_repo: MongoUserRepository = Depends(get_user_repository)
+) -> User:
+    return await authenticate_token(creds.credentials, jwt_handler, user_repo)
+
 # ==========================================
 # 4. CASOS DE USO (FÁBRICAS)
 # ==========================================
@@ -0,0 +1,55 @@
+from starlette.routing import Match
+
+from app.infrastructure.metrics import current_route
+
+# Etiqueta para lo que no corresponde a ninguna ruta (404, escaneos): nunca la URL, que tiene IDs
+UNMATCHED_ROUTE = "other"
+
+
+def match_route(routes, scope):
+    """
+    Plantilla de la ruta que atenderá el scope, con la misma API pública que usa el
+    router (route.matches). Con el método equivocado (405) vale la primera coincidencia parcial.
+    """
+    partial = None
+    for route in routes:
+        if hasattr(route, "effective_route_contexts"):
+            # FastAPI más nuevo que el fijado en requirements.txt: include_router agrupa las
+            # rutas en un objeto sin plantilla; se revisan sus rutas efectivas (ya con el prefijo)
+            template = match_route(route.effective_route_contexts(), scope)
+            if template:
+                return template
+            continue
+        match, _ = route.matches(scope)
+        template = getattr(route, "path_format", None)
+        if match == Match.FULL and template:
+            return template
+        if match == Match.PARTIAL and template and partial is None:
+            partial = template
+    return partial
+
+
+class RouteContextMiddleware:
+    """
+    Middleware ASGI que guarda en current_route la ruta que atiende la petición
+    (la plantilla, p. ej. "/api/chat/history/{session_id}", no la URL con IDs),
+    para que las métricas de IA sepan qué endpoint originó cada llamada.
+    Las etiquetas posibles son solo las plantillas de la app (más "other").
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    def _route_template(self, scope) -> str:
+        router = scope["app"].router if "app" in scope else None
+        return match_route(getattr(router, "routes", []), scope) or UNMATCHED_ROUTE
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+        token = current_route.set(self._route_template(scope))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_route.reset(token)
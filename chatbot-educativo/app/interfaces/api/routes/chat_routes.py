@@ -1,11 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException
+import json
+import time
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, WebSocket, WebSocketDisconnect
 from pydantic import BaseModel
 from typing import List, Optional
 
 # --- DEPENDENCIAS ---
 from app.interfaces.api.dependencies import get_gemini_client, get_conversation_repository
 from app.interfaces.api.dependencies import get_current_user
-from app.application.use_cases.chat.send_message import SendMessage
+from app.interfaces.api.dependencies import authenticate_token, get_jwt_handler, get_user_repository
+from app.infrastructure.ai.scheduler import LLMOverloadedError
+from app.infrastructure.ai.prompt_budget import PromptBudgetError
+from app.application.use_cases.chat.send_message import SendMessage, ConversationAccessError
+from app.interfaces.api.sse import stream_tokens_as_sse, sse_response
+from app.config.settings import settings
 
 router = APIRouter()
 
@@ -28,14 +35,119 @@ async def send_message(
     response = await use_case.execute(request.message, current_user.id, request.session_id)
     return response
 
-# --- 2. RUTA: OBTENER HISTORIAL COMPLETO (GET) ---
+# --- 1.B RUTA: ENVIAR MENSAJE EN STREAMING (SSE) ---
+@router.post("/send/stream")
+async def send_message_stream(
+    request: MessageRequest,
+    current_user = Depends(get_current_user),
+    repo = Depends(get_conversation_repository),
+    client = Depends(get_gemini_client)
+):
+    # Si la cola de la IA está llena respondemos 429 antes de abrir el stream
+    client.check_capacity()
+    use_case = SendMessage(repo, client)
+    session_id, tokens = await use_case.execute_stream(request.message, current_user.id, request.session_id)
+    # El evento final 'done' lleva el session_id para que el frontend lo guarde
+    return sse_response(stream_tokens_as_sse(tokens, {"session_id": session_id}, "chat"))
+
+# --- 1.C WEBSOCKET: UNA CONEXIÓN POR SESIÓN DE CHAT ---
+@router.websocket("/ws")
+async def chat_websocket(
+    websocket: WebSocket,
+    token: Optional[str] = None,
+    jwt_handler = Depends(get_jwt_handler),
+    user_repo = Depends(get_user_repository),
+    repo = Depends(get_conversation_repository),
+    client = Depends(get_gemini_client)
+):
+    """
+    Protocolo (JSON):
+    - Auth una sola vez: ?token=... en la URL o primer mensaje {"token": "..."}.
+    - Cliente -> {"message": "...", "session_id": opcional}
+    - Servidor -> {"type": "ready"} y por cada mensaje: varios {"type": "token", "text": ...}
+      y al final {"type": "done", "session_id": ..., "ttft_ms": ...} o {"type": "error", ...}.
+    La sesión se carga una sola vez y queda en la conexión: los mensajes siguientes
+    no vuelven a leerla. Si no se manda session_id se sigue la de la conexión; otro
+    session_id la cambia (solo si es del usuario: si no, error 403 y se mantiene la actual).
+    """
+    await websocket.accept()
+    try:
+        if not token:
+            token = json.loads(await websocket.receive_text()).get("token")
+        current_user = await authenticate_token(token, jwt_handler, user_repo)
+    except (HTTPException, ValueError, AttributeError):
+        await websocket.close(code=1008, reason="Credenciales inválidas o expiradas")
+        return
+    except WebSocketDisconnect:
+        return
+
+    use_case = SendMessage(repo, client)
+    conversation = None
+    await websocket.send_json({"type": "ready"})
+
+    try:
+        while True:
+            try:
+                data = json.loads(await websocket.receive_text())
+                message = str(data.get("message") or "").strip()
+            except (ValueError, AttributeError):
+                message = ""
+            if not message:
+                await websocket.send_json({"type": "error", "detail": "Mensaje vacío o inválido."})
+                continue
+            requested = data.get("session_id")
+
+            start = time.perf_counter()
+            ttft_ms = None
+            try:
+                client.check_capacity()
+                if conversation is None or (requested and requested != conversation.id):
+                    conversation = await use_case.open_conversation(current_user.id, requested, message)
+                async for text in use_case.stream_reply(conversation, message):
+                    if ttft_ms is None:
+                        ttft_ms = round((time.perf_counter() - start) * 1000, 1)
+                    await websocket.send_json({"type": "token", "text": text})
+            except LLMOverloadedError as e:
+                await websocket.send_json({
+                    "type": "error",
+                    "detail": "La IA está atendiendo a muchos alumnos. Intenta de nuevo en unos segundos.",
+                    "retry_after": e.retry_after,
+                })
+                continue
+            except PromptBudgetError as e:
+                await websocket.send_json({"type": "error", "detail": e.detail, "status": e.status_code})
+                continue
+            except ConversationAccessError as e:
+                await websocket.send_json({"type": "error", "detail": str(e), "status": 403})
+                continue
+            except WebSocketDisconnect:
+                raise
+            except Exception as e:
+                print(f"❌ Error en WebSocket chat: {e}")
+                await websocket.send_json({"type": "error", "detail": "Se interrumpió la respuesta de la IA."})
+                continue
+            await websocket.send_json({"type": "done", "session_id": conversation.id, "ttft_ms": ttft_ms})
+    except WebSocketDisconnect:
+        pass
+
+# --- 2. RUTA: OBTENER HISTORIAL (GET, resumido y paginado) ---
 @router.get("/history")
 async def get_all_sessions(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = None,
     current_user = Depends(get_current_user),
     repo = Depends(get_conversation_repository)
 ):
-    # Usamos la función del repositorio que devuelve la lista
-    sessions = await repo.get_all_by_user(current_user.id)
+    # Solo lo que pinta la barra lateral (sin mensajes), más recientes primero
+    limit = min(limit or settings.CHAT_HISTORY_PAGE_SIZE, settings.CHAT_HISTORY_MAX_PAGE_SIZE)
+    try:
+        sessions, next_cursor = await repo.list_summaries(current_user.id, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # La respuesta sigue siendo una lista; la siguiente página va en la cabecera
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return sessions
 
 # --- 3. RUTA: OBTENER DETALLE DE UN CHAT (GET) ---
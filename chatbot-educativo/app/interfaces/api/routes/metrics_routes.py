@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+from typing import Optional
+
+from app.config.settings import settings
+from app.infrastructure.ai.gemini_client import get_gemini_client
+from app.infrastructure.jobs.job_queue import job_queue
+from app.infrastructure.metrics import registry
+
+router = APIRouter()
+
+# Estado del planificador en el momento del scrape
+registry.gauge("llm_scheduler_in_flight", "Llamadas a la IA en curso", lambda: get_gemini_client().scheduler.in_flight)
+registry.gauge("llm_scheduler_waiting", "Llamadas esperando turno en el planificador", lambda: get_gemini_client().scheduler.waiting)
+registry.gauge("jobs_queued", "Trabajos en cola esperando un worker", lambda: job_queue.stats()["queued"])
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics(authorization: Optional[str] = Header(None)):
+    if settings.METRICS_TOKEN and authorization != f"Bearer {settings.METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="No autorizado")
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
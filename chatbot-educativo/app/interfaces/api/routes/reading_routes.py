@@ -1,16 +1,30 @@
+import asyncio
 import os
 import random
-from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException
+from contextlib import aclosing
+from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException, Query, Header
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import AsyncIterator, Optional, List, Tuple
 from datetime import datetime
 from bson import ObjectId
 
 # Importamos la base de datos segura
 from app.infrastructure.database.mongo_connection import get_database
-from app.infrastructure.ai.gemini_client import GeminiClient, get_gemini_client
+from app.infrastructure.ai.gemini_client import GeminiClient, get_gemini_client, quiz_cache, CHAT_ERROR_MESSAGE
+from app.infrastructure.ai.scheduler import LLMOverloadedError
+from app.infrastructure.ai import prompt_budget
+from app.infrastructure.ai.prompt_budget import PromptBudgetError
+from app.infrastructure.ai.lesson_index import lesson_indexes
+from app.infrastructure.ai.tutor_answer_cache import tutor_answers
+from app.infrastructure.jobs.job_queue import job_queue, public_job, JobQueueFullError, JobQueueDisabledError, DONE, FAILED
+from app.config.settings import settings
 from app.interfaces.api.routes.auth_routes import get_current_user
-from app.utils.file_processing import extract_text_from_pdf, extract_text_from_docx
+from app.interfaces.api.sse import stream_tokens_as_sse, sse_response, sse_event
+from app.infrastructure.files.extraction_pool import extraction_pool, spool_upload, ExtractionTimeoutError
+from app.infrastructure.files.extraction_cache import extraction_cache, normalize_extracted_text
+from app.infrastructure.files.extractors import DocumentFormat, ExtractionLimitError, sniff_format
 
 router = APIRouter()
 db = get_database()
@@ -80,7 +94,8 @@ class FeedbackRequest(BaseModel):
 
 class TutorRequest(BaseModel):
     question: str
-    context: str # El contenido de la lección actual
+    lesson_id: Optional[str] = None # La lección se lee del servidor (recomendado)
+    context: Optional[str] = None   # Compatibilidad: el contenido completo enviado por el navegador
     
 class PromotionRequest(BaseModel):
     code: str
@@ -105,7 +120,8 @@ async def is_teacher(user_dict: dict) -> bool:
         return False
 
 # --- HELPER: ASIGNACIÓN INTELIGENTE (MEJORADO) ---
-async def distribute_lesson_to_users(content: str, quiz: list, topic: str, creator_id: str, assign_string: Optional[str] = None, is_creator_teacher: bool = False):
+async def distribute_lesson_to_users(content: str, quiz: list, topic: str, creator_id: str, assign_string: Optional[str] = None, is_creator_teacher: bool = False,
+                                     source_sha256: Optional[str] = None):
     
     report = {"assigned": [], "not_found": []}
     recipients_set = {creator_id} # El creador siempre tiene una copia
@@ -131,7 +147,7 @@ async def distribute_lesson_to_users(content: str, quiz: list, topic: str, creat
         # Si el destinatario NO es el creador, entonces fue asignado por el creador
         assigned_by = creator_id if recipient != creator_id else None
         
-        await db["conversations"].insert_one({
+        lesson = {
             "_id": ObjectId(new_id),
             "user_id": recipient,
             "assigned_by": assigned_by,
@@ -141,7 +157,10 @@ async def distribute_lesson_to_users(content: str, quiz: list, topic: str, creat
             "score": None,
             "status": "pending",
             "timestamp": datetime.utcnow()
-        })
+        }
+        # Huella del archivo subido: otras cachés pueden usarla como clave
+        if source_sha256: lesson["source_sha256"] = source_sha256
+        await db["conversations"].insert_one(lesson)
         if recipient == creator_id: lesson_id_ref = new_id
     
     return lesson_id_ref, report
@@ -201,6 +220,186 @@ async def teacher_dashboard(current_user: dict = Depends(get_current_user)):
         print(f"Error dashboard: {e}")
         return []
 
+# --- ESTADÍSTICAS DE LA CACHÉ DE EXÁMENES ---
+@router.get("/cache/stats")
+async def quiz_cache_stats(current_user: dict = Depends(get_current_user)):
+    if not await is_teacher(current_user):
+        raise HTTPException(status_code=403, detail="Acceso denegado. Solo para docentes.")
+    return quiz_cache.stats()
+
+# --- ESTADÍSTICAS DEL CLIENTE DE IA (caché + llamadas agrupadas) ---
+@router.get("/ai/stats")
+async def ai_client_stats(current_user: dict = Depends(get_current_user), ai: GeminiClient = Depends(get_gemini_client)):
+    if not await is_teacher(current_user):
+        raise HTTPException(status_code=403, detail="Acceso denegado. Solo para docentes.")
+    return {**ai.stats(), "lesson_index": lesson_indexes.stats(), "tutor_answers": tutor_answers.stats(),
+            "extraction": {**extraction_pool.stats(), "cache": extraction_cache.stats()}}
+
+# --- PIPELINES (los usan las rutas y los trabajos en segundo plano) ---
+async def _no_progress(stage: str, percent: int):
+    pass
+
+def assignment_message(base: str, report: dict) -> str:
+    msg = base
+    if report["assigned"]: msg = f"¡Asignado a {len(report['assigned'])} alumnos!"
+    if report["not_found"]: msg += f" (OJO: No se encontró a: {', '.join(report['not_found'])})"
+    return msg
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+async def detect_format(path: str) -> DocumentFormat:
+    """Formato del archivo por su contenido (no por la extensión) y sus límites de tamaño."""
+    fmt = await asyncio.to_thread(sniff_format, path)
+    if fmt is None: raise HTTPException(400, "Formato no soportado. Usa PDF, DOCX, TXT o una imagen (PNG, JPG, WEBP).")
+    try:
+        fmt.check_size(os.path.getsize(path))
+    except ExtractionLimitError as e:
+        raise HTTPException(413, str(e))
+    return fmt
+
+async def read_document(fmt: DocumentFormat, path: str) -> Tuple[str, Optional[int]]:
+    """
+    (texto, páginas) de un documento en disco, extraído en el pool de procesos (un
+    PDF grande no congela el resto de peticiones). Los bloques se consumen a medida
+    que llegan: si el documento ya no cabe en el presupuesto, se deja de extraer.
+    """
+    try:
+        blocks, chars = [], 0
+        async with aclosing(extraction_pool.iter_text(fmt, path)) as stream:
+            async for block in stream:
+                blocks.append(block)
+                chars += len(block) + 1
+                prompt_budget.check_document_size(chars)
+        return normalize_extracted_text("\n".join(blocks)), (len(blocks) if fmt.paged else None)
+    except ExtractionTimeoutError as e:
+        raise HTTPException(422, str(e))
+
+async def read_document_cached(fmt: DocumentFormat, path: str, digest: Optional[str]) -> Tuple[str, str]:
+    """(texto, 'hit'|'miss'|'bypass'): un archivo ya visto (mismo SHA-256) no se vuelve a leer."""
+    if not digest:
+        text, _ = await read_document(fmt, path)
+        return text, "bypass"
+    cached = await extraction_cache.get(digest, fmt)
+    if cached is not None:
+        print(f"♻️ Documento ya extraído ({digest[:12]}): {cached.get('pages') or '-'} páginas")
+        return cached["text"], "hit"
+    text, pages = await read_document(fmt, path)
+    # Los documentos vacíos se rechazan: no vale la pena guardarlos
+    if len(text) >= 10: await extraction_cache.set(digest, fmt, text, pages)
+    return text, "miss"
+
+async def run_upload_pipeline(ai: GeminiClient, user: dict, filename: str, path: str,
+                              num_questions: int, difficulty: str, assign_to: Optional[str], progress=_no_progress,
+                              digest: Optional[str] = None, fmt: Optional[DocumentFormat] = None) -> dict:
+    usage = prompt_budget.track_usage()
+    if fmt is None: fmt = await detect_format(path)
+    content = ""
+    quiz = []
+    cache_status = "bypass" # Las imágenes no pasan por la caché de exámenes
+    extraction_status = "bypass"
+
+    if fmt.is_image:
+        await progress("analizando imagen", 20)
+        image_bytes = await asyncio.to_thread(_read_file, path)
+        quiz = await ai.generate_quiz_from_image(image_bytes, fmt.mime_type, num_questions, difficulty)
+        content = "[Imagen analizada]"
+    else:
+        await progress("extrayendo texto", 10)
+        content, extraction_status = await read_document_cached(fmt, path, digest)
+        if not content or len(content.strip()) < 10: raise HTTPException(400, "Documento vacío.")
+        await progress("generando examen", 30)
+        quiz, cache_status = await ai.generate_quiz_cached(content, num_questions, difficulty)
+
+    if not quiz: raise HTTPException(500, "Error IA.")
+
+    # --- CORRECCIÓN APLICADA AQUÍ ---
+    quiz = clean_quiz_data(quiz)
+
+    await progress("asignando", 85)
+    is_docente = await is_teacher(user)
+    lid, report = await distribute_lesson_to_users(content, quiz, f"Archivo: {filename}", get_user_id(user), assign_to, is_docente,
+                                                   source_sha256=digest)
+
+    # MENSAJE DE REPORTE
+    msg = assignment_message("Archivo procesado.", report)
+    return {"filename": filename, "quiz": quiz, "lesson_id": lid, "text": content, "message": msg, "cache": cache_status,
+            "extraction": extraction_status, "sha256": digest,
+            "budget": usage.summary()}
+
+async def run_text_pipeline(ai: GeminiClient, user: dict, req: TextRequest, progress=_no_progress) -> dict:
+    usage = prompt_budget.track_usage()
+    if len(req.text) < 10: raise HTTPException(400, "Texto muy corto.")
+    await progress("generando examen", 20)
+    quiz, cache_status = await ai.generate_quiz_cached(req.text, req.num_questions, req.difficulty)
+
+    # --- CORRECCIÓN APLICADA AQUÍ ---
+    quiz = clean_quiz_data(quiz)
+
+    await progress("asignando", 85)
+    is_docente = await is_teacher(user)
+    lid, report = await distribute_lesson_to_users(req.text, quiz, "Texto Pegado", get_user_id(user), req.assign_to, is_docente)
+
+    msg = assignment_message("Texto analizado.", report)
+    return {"quiz": quiz, "lesson_id": lid, "message": msg, "cache": cache_status, "budget": usage.summary()}
+
+async def run_lesson_pipeline(ai: GeminiClient, user: dict, req: TopicRequest, progress=_no_progress) -> dict:
+    usage = prompt_budget.track_usage()
+    # Una sola llamada (artículo + examen); si no valida, volvemos a los dos pasos
+    await progress("escribiendo lección", 10)
+    combined = await ai.generate_lesson_with_quiz(req.topic, req.num_questions, req.difficulty)
+    if combined:
+        text, quiz, cache_status = combined["content"], combined["quiz"], "miss"
+        generation = "combined"
+    else:
+        generation = "two_step"
+        text = await ai.generate_lesson_content(req.topic, req.difficulty)
+        await progress("generando examen", 50)
+        quiz, cache_status = await ai.generate_quiz_cached(text, req.num_questions, req.difficulty)
+
+    # --- CORRECCIÓN APLICADA AQUÍ ---
+    quiz = clean_quiz_data(quiz)
+
+    await progress("asignando", 85)
+    is_docente = await is_teacher(user)
+    lid, report = await distribute_lesson_to_users(text, quiz, req.topic.title(), get_user_id(user), req.assign_to, is_docente)
+
+    msg = assignment_message("Lección creada.", report)
+    return {"quiz": quiz, "text": text, "lesson_id": lid, "message": msg, "cache": cache_status, "generation": generation,
+            "budget": usage.summary()}
+
+# --- TRABAJOS EN SEGUNDO PLANO ---
+# El usuario del trabajo se reconstruye a partir de su id (email), igual que en get_user_id
+async def _upload_job(job: dict, progress) -> dict:
+    p = job["payload"]
+    return await run_upload_pipeline(get_gemini_client(), {"sub": job["user_id"]}, p["filename"], job["upload_path"],
+                                     p["num_questions"], p["difficulty"], p.get("assign_to"), progress, p.get("sha256"))
+
+async def _text_job(job: dict, progress) -> dict:
+    return await run_text_pipeline(get_gemini_client(), {"sub": job["user_id"]}, TextRequest(**job["payload"]), progress)
+
+async def _lesson_job(job: dict, progress) -> dict:
+    return await run_lesson_pipeline(get_gemini_client(), {"sub": job["user_id"]}, TopicRequest(**job["payload"]), progress)
+
+job_queue.register("upload", _upload_job)
+job_queue.register("analyze_text", _text_job)
+job_queue.register("create_lesson", _lesson_job)
+
+async def submit_job(kind: str, user: dict, payload: dict, upload_path: Optional[str] = None, idempotency_key: Optional[str] = None) -> JSONResponse:
+    """Encola el trabajo y responde 202 con su id y dónde consultar el avance."""
+    try:
+        job = await job_queue.submit(kind, get_user_id(user), payload, upload_path, idempotency_key)
+    except JobQueueFullError as e:
+        raise HTTPException(429, "Hay muchos trabajos en cola. Intenta de nuevo en unos segundos.",
+                            headers={"Retry-After": str(e.retry_after)})
+    except JobQueueDisabledError as e:
+        raise HTTPException(503, f"{e}. Envía la petición sin ?async=true.")
+    body = public_job(job)
+    body["status_url"] = f"/api/reading/jobs/{job['_id']}"
+    body["events_url"] = f"/api/reading/jobs/{job['_id']}/events"
+    return JSONResponse(status_code=202, content=jsonable_encoder(body))
+
 # --- 1. UPLOAD ---
 @router.post("/upload")
 async def upload_file(
@@ -208,107 +407,189 @@ async def upload_file(
     num_questions: int = Form(5),
     difficulty: str = Form("Medio"),
     assign_to: Optional[str] = Form(None),
+    run_async: bool = Query(False, alias="async"),
+    idempotency_key: Optional[str] = Header(None),
     current_user: dict = Depends(get_current_user),
     ai_client: GeminiClient = Depends(get_gemini_client)
 ):
+    if run_async: prompt_budget.check_questions(num_questions)
+    # El archivo se copia a disco por bloques; nunca entero en memoria
+    path, digest = await spool_upload(file, os.path.splitext(file.filename or "")[1])
     try:
-        filename = file.filename.lower()
-        content = ""
-        quiz = []
-        
-        if filename.endswith((".png", ".jpg", ".jpeg")):
-            img_bytes = await file.read()
-            quiz = await ai_client.generate_quiz_from_image(img_bytes, file.content_type, num_questions, difficulty)
-            content = "[Imagen analizada]"
-        elif filename.endswith((".pdf", ".docx")):
-            if filename.endswith(".pdf"): content = extract_text_from_pdf(file.file)
-            elif filename.endswith(".docx"): content = extract_text_from_docx(file.file)
-            if not content or len(content.strip()) < 10: raise HTTPException(400, "Documento vacío.")
-            quiz = await ai_client.generate_quiz(content, num_questions, difficulty)
-        else: raise HTTPException(400, "Formato no soportado.")
-
-        if not quiz: raise HTTPException(500, "Error IA.")
-
-        # --- CORRECCIÓN APLICADA AQUÍ ---
-        quiz = clean_quiz_data(quiz)
-
-        is_docente = await is_teacher(current_user)
-        lid, report = await distribute_lesson_to_users(content, quiz, f"Archivo: {file.filename}", get_user_id(current_user), assign_to, is_docente)
-        
-        # MENSAJE DE REPORTE
-        msg = "Archivo procesado."
-        if report["assigned"]: msg = f"¡Asignado a {len(report['assigned'])} alumnos!"
-        if report["not_found"]: msg += f" (OJO: No se encontró a: {', '.join(report['not_found'])})"
-
-        return {"filename": file.filename, "quiz": quiz, "lesson_id": lid, "text": content, "message": msg}
-    except Exception as e: raise HTTPException(500, str(e))
+        fmt = await detect_format(path)
+        if run_async:
+            # Si se encola, el trabajo se queda con el archivo (lo mueve a su carpeta)
+            payload = {"filename": file.filename, "sha256": digest,
+                       "num_questions": num_questions, "difficulty": difficulty, "assign_to": assign_to}
+            return await submit_job("upload", current_user, payload, path, idempotency_key)
+        try:
+            return await run_upload_pipeline(ai_client, current_user, file.filename, path,
+                                             num_questions, difficulty, assign_to, digest=digest, fmt=fmt)
+        except (HTTPException, LLMOverloadedError, PromptBudgetError): raise
+        except Exception as e: raise HTTPException(500, str(e))
+    finally:
+        if os.path.exists(path): os.remove(path)
 
 # --- 2. TEXTO ---
 @router.post("/analyze-text")
-async def analyze_text(req: TextRequest, user: dict = Depends(get_current_user), ai: GeminiClient = Depends(get_gemini_client)):
-    try:
+async def analyze_text(req: TextRequest, run_async: bool = Query(False, alias="async"), idempotency_key: Optional[str] = Header(None),
+                       user: dict = Depends(get_current_user), ai: GeminiClient = Depends(get_gemini_client)):
+    if run_async:
         if len(req.text) < 10: raise HTTPException(400, "Texto muy corto.")
-        quiz = await ai.generate_quiz(req.text, req.num_questions, req.difficulty)
-        
-        # --- CORRECCIÓN APLICADA AQUÍ ---
-        quiz = clean_quiz_data(quiz)
-
-        is_docente = await is_teacher(user)
-        lid, report = await distribute_lesson_to_users(req.text, quiz, "Texto Pegado", get_user_id(user), req.assign_to, is_docente)
-        
-        msg = "Texto analizado."
-        if report["assigned"]: msg = f"¡Asignado a {len(report['assigned'])} alumnos!"
-        if report["not_found"]: msg += f" (OJO: No se encontró a: {', '.join(report['not_found'])})"
-
-        return {"quiz": quiz, "lesson_id": lid, "message": msg}
+        prompt_budget.check_document(req.text, req.num_questions)
+        return await submit_job("analyze_text", user, req.model_dump(), idempotency_key=idempotency_key)
+    try:
+        return await run_text_pipeline(ai, user, req)
+    except (HTTPException, LLMOverloadedError, PromptBudgetError): raise
     except Exception as e: raise HTTPException(500, str(e))
 
 # --- 3. CREAR LECCIÓN ---
 @router.post("/create-lesson")
-async def create_lesson(req: TopicRequest, user: dict = Depends(get_current_user), ai: GeminiClient = Depends(get_gemini_client)):
+async def create_lesson(req: TopicRequest, run_async: bool = Query(False, alias="async"), idempotency_key: Optional[str] = Header(None),
+                        user: dict = Depends(get_current_user), ai: GeminiClient = Depends(get_gemini_client)):
+    if run_async:
+        prompt_budget.check_field("El tema", req.topic, settings.PROMPT_TOPIC_TOKENS)
+        prompt_budget.check_questions(req.num_questions)
+        return await submit_job("create_lesson", user, req.model_dump(), idempotency_key=idempotency_key)
     try:
-        text = await ai.generate_lesson_content(req.topic, req.difficulty)
-        quiz = await ai.generate_quiz(text, req.num_questions, req.difficulty)
-        
-        # --- CORRECCIÓN APLICADA AQUÍ ---
-        quiz = clean_quiz_data(quiz)
-
-        is_docente = await is_teacher(user)
-        lid, report = await distribute_lesson_to_users(text, quiz, req.topic.title(), get_user_id(user), req.assign_to, is_docente)
-        
-        msg = "Lección creada."
-        if report["assigned"]: msg = f"¡Asignado a {len(report['assigned'])} alumnos!"
-        if report["not_found"]: msg += f" (OJO: No se encontró a: {', '.join(report['not_found'])})"
-
-        return {"quiz": quiz, "text": text, "lesson_id": lid, "message": msg}
+        return await run_lesson_pipeline(ai, user, req)
+    except (HTTPException, LLMOverloadedError, PromptBudgetError): raise
     except Exception as e: raise HTTPException(500, str(e))
 
+# --- ESTADO DE UN TRABAJO (polling) ---
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str, user: dict = Depends(get_current_user)):
+    job = await job_queue.get(job_id, get_user_id(user))
+    if not job: raise HTTPException(404, "Trabajo no encontrado")
+    return public_job(job)
+
+async def job_events(job_id: str, uid: str) -> AsyncIterator[str]:
+    """'progress' cada vez que cambia la etapa; 'done' o 'error' al terminar."""
+    last = None
+    while True:
+        job = await job_queue.get(job_id, uid)
+        if job is None:
+            yield sse_event("error", {"detail": "Trabajo no encontrado"})
+            return
+        view = public_job(job)
+        snapshot = (view["status"], view["stage"], view["progress"])
+        if snapshot != last:
+            last = snapshot
+            if view["status"] == DONE:
+                yield sse_event("done", view)
+                return
+            if view["status"] == FAILED:
+                yield sse_event("error", {**view, "detail": view["error"]})
+                return
+            yield sse_event("progress", view)
+        await job_queue.wait_for_update(job_id, settings.JOB_EVENTS_POLL_SECONDS)
+
+# --- ESTADO DE UN TRABAJO (SSE) ---
+@router.get("/jobs/{job_id}/events")
+async def get_job_events(job_id: str, user: dict = Depends(get_current_user)):
+    uid = get_user_id(user)
+    if not await job_queue.get(job_id, uid): raise HTTPException(404, "Trabajo no encontrado")
+    return sse_response(job_events(job_id, uid))
+
 # --- NUEVO: ENDPOINT TUTOR IA ---
-@router.post("/ask-tutor")
-async def ask_tutor(req: TutorRequest, user: dict = Depends(get_current_user), ai: GeminiClient = Depends(get_gemini_client)):
-    try:
-        # Prompt de ingeniería para que actúe como profesor
-        prompt = f"""
+async def load_tutor_lesson(req: TutorRequest, user: dict) -> Tuple[str, str]:
+    """Contenido de la lección sobre la que pregunta el alumno y su tema (para estadísticas)."""
+    if req.lesson_id:
+        uid = get_user_id(user)
+        try:
+            lesson = await db["conversations"].find_one(
+                {"_id": ObjectId(req.lesson_id), "$or": [{"user_id": uid}, {"assigned_by": uid}]},
+                {"content": 1, "topic": 1},
+            )
+        except Exception:
+            lesson = None
+        if not lesson:
+            raise HTTPException(404, "Lección no encontrada")
+        return lesson.get("content") or "", lesson.get("topic") or ""
+    if req.context:
+        return req.context, ""
+    raise HTTPException(422, "Envía lesson_id (o context) con la pregunta.")
+
+def get_tutor_passages(content: str, question: str) -> List[str]:
+    """Pasajes de la lección más relevantes para la pregunta (índice BM25 por lección)."""
+    return lesson_indexes.relevant_passages(
+        content, question, k=settings.TUTOR_TOP_K, max_chars=settings.TUTOR_CONTEXT_MAX_CHARS
+    )
+
+def build_tutor_prompt(question: str, passages: List[str]) -> str:
+    # Prompt de ingeniería para que actúe como profesor
+    lesson_text = "\n[...]\n".join(passages)
+    return f"""
         Actúa como un profesor experto y amable. 
-        El alumno tiene una duda sobre la siguiente lección:
+        El alumno tiene una duda sobre la siguiente lección
+        (se muestran solo los fragmentos relacionados con su pregunta):
         
         --- CONTENIDO DE LA LECCIÓN ---
-        {req.context[:4000]} 
+        {lesson_text} 
         -------------------------------
         
-        PREGUNTA DEL ALUMNO: {req.question}
+        PREGUNTA DEL ALUMNO: {question}
         
         Instrucciones:
         1. Responde brevemente (máximo 3 frases).
         2. Usa un tono motivador.
         3. Basa tu respuesta SOLO en el contenido de la lección proporcionada.
         """
-        
-        response = await ai.generate_content(prompt)
-        return {"answer": response}
+
+@router.post("/ask-tutor")
+async def ask_tutor(req: TutorRequest, user: dict = Depends(get_current_user), ai: GeminiClient = Depends(get_gemini_client)):
+    prompt_budget.check_field("La pregunta", req.question, settings.PROMPT_TUTOR_QUESTION_TOKENS)
+    usage = prompt_budget.track_usage()
+    content, topic = await load_tutor_lesson(req, user)
+    # Misma lección + pregunta casi igual -> respuesta ya generada
+    lesson_key = lesson_indexes.content_key(content)
+    cached = tutor_answers.get(lesson_key, req.question, topic)
+    if cached:
+        return {"answer": cached, "cache": "hit", "budget": usage.summary()}
+    try:
+        response = await ai.generate_content(build_tutor_prompt(req.question, get_tutor_passages(content, req.question)))
+        if response != CHAT_ERROR_MESSAGE:
+            tutor_answers.set(lesson_key, req.question, response, topic)
+        return {"answer": response, "cache": "miss", "budget": usage.summary()}
+    except (HTTPException, LLMOverloadedError, PromptBudgetError):
+        raise
     except Exception as e:
         raise HTTPException(500, "El profesor está ocupado (Error IA).")
 
+async def _single_chunk(text: str) -> AsyncIterator[str]:
+    yield text
+
+async def _stream_and_cache(tokens: AsyncIterator[str], lesson_key: str, question: str, topic: str) -> AsyncIterator[str]:
+    # Solo se guarda una respuesta completa: si el stream falla (excepción) o el
+    # cliente se desconecta (aclose), nunca se llega a las líneas de después del bucle
+    chunks = []
+    async for text in tokens:
+        chunks.append(text)
+        yield text
+    answer = "".join(chunks)
+    if answer and answer != CHAT_ERROR_MESSAGE:
+        tutor_answers.set(lesson_key, question, answer, topic)
+
+# --- TUTOR IA EN STREAMING (SSE) ---
+@router.post("/ask-tutor/stream")
+async def ask_tutor_stream(req: TutorRequest, user: dict = Depends(get_current_user), ai: GeminiClient = Depends(get_gemini_client)):
+    prompt_budget.check_field("La pregunta", req.question, settings.PROMPT_TUTOR_QUESTION_TOKENS)
+    content, topic = await load_tutor_lesson(req, user)
+    lesson_key = lesson_indexes.content_key(content)
+    cached = tutor_answers.get(lesson_key, req.question, topic)
+    usage = prompt_budget.BudgetUsage()
+    if cached:
+        done = {"session_id": None, "cache": "hit", "budget": usage.summary()}
+        return sse_response(stream_tokens_as_sse(_single_chunk(cached), done, "tutor"))
+
+    # Si la cola está llena (429) o el prompt no cabe (413) respondemos antes de abrir el stream
+    ai.check_capacity()
+    prompt = build_tutor_prompt(req.question, get_tutor_passages(content, req.question))
+    prompt_budget.check_prompt(prompt)
+    usage.add(prompt)
+    tokens = _stream_and_cache(ai.stream_content(prompt), lesson_key, req.question, topic)
+    return sse_response(stream_tokens_as_sse(tokens, {"session_id": None, "cache": "miss", "budget": usage.summary()}, "tutor"))
+
 # --- 4. HISTORIAL ---
 @router.get("/history")
 async def get_history(user: dict = Depends(get_current_user)):
@@ -355,6 +636,7 @@ async def feedback(req: FeedbackRequest, user: dict = Depends(get_current_user),
                 {"$set": {"score": req.score, "status": "completed", "feedback": msg}}
             )
         return {"feedback": msg}
+    except LLMOverloadedError: raise
     except: return {"feedback": "Sigue practicando."}
 
 # --- BUSCADOR ---
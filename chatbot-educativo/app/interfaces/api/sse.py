@@ -0,0 +1,49 @@
+import json
+import time
+from typing import AsyncIterator
+
+from fastapi.responses import StreamingResponse
+
+from app.infrastructure.ai.prompt_budget import PromptBudgetError
+
+
+def sse_event(event: str, data: dict) -> str:
+    """Formatea un evento Server-Sent Events (los datos van como JSON en una línea)."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+async def stream_tokens_as_sse(tokens: AsyncIterator[str], done_data: dict, label: str) -> AsyncIterator[str]:
+    """
+    Convierte un iterador de fragmentos de texto en eventos SSE:
+    - 'token' por cada fragmento.
+    - 'done' al final, con 'done_data' (p. ej. el session_id) y el tiempo al primer token.
+    - 'error' si algo falla a mitad del stream.
+    """
+    start = time.perf_counter()
+    ttft_ms = None
+    try:
+        async for text in tokens:
+            if ttft_ms is None:
+                ttft_ms = round((time.perf_counter() - start) * 1000, 1)
+                print(f"⚡ {label}: primer token en {ttft_ms} ms")
+            yield sse_event("token", {"text": text})
+    except PromptBudgetError as e:
+        yield sse_event("error", {"detail": e.detail, "status": e.status_code})
+        return
+    except Exception as e:
+        print(f"❌ Error en stream {label}: {e}")
+        yield sse_event("error", {"detail": "Se interrumpió la respuesta de la IA."})
+        return
+
+    yield sse_event("done", {**done_data, "ttft_ms": ttft_ms})
+
+
+def sse_response(events: AsyncIterator[str]) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no", # Evita que proxies (nginx/Render) acumulen el stream
+        },
+    )
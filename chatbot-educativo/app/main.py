@@ -1,15 +1,42 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
 from app.config.database import db
-from app.interfaces.api.routes import auth_routes, chat_routes, reading_routes 
+from app.infrastructure.ai.gemini_client import init_gemini_client, close_gemini_client, feedback_bank
+from app.infrastructure.ai.scheduler import LLMOverloadedError
+from app.infrastructure.ai.prompt_budget import PromptBudgetError
+from app.application.use_cases.chat.send_message import ConversationAccessError
+from app.infrastructure.database.session_cache import session_cache
+from app.infrastructure.jobs.job_queue import job_queue
+from app.infrastructure.files.extraction_pool import extraction_pool
+from app.interfaces.api.middleware import RouteContextMiddleware
+from app.interfaces.api.routes import auth_routes, chat_routes, reading_routes, metrics_routes
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup: Conectar a la DB
     db.connect()
+    # Un solo cliente de IA para toda la app (modelos ya construidos)
+    app.state.gemini_client = init_gemini_client()
+    # Relleno periódico del banco de feedback (no bloquea el arranque)
+    feedback_bank.start(app.state.gemini_client)
+    # Procesos para leer PDF/DOCX sin bloquear el event loop
+    await extraction_pool.start()
+    # Workers de trabajos en segundo plano (retoma los que quedaron pendientes)
+    await job_queue.start()
     yield
     # Shutdown: Desconectar
+    # Los trabajos a medias quedan 'running' en Mongo y se retoman al arrancar
+    await job_queue.stop()
+    await extraction_pool.stop()
+    await feedback_bank.stop()
+    await close_gemini_client()
+    # Guardar los turnos de chat que siguen en la cola antes de cerrar Mongo
+    try:
+        await session_cache.close()
+    except Exception as e:
+        print(f"❌ No se pudieron guardar conversaciones pendientes: {e}")
     db.close()
 
 app = FastAPI(
@@ -32,12 +59,36 @@ app.add_middleware(
     allow_credentials=True,      # Permite cookies/headers de autenticación
     allow_methods=["*"],         # Permite GET, POST, PUT, DELETE, etc.
     allow_headers=["*"],         # Permite todos los headers
+    expose_headers=["X-Next-Cursor", "Retry-After"],  # Legibles desde el navegador
 )
 
+# Ruta actual disponible para las métricas de IA (ver app/infrastructure/metrics.py)
+app.add_middleware(RouteContextMiddleware)
+
+# IA saturada -> 429 con Retry-After (en vez de una respuesta degradada)
+@app.exception_handler(LLMOverloadedError)
+async def llm_overloaded_handler(request: Request, exc: LLMOverloadedError):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "La IA está atendiendo a muchos alumnos. Intenta de nuevo en unos segundos."},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+# Contenido que no cabe en el presupuesto de tokens -> 413/422 sin llamar a la IA
+@app.exception_handler(PromptBudgetError)
+async def prompt_budget_handler(request: Request, exc: PromptBudgetError):
+    return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail})
+
+# Chat de otro usuario (session_id ajeno en /send o /send/stream) -> 403
+@app.exception_handler(ConversationAccessError)
+async def conversation_access_handler(request: Request, exc: ConversationAccessError):
+    return JSONResponse(status_code=403, content={"detail": str(exc)})
+
 # Registrar Rutas
 app.include_router(auth_routes.router, prefix="/api/auth", tags=["Auth"])
 app.include_router(chat_routes.router, prefix="/api/chat", tags=["Chat"])
 app.include_router(reading_routes.router, prefix="/api/reading", tags=["Comprensión Lectora"])
+app.include_router(metrics_routes.router, tags=["Métricas"])
 
 @app.get("/")
 def read_root():
@@ -0,0 +1,37 @@
+import math
+from collections import Counter
+from typing import List, Tuple
+
+from app.utils.text_normalization import content_tokens
+
+
+class BM25Index:
+    """Índice léxico BM25 sobre una lista de pasajes (en memoria, sin dependencias)."""
+
+    def __init__(self, passages: List[str], k1: float = 1.5, b: float = 0.75):
+        self.passages = passages
+        self.k1 = k1
+        self.b = b
+        self.term_freqs = [Counter(content_tokens(p)) for p in passages]
+        self.lengths = [sum(tf.values()) for tf in self.term_freqs]
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+
+        doc_freq = Counter()
+        for tf in self.term_freqs:
+            doc_freq.update(tf.keys())
+        total = len(passages)
+        self.idf = {term: math.log(1 + (total - n + 0.5) / (n + 0.5)) for term, n in doc_freq.items()}
+
+    def search(self, query: str, k: int = 4) -> List[Tuple[int, float]]:
+        """Devuelve [(índice del pasaje, puntaje)] de mayor a menor, solo con puntaje > 0."""
+        terms = [t for t in set(content_tokens(query)) if t in self.idf]
+        if not terms:
+            return []
+        scores = []
+        for i, tf in enumerate(self.term_freqs):
+            norm = self.k1 * (1 - self.b + self.b * self.lengths[i] / (self.avg_length or 1))
+            score = sum(self.idf[t] * tf[t] * (self.k1 + 1) / (tf[t] + norm) for t in terms if t in tf)
+            if score > 0:
+                scores.append((i, score))
+        scores.sort(key=lambda item: item[1], reverse=True)
+        return scores[:k]
@@ -0,0 +1,62 @@
+import re
+from typing import List
+
+
+def _split_long_block(block: str, max_chars: int) -> List[str]:
+    """Corta un párrafo demasiado largo por oraciones y, si hace falta, a la fuerza."""
+    pieces = []
+    current = ""
+    for sentence in re.split(r"(?<=[.!?…])\s+", block):
+        while len(sentence) > max_chars:
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(sentence[:max_chars])
+            sentence = sentence[max_chars:]
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            pieces.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_into_sections(text: str, max_chars: int) -> List[str]:
+    """
+    Divide un texto en secciones de hasta max_chars caracteres respetando
+    los párrafos (líneas en blanco). Solo corta dentro de un párrafo si
+    ese párrafo por sí solo no entra.
+    """
+    paragraphs = [p.strip() for p in re.split(r"\n\s*\n", text or "") if p.strip()]
+    sections = []
+    current = ""
+    for paragraph in paragraphs:
+        blocks = [paragraph] if len(paragraph) <= max_chars else _split_long_block(paragraph, max_chars)
+        for block in blocks:
+            if current and len(current) + 2 + len(block) > max_chars:
+                sections.append(current)
+                current = block
+            else:
+                current = f"{current}\n\n{block}" if current else block
+    if current:
+        sections.append(current)
+    return sections
+
+
+def estimate_tokens(text: str) -> int:
+    # Aproximación suficiente para español: ~4 caracteres por token
+    return len(text or "") // 4 + 1
+
+
+def fit_to_tokens(text: str, max_tokens: int):
+    """
+    Recorta el texto para que quepa en max_tokens (estimados), cortando en un
+    límite de párrafo (o de oración si el primer párrafo no entra).
+    Devuelve (texto, recortado).
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text, False
+    sections = split_into_sections(text, max(1, max_tokens * 4 - 4))
+    return (sections[0] if sections else ""), True
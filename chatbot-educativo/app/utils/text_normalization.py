@@ -0,0 +1,70 @@
+import re
+import unicodedata
+from typing import List
+
+# Palabras vacías del español (sin tildes: se comparan ya normalizadas)
+SPANISH_STOP_WORDS = frozenset("""
+a al algo algun alguna algunas alguno algunos ante antes aqui asi aun bajo bien cada como con contra cual cuales
+cuando de del desde donde dos el ella ellas ellos en entre era eran es esa esas ese eso esos esta estaba estan
+estas este esto estos fue fueron ha habia han hasta hay la las le les lo los mas me mi mis muy nada ni no nos
+nosotros o otra otras otro otros para pero poco por porque pues que quien quienes se sea segun ser si sido
+sin sobre solo son su sus tambien tan tanto te tiene tienen todo todos tu tus un una unas uno unos usted y ya yo
+""".split())
+
+# Cambian el sentido de una pregunta: no se descartan en las claves de caché
+NEGATIONS = frozenset("no ni sin nunca jamas tampoco nadie ninguno ninguna".split())
+# Tampoco los interrogativos: '¿cuándo ocurre?' no es '¿dónde ocurre?'. 'por qué' y 'para qué'
+# se unen en un solo token (porque, paraque)
+INTERROGATIVES = frozenset("""
+que como cual cuales cuando donde adonde quien quienes cuanto cuanta cuantos cuantas porque paraque
+""".split())
+_JOINED_INTERROGATIVES = {("por", "que"): "porque", ("para", "que"): "paraque"}
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def fold_accents(text: str) -> str:
+    """'Fotosíntesis' -> 'fotosintesis' (minúsculas y sin tildes; la ñ pasa a n)."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def _stem(word: str) -> str:
+    # Plurales simples: 'lecturas' y 'lectura' cuentan como la misma palabra
+    if len(word) > 5 and word.endswith("es"):
+        return word[:-2]
+    if len(word) > 4 and word.endswith("s"):
+        return word[:-1]
+    return word
+
+
+def content_tokens(text: str) -> List[str]:
+    """Palabras con contenido (para BM25): sin tildes, en minúsculas, sin palabras vacías y sin plural."""
+    return [
+        _stem(word)
+        for word in _WORD_RE.findall(fold_accents(text or ""))
+        if len(word) > 1 and word not in SPANISH_STOP_WORDS
+    ]
+
+
+def key_tokens(text: str) -> List[str]:
+    """
+    Como content_tokens pero para claves de caché: conserva las negaciones, los
+    interrogativos y los números ('no quiere' no es 'quiere'; 'cuándo' no es
+    'dónde'; 'párrafo 3' no es 'párrafo 4').
+    """
+    words = _WORD_RE.findall(fold_accents(text or ""))
+    tokens, i = [], 0
+    while i < len(words):
+        word = words[i]
+        joined = _JOINED_INTERROGATIVES.get((word, words[i + 1])) if i + 1 < len(words) else None
+        if joined:
+            tokens.append(joined)
+            i += 2
+            continue
+        i += 1
+        if word.isdigit() or word in NEGATIONS or word in INTERROGATIVES:
+            tokens.append(word)
+        elif len(word) > 1 and word not in SPANISH_STOP_WORDS:
+            tokens.append(_stem(word))
+    return tokens
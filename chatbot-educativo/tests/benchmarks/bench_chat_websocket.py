@@ -0,0 +1,185 @@
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from contextlib import redirect_stdout
+from io import StringIO
+
+# Permite ejecutar el script desde la carpeta del backend: python tests/benchmarks/...
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+# IA simulada y planificador sin límites: medimos el servidor, no la cuota de Gemini
+os.environ["LLM_PROVIDER"] = "fake"
+os.environ["FAKE_LLM_LATENCY_MS"] = "0"
+os.environ["FAKE_LLM_STREAM_CHUNK_MS"] = "0"
+os.environ["LLM_MAX_IN_FLIGHT"] = "10000"
+os.environ["LLM_REQUESTS_PER_MINUTE"] = "100000000"
+os.environ["LLM_MAX_QUEUE"] = "100000"
+
+import httpx
+
+from app.main import app
+from app.domain.entities.user import User
+from app.domain.repositories.conversation_repository import ConversationRepository
+from app.infrastructure.ai.gemini_client import get_gemini_client
+from app.infrastructure.security.jwt_handler import JWTHandler
+from app.interfaces.api import dependencies
+
+OVERHEAD_MESSAGES = 200
+CONNECTIONS = 300
+MESSAGES_PER_CONNECTION = 3
+LLM_LATENCY_MS = 800
+STREAM_CHUNK_MS = 30
+USER_LOOKUP_MS = 2  # ida y vuelta típica a Mongo para get_by_email
+
+
+class BenchUserRepository:
+    def __init__(self):
+        self.lookups = 0
+
+    async def get_by_email(self, email: str):
+        self.lookups += 1
+        await asyncio.sleep(USER_LOOKUP_MS / 1000)
+        return User(_id=email, email=email, hashed_password="x")
+
+
+class MemoryConversationRepository(ConversationRepository):
+    def __init__(self):
+        self.items = {}
+
+    async def save(self, conversation):
+        self.items[conversation.id] = conversation
+
+    async def get_by_id(self, id):
+        return self.items.get(id)
+
+    async def get_all_by_user(self, user_id):
+        return [c for c in self.items.values() if c.user_id == user_id]
+
+    async def list_summaries(self, user_id, limit=50, cursor=None):
+        return [], None
+
+
+class AsgiWebSocket:
+    """Cliente WebSocket en memoria: habla ASGI directamente con la app (sin red)."""
+
+    def __init__(self, path: str, query: str = ""):
+        self.scope = {
+            "type": "websocket", "asgi": {"version": "3.0"}, "path": path, "raw_path": path.encode(),
+            "query_string": query.encode(), "headers": [(b"host", b"bench")], "scheme": "ws",
+            "server": ("bench", 80), "client": ("127.0.0.1", 5000), "subprotocols": [], "root_path": "",
+        }
+        self.inbox = asyncio.Queue()
+        self.outbox = asyncio.Queue()
+        self.task = None
+
+    async def connect(self):
+        self.task = asyncio.create_task(app(self.scope, self.inbox.get, self.outbox.put))
+        await self.inbox.put({"type": "websocket.connect"})
+        accepted = await self.outbox.get()
+        assert accepted["type"] == "websocket.accept", accepted
+        assert (await self.receive_json())["type"] == "ready"
+
+    async def send_json(self, data: dict):
+        await self.inbox.put({"type": "websocket.receive", "text": json.dumps(data)})
+
+    async def receive_json(self) -> dict:
+        message = await self.outbox.get()
+        if message["type"] == "websocket.close":
+            raise ConnectionError(f"Conexión cerrada: {message.get('code')}")
+        return json.loads(message["text"])
+
+    async def ask(self, text: str) -> dict:
+        await self.send_json({"message": text})
+        while True:
+            event = await self.receive_json()
+            if event["type"] in ("done", "error"):
+                return event
+
+    async def close(self):
+        await self.inbox.put({"type": "websocket.disconnect", "code": 1000})
+        await self.task
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+async def overhead_http(token: str) -> float:
+    transport = httpx.ASGITransport(app=app)
+    headers = {"Authorization": f"Bearer {token}"}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        session_id = None
+        start = time.perf_counter()
+        for i in range(OVERHEAD_MESSAGES):
+            response = await http.post("/api/chat/send/stream", json={"message": f"hola {i}", "session_id": session_id}, headers=headers)
+            done = [line for line in response.text.splitlines() if line.startswith("data:")][-1]
+            session_id = json.loads(done[5:])["session_id"]
+        return (time.perf_counter() - start) / OVERHEAD_MESSAGES * 1000
+
+
+async def overhead_websocket(token: str) -> float:
+    ws = AsgiWebSocket("/api/chat/ws", f"token={token}")
+    await ws.connect()
+    start = time.perf_counter()
+    for i in range(OVERHEAD_MESSAGES):
+        await ws.ask(f"hola {i}")
+    elapsed = time.perf_counter() - start
+    await ws.close()
+    return elapsed / OVERHEAD_MESSAGES * 1000
+
+
+async def student(token: str, index: int, latencies: list, errors: list):
+    ws = AsgiWebSocket("/api/chat/ws", f"token={token}")
+    await ws.connect()
+    for i in range(MESSAGES_PER_CONNECTION):
+        start = time.perf_counter()
+        event = await ws.ask(f"Alumno {index}: duda número {i} sobre la lectura")
+        if event["type"] == "done":
+            latencies.append((time.perf_counter() - start) * 1000)
+        else:
+            errors.append(event)
+    await ws.close()
+
+
+async def run_benchmark():
+    user_repo = BenchUserRepository()
+    conversation_repo = MemoryConversationRepository()
+    app.dependency_overrides[dependencies.get_user_repository] = lambda: user_repo
+    app.dependency_overrides[dependencies.get_conversation_repository] = lambda: conversation_repo
+    token = JWTHandler().create_token("alumno@bench.test")
+
+    print("--- 🔌 CHAT POR WEBSOCKET vs HTTP (IA simulada) ---")
+    with redirect_stdout(StringIO()):
+        http_ms = await overhead_http(token)
+        http_lookups = user_repo.lookups
+        ws_ms = await overhead_websocket(token)
+        ws_lookups = user_repo.lookups - http_lookups
+    print(f"Mensajes: {OVERHEAD_MESSAGES} seguidos, latencia de IA = 0 (solo overhead del servidor)")
+    print(f"   HTTP /send/stream: {http_ms:7.2f} ms/mensaje  ({http_lookups} búsquedas de usuario)")
+    print(f"   WebSocket /ws:     {ws_ms:7.2f} ms/mensaje  ({ws_lookups} búsqueda de usuario)")
+
+    provider = get_gemini_client().provider
+    provider.latency_ms = LLM_LATENCY_MS
+    provider.stream_chunk_ms = STREAM_CHUNK_MS
+    latencies, errors = [], []
+    with redirect_stdout(StringIO()):
+        start = time.perf_counter()
+        await asyncio.gather(*(student(token, i, latencies, errors) for i in range(CONNECTIONS)))
+        elapsed = time.perf_counter() - start
+
+    total = CONNECTIONS * MESSAGES_PER_CONNECTION
+    print(f"\nConexiones simultáneas: {CONNECTIONS} x {MESSAGES_PER_CONNECTION} mensajes (IA ~{LLM_LATENCY_MS} ms)")
+    print(f"   Completados: {len(latencies)}/{total}  errores: {len(errors)}")
+    if latencies:
+        print(f"   Latencia p50: {statistics.median(latencies):7.0f} ms   p95: {percentile(latencies, 0.95):7.0f} ms")
+    print(f"   Tiempo total: {elapsed:6.2f} s  ({total / elapsed:.0f} mensajes/s)")
+
+    app.dependency_overrides.clear()
+
+
+if __name__ == "__main__":
+    asyncio.run(run_benchmark())
@@ -0,0 +1,113 @@
+import asyncio
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from io import StringIO
+
+# Permite ejecutar el script desde la carpeta del backend: python tests/benchmarks/...
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from pypdf import PdfReader
+
+from app.infrastructure.files.extraction_pool import ExtractionPool
+
+PAGES = int(os.getenv("BENCH_PDF_PAGES", "200"))
+UPLOADS = int(os.getenv("BENCH_UPLOADS", "4"))
+TICK_SECONDS = 0.005
+
+
+def build_sample_pdf(pages: int, lines_per_page: int = 45) -> bytes:
+    """PDF de texto sin dependencias extra (pypdf no sabe escribir texto)."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for page in range(pages):
+        lines = " ".join(
+            f"({'Linea ' + str(line) + ' de la pagina ' + str(page) + ': la comprension lectora mejora con practica diaria.'}) Tj 0 -15 Td"
+            for line in range(lines_per_page)
+        )
+        stream = f"BT /F1 10 Tf 40 780 Td {lines} ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        content_id = len(objects)
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {content_id} 0 R /Resources << /Font << /F1 3 0 R >> >> >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>"
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1"))
+    xref = out.tell()
+    out.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+    for offset in offsets:
+        out.write(f"{offset:010d} 00000 n \n".encode())
+    out.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+    return out.getvalue()
+
+
+async def measure_loop_lag(stop: asyncio.Event) -> list:
+    """Cuánto se retrasa un sleep(5 ms): es lo que espera cualquier otra petición (chat, login)."""
+    lags = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK_SECONDS)
+        lags.append((time.perf_counter() - start - TICK_SECONDS) * 1000)
+    return lags
+
+
+async def run_uploads(extract) -> tuple:
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(measure_loop_lag(stop))
+    await asyncio.sleep(0.05)
+    start = time.perf_counter()
+    texts = await asyncio.gather(*[extract() for _ in range(UPLOADS)])
+    elapsed = time.perf_counter() - start
+    stop.set()
+    lags = await ticker
+    assert all(len(t) > 1000 for t in texts), "la extracción no devolvió texto"
+    return elapsed, lags
+
+
+def report(label: str, elapsed: float, lags: list):
+    lags = sorted(lags)
+    p99 = lags[int(len(lags) * 0.99) - 1] if len(lags) > 1 else lags[0]
+    print(f"   {label:<30} total {elapsed:6.2f} s | lag p50 {statistics.median(lags):8.1f} ms"
+          f" | p99 {p99:8.1f} ms | máx {lags[-1]:8.1f} ms | {len(lags)} ticks")
+
+
+async def run_benchmark():
+    pdf = build_sample_pdf(PAGES)
+    print("--- ⏱️ LATENCIA DEL EVENT LOOP DURANTE SUBIDAS DE PDF ---")
+    print(f"{UPLOADS} subidas concurrentes de un PDF de {PAGES} páginas ({len(pdf) / 1024:.0f} KB), CPUs: {os.cpu_count()}")
+    print(f"(un tick = un sleep de {TICK_SECONDS * 1000:.0f} ms; con el loop bloqueado casi no hay ticks)")
+
+    async def inline():
+        # Comportamiento anterior: la ruta async llamaba a pypdf directamente
+        return "\n".join(page.extract_text() or "" for page in PdfReader(io.BytesIO(pdf)).pages)
+
+    elapsed, lags = await run_uploads(inline)
+    report("Antes  (en el event loop)", elapsed, lags)
+
+    # Ahora la ruta guarda la subida en un temporal y los workers leen desde disco
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    with os.fdopen(fd, "wb") as f:
+        f.write(pdf)
+    pool = ExtractionPool(max_workers=max(1, min(UPLOADS, os.cpu_count() or 1)), timeout_seconds=120)
+    with redirect_stdout(StringIO()):
+        await pool.start()
+    try:
+        with redirect_stdout(StringIO()):
+            elapsed, lags = await run_uploads(lambda: pool.extract("pdf", path))
+        report(f"Ahora  (pool de {pool.max_workers} procesos)", elapsed, lags)
+    finally:
+        await pool.stop()
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    asyncio.run(run_benchmark())
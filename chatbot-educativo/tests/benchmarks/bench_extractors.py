@@ -0,0 +1,133 @@
+import asyncio
+import os
+import re
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from io import StringIO
+
+# Permite ejecutar el script desde la carpeta del backend: python tests/benchmarks/...
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.infrastructure.files.extraction_pool import ExtractionPool
+from app.infrastructure.files.extractors import sniff_format
+
+# Uso: python tests/benchmarks/bench_extractors.py [carpeta con PDF/DOCX/TXT]
+# Sin carpeta se genera un corpus sintético. BENCH_REPEAT = repeticiones por archivo (se toma la mejor).
+REPEAT = int(os.getenv("BENCH_REPEAT", "3"))
+
+# nombre -> (formatos que sabe leer, async extract(fmt, path) -> texto). El primero es la referencia.
+BACKENDS = {}
+
+
+def backend(name: str, formats=("pdf", "docx", "txt")):
+    def decorator(func):
+        BACKENDS[name] = (set(formats), func)
+        return func
+    return decorator
+
+
+@backend("registro (en serie)")
+async def registry_serial(fmt, path):
+    if fmt.paged:
+        return "\n".join(fmt.extract(path, 0, fmt.count_pages(path)))
+    return "\n".join(fmt.extract(path))
+
+
+_pool = ExtractionPool(max_workers=max(1, os.cpu_count() or 1), timeout_seconds=300)
+
+
+@backend(f"pool ({_pool.max_workers} procesos)")
+async def registry_pool(fmt, path):
+    return await _pool.extract(fmt, path)
+
+
+# Alternativas opcionales: solo se miden si la librería está instalada
+try:
+    import fitz  # PyMuPDF
+
+    @backend("pymupdf", formats=("pdf",))
+    async def pymupdf(fmt, path):
+        with fitz.open(path) as doc:
+            return "\n".join(page.get_text() for page in doc)
+except ImportError:
+    pass
+
+try:
+    from pdfminer.high_level import extract_text as pdfminer_extract_text
+
+    @backend("pdfminer.six", formats=("pdf",))
+    async def pdfminer(fmt, path):
+        return pdfminer_extract_text(path)
+except ImportError:
+    pass
+
+
+def build_corpus(folder: str) -> list:
+    """Un PDF, un DOCX y un TXT de ejemplo."""
+    import docx
+    from bench_extraction_event_loop import build_sample_pdf
+
+    sentence = "La comprensión lectora mejora con práctica diaria y buenas preguntas. "
+    paths = [os.path.join(folder, name) for name in ("muestra.pdf", "muestra.docx", "muestra.txt")]
+    with open(paths[0], "wb") as f:
+        f.write(build_sample_pdf(150))
+    document = docx.Document()
+    for i in range(2000):
+        document.add_paragraph(f"Párrafo {i}. " + sentence * 3)
+    document.save(paths[1])
+    with open(paths[2], "w", encoding="utf-8") as f:
+        for i in range(20000):
+            f.write(f"Línea {i}. {sentence}\n")
+    return paths
+
+
+def words(text: str) -> set:
+    return set(re.findall(r"\w+", text.lower()))
+
+
+async def measure(func, fmt, path) -> tuple:
+    best, text = None, ""
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        with redirect_stdout(StringIO()):
+            text = await func(fmt, path)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, text
+
+
+async def run_benchmark(paths: list):
+    print("--- 📚 COMPARACIÓN DE EXTRACTORES ---")
+    print(f"{len(paths)} archivos, mejor de {REPEAT} repeticiones, CPUs: {os.cpu_count()}")
+    with redirect_stdout(StringIO()):
+        await _pool.start()
+    try:
+        for path in paths:
+            fmt = sniff_format(path)
+            if fmt is None or fmt.is_image:
+                print(f"\n{os.path.basename(path)}: formato no soportado, se omite")
+                continue
+            print(f"\n{os.path.basename(path)} ({fmt.name}, {os.path.getsize(path) / 1024:.0f} KB)")
+            reference = None
+            for name, (formats, func) in BACKENDS.items():
+                if fmt.name not in formats:
+                    continue
+                elapsed, text = await measure(func, fmt, path)
+                if reference is None:
+                    reference = words(text)
+                overlap = len(words(text) & reference) / len(reference) * 100 if reference else 0.0
+                print(f"   {name:<22} {elapsed * 1000:9.1f} ms | {len(text):9d} caracteres | {overlap:5.1f}% de las palabras de la referencia")
+    finally:
+        await _pool.stop()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        folder = sys.argv[1]
+        asyncio.run(run_benchmark(sorted(os.path.join(folder, f) for f in os.listdir(folder))))
+    else:
+        with tempfile.TemporaryDirectory() as folder:
+            asyncio.run(run_benchmark(build_corpus(folder)))
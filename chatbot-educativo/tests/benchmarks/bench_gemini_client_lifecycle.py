@@ -0,0 +1,62 @@
+import os
+import sys
+import time
+import warnings
+from contextlib import redirect_stdout
+from io import StringIO
+
+# Permite ejecutar el script desde la carpeta del backend: python tests/benchmarks/...
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from app.infrastructure.ai import gemini_client
+
+ITERATIONS = 200
+
+
+def per_request_client():
+    """
+    Comportamiento anterior, fijado aquí: GeminiClient() por request configuraba
+    el SDK y construía el GenerativeModel en cada llamada. No se usa el
+    GeminiClient actual (con proveedor, scheduler y caches) para no medir otra cosa.
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        import google.generativeai as genai
+    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+    return genai.GenerativeModel(
+        model_name="gemini-2.5-flash",
+        system_instruction="Eres EduBot, un profesor experto. Tu objetivo es evaluar y enseñar comprensión lectora con precisión pedagógica.",
+    )
+
+
+def shared_client():
+    # Comportamiento actual: el cliente creado en el lifespan
+    return gemini_client.get_gemini_client()
+
+
+def measure(factory) -> float:
+    # Silenciamos los print() del cliente para no medir la consola
+    with redirect_stdout(StringIO()):
+        factory()  # calentamiento
+        start = time.perf_counter()
+        for _ in range(ITERATIONS):
+            factory()
+        elapsed = time.perf_counter() - start
+    return elapsed / ITERATIONS * 1_000_000
+
+
+def run_benchmark():
+    print("--- ⏱️ COSTO POR REQUEST DE OBTENER EL CLIENTE DE IA ---")
+    print(f"Iteraciones: {ITERATIONS} (no se hacen llamadas de red)")
+
+    before = measure(per_request_client)
+    after = measure(shared_client)
+
+    print(f"   Antes  (SDK + modelo por request):   {before:10.1f} µs/request")
+    print(f"   Ahora  (cliente del lifespan):       {after:10.1f} µs/request")
+    if after > 0:
+        print(f"   -> {before / after:.0f}x menos overhead por request")
+
+
+if __name__ == "__main__":
+    run_benchmark()
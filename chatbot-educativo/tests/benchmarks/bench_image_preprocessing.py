@@ -0,0 +1,66 @@
+import asyncio
+import io
+import os
+import random
+import sys
+import time
+from contextlib import redirect_stdout
+from io import StringIO
+
+# Permite ejecutar el script desde la carpeta del backend: python tests/benchmarks/...
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from PIL import Image, ImageDraw
+
+from app.infrastructure.ai.image_preprocessing import prepare_image
+
+# Subida hacia el proveedor de IA (Mbit/s): es lo que paga cada byte de más
+UPLINK_MBPS = float(os.getenv("BENCH_UPLINK_MBPS", "20"))
+PHOTOS = int(os.getenv("BENCH_PHOTOS", "3"))
+
+
+def build_worksheet_photo(width: int = 4032, height: int = 3024, seed: int = 0) -> bytes:
+    """Foto de móvil de una hoja impresa: papel con ruido de sensor, texto, JPEG q95 y rotación en EXIF."""
+    rng = random.Random(seed)
+    noise = Image.frombytes("L", (width, height), rng.randbytes(width * height))
+    paper = Image.merge("RGB", [noise.point(lambda v: 210 + v // 8 + shift) for shift in (6, 3, 0)])
+    draw = ImageDraw.Draw(paper)
+    for line in range(60):
+        y = 150 + line * 45
+        draw.text((200, y), f"{line + 1}. La comprension lectora mejora con practica diaria y buenas preguntas.", fill=(30, 30, 40))
+        draw.rectangle((200, y + 20, 200 + rng.randint(1500, 3600), y + 24), fill=(60, 60, 70))
+    exif = Image.Exif()
+    exif[0x0112] = 6  # girada 90°: como la guarda el móvil
+    out = io.BytesIO()
+    paper.save(out, "JPEG", quality=95, exif=exif)
+    return out.getvalue()
+
+
+def transfer_seconds(size: int) -> float:
+    return size * 8 / (UPLINK_MBPS * 1_000_000)
+
+
+async def run_benchmark():
+    print("--- 🖼️ IMÁGENES ANTES DE LA IA (VISIÓN) ---")
+    print(f"{PHOTOS} fotos de 12 MP, subida a {UPLINK_MBPS:.0f} Mbit/s")
+    before_total = after_total = 0.0
+    for seed in range(PHOTOS):
+        photo = build_worksheet_photo(seed=seed)
+        start = time.perf_counter()
+        with redirect_stdout(StringIO()):
+            prepared, mime = await prepare_image(photo, "image/jpeg")
+        prep = time.perf_counter() - start
+        with Image.open(io.BytesIO(prepared)) as image:
+            shape = f"{image.size[0]}x{image.size[1]} {image.mode}"
+
+        before = transfer_seconds(len(photo))
+        after = prep + transfer_seconds(len(prepared))
+        before_total += before
+        after_total += after
+        print(f"   foto {seed + 1}: {len(photo) / 1024 / 1024:5.1f} MB -> {len(prepared) / 1024:6.0f} KB ({shape})"
+              f" | preparar {prep * 1000:5.0f} ms | antes {before * 1000:6.0f} ms -> ahora {after * 1000:6.0f} ms")
+    print(f"   Total: subida + preparación {before_total:.2f} s -> {after_total:.2f} s")
+
+
+if __name__ == "__main__":
+    asyncio.run(run_benchmark())
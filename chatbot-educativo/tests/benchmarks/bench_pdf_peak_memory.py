@@ -0,0 +1,98 @@
+import asyncio
+import io
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from io import StringIO
+
+# Permite ejecutar el script desde la carpeta del backend: python tests/benchmarks/...
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+PAGES = int(os.getenv("BENCH_PDF_PAGES", "600"))
+
+
+def legacy_extract(path: str) -> str:
+    """Comportamiento anterior: el archivo entero en memoria, un BytesIO y texto acumulado con +=."""
+    import pypdf
+    with open(path, "rb") as f:
+        data = f.read()
+    reader = pypdf.PdfReader(io.BytesIO(data))
+    text = ""
+    for page in reader.pages:
+        extracted = page.extract_text()
+        if extracted:
+            text += extracted + "\n"
+    return text
+
+
+def streaming_extract(path: str) -> int:
+    """Ahora: mmap del archivo y un generador de páginas (sin copia de bytes ni texto acumulado con +=)."""
+    from app.infrastructure.files.extractors import iter_pdf_pages
+    chars = 0
+    for page in iter_pdf_pages(path):
+        chars += len(page) + 1
+    return chars
+
+
+def measure(variant: str, path: str):
+    """Se ejecuta en un proceso nuevo: el pico de memoria (ru_maxrss) es solo de esa variante."""
+    import pypdf  # noqa: F401 (la librería cuenta igual en las dos variantes)
+    import app.infrastructure.files.extractors  # noqa: F401
+    base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    with redirect_stdout(StringIO()):
+        (legacy_extract if variant == "legacy" else streaming_extract)(path)
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"{base} {peak} {elapsed}")
+
+
+def run_variant(variant: str, path: str) -> tuple:
+    out = subprocess.run([sys.executable, __file__, "--measure", variant, path],
+                         capture_output=True, text=True, check=True).stdout.split()
+    base, peak, elapsed = int(out[0]), int(out[1]), float(out[2])
+    return (peak - base) / 1024, peak / 1024, elapsed
+
+
+async def run_parallel(path: str) -> float:
+    from app.infrastructure.files.extraction_pool import ExtractionPool
+    pool = ExtractionPool(max_workers=max(1, os.cpu_count() or 1), timeout_seconds=300, pages_per_chunk=20)
+    with redirect_stdout(StringIO()):
+        await pool.start()
+    try:
+        start = time.perf_counter()
+        with redirect_stdout(StringIO()):
+            await pool.extract("pdf", path)
+        return time.perf_counter() - start
+    finally:
+        await pool.stop()
+
+
+def run_benchmark():
+    from bench_extraction_event_loop import build_sample_pdf
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    with os.fdopen(fd, "wb") as f:
+        f.write(build_sample_pdf(PAGES))
+    try:
+        size_mb = os.path.getsize(path) / 1024 / 1024
+        print("--- 🧠 MEMORIA Y TIEMPO AL EXTRAER UN PDF GRANDE ---")
+        print(f"PDF de {PAGES} páginas ({size_mb:.1f} MB), CPUs: {os.cpu_count()}")
+        for variant, label in (("legacy", "Antes  (bytes + BytesIO + +=)"), ("streaming", "Ahora  (mmap + página a página)")):
+            growth, peak, elapsed = run_variant(variant, path)
+            print(f"   {label:<34} pico RSS {peak:7.1f} MB (+{growth:6.1f} MB al extraer) | {elapsed:6.2f} s")
+        elapsed = asyncio.run(run_parallel(path))
+        print(f"   {'Pool por bloques de 20 páginas':<34} {'':>36} | {elapsed:6.2f} s")
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "--measure":
+        measure(sys.argv[2], sys.argv[3])
+    else:
+        run_benchmark()
@@ -0,0 +1,15 @@
+import os
+import sys
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+# Permite ejecutar pytest desde la carpeta del backend: python -m pytest tests
+# (dependencias de prueba en requirements-dev.txt)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+@pytest.fixture
+def db():
+    """Base de datos en memoria (mongomock-motor): misma API async que Motor, sin servidor."""
+    return AsyncMongoMockClient()["chatbot_test"]
@@ -0,0 +1,99 @@
+from app.domain.entities.conversation import Conversation, Message
+from app.domain.services.history_manager import HistoryManager, format_messages
+
+
+class Summarizer:
+    """Cliente de IA falso: anota qué se le pidió resumir."""
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.calls = []
+
+    async def summarize_conversation(self, previous, text):
+        self.calls.append((previous, text))
+        if self.fail:
+            raise RuntimeError("IA no disponible")
+        return f"resumen {len(self.calls)}"
+
+
+def conversation(count: int, summarized_count: int = 0, summary: str = None) -> Conversation:
+    messages = [Message(role="user" if i % 2 == 0 else "model", content=f"m{i}") for i in range(count)]
+    return Conversation(user_id="u1", messages=messages, summary=summary, summarized_count=summarized_count)
+
+
+# --- CONTEXTO ---
+def test_context_is_the_summary_and_exactly_the_unsummarized_tail():
+    history = HistoryManager(Summarizer(), max_messages=3, token_budget=1000)
+    chat = conversation(10, summarized_count=4, summary="hablaron de m0-m3")
+
+    context = history.build_context(chat)
+
+    # Más que la ventana de 3: lo que espera a completar un lote también va, nada queda en un hueco
+    assert context == "Resumen de la conversación anterior: hablaron de m0-m3\n" + format_messages(chat.messages[4:])
+
+
+def test_context_without_summary_has_only_messages():
+    history = HistoryManager(Summarizer(), max_messages=12, token_budget=1000)
+    chat = conversation(3)
+    assert history.build_context(chat) == "user: m0\nmodel: m1\nuser: m2\n"
+
+
+def test_token_budget_keeps_the_newest_messages():
+    history = HistoryManager(Summarizer(), max_messages=12, token_budget=4)
+    chat = conversation(6)
+    # Cada mensaje "mN" cuesta 1 token estimado: entran los 4 más nuevos
+    assert history.build_context(chat) == format_messages(chat.messages[2:])
+
+    chat.messages.append(Message(role="user", content="x" * 400))
+    # El último mensaje entra siempre, aunque solo él pase del presupuesto
+    assert history.build_context(chat) == format_messages(chat.messages[-1:])
+
+
+# --- RESUMEN ---
+async def test_compact_waits_for_a_full_batch():
+    ai = Summarizer()
+    history = HistoryManager(ai, max_messages=4, summary_batch=3)
+    chat = conversation(6)
+    assert not await history.compact(chat)
+    assert ai.calls == [] and chat.summarized_count == 0
+
+
+async def test_compact_folds_only_new_messages_outside_the_window():
+    ai = Summarizer()
+    history = HistoryManager(ai, max_messages=4, summary_batch=2)
+    chat = conversation(10, summarized_count=2, summary="antes")
+
+    assert await history.compact(chat)
+
+    # Se resumen m2..m5 (m0 y m1 ya estaban en el resumen; m6..m9 son la ventana)
+    assert ai.calls == [("antes", format_messages(chat.messages[2:6]))]
+    assert chat.summary == "resumen 1" and chat.summarized_count == 6
+
+
+async def test_compact_later_advances_the_watermark_and_persists():
+    history = HistoryManager(Summarizer(), max_messages=4, summary_batch=2)
+    chat = conversation(8)
+    persisted = []
+
+    async def persist(conversation):
+        persisted.append((conversation.summary, conversation.summarized_count))
+
+    await history.compact_later(chat, persist)
+
+    assert chat.summarized_count == 4
+    assert persisted == [("resumen 1", 4)]
+    assert history.build_context(chat) == "Resumen de la conversación anterior: resumen 1\n" + format_messages(chat.messages[4:])
+
+
+async def test_failed_summary_keeps_the_watermark_and_skips_persist():
+    history = HistoryManager(Summarizer(fail=True), max_messages=4, summary_batch=2)
+    chat = conversation(8)
+    persisted = []
+
+    async def persist(conversation):
+        persisted.append(conversation)
+
+    await history.compact_later(chat, persist)
+
+    assert chat.summarized_count == 0 and chat.summary is None
+    assert persisted == []
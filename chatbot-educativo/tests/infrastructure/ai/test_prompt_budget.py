@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config.settings import settings
+from app.infrastructure.ai import gemini_client, prompt_budget
+from app.infrastructure.ai.gemini_client import GeminiClient
+from app.infrastructure.ai.prompt_budget import PromptBudgetError
+from app.infrastructure.ai.providers.fake_provider import FakeProvider
+from app.interfaces.api.routes import auth_routes
+from app.main import app
+
+
+class CountingProvider(FakeProvider):
+    """Proveedor simulado que cuenta las llamadas reales a la IA."""
+
+    def __init__(self):
+        super().__init__(latency_ms=0, stream_chunk_ms=0)
+        self.calls = 0
+
+    async def generate(self, method, contents, generation_config=None, model_name=None):
+        self.calls += 1
+        return await super().generate(method, contents, generation_config, model_name)
+
+
+@pytest.fixture
+def provider():
+    return CountingProvider()
+
+
+@pytest.fixture
+def api(provider):
+    client = GeminiClient(provider)
+    app.dependency_overrides[gemini_client.get_gemini_client] = lambda: client
+    app.dependency_overrides[auth_routes.get_current_user] = lambda: {"sub": "alumno@test"}
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+# --- RECHAZOS (antes de llamar a la IA) ---
+async def test_prompt_over_the_limit_is_413_without_calling_the_provider(provider, monkeypatch):
+    monkeypatch.setattr(settings, "PROMPT_MAX_INPUT_TOKENS", 10)
+    with pytest.raises(PromptBudgetError) as error:
+        await GeminiClient(provider)._generate("generate_content", "palabra " * 20)
+    assert error.value.status_code == 413
+    assert provider.calls == 0
+
+
+def test_too_many_questions_is_422(api, provider):
+    max_questions = settings.LLM_MAX_OUTPUT_TOKENS // settings.QUIZ_TOKENS_PER_QUESTION
+    response = api.post("/api/reading/analyze-text", json={"text": "Un texto breve de prueba.", "num_questions": max_questions + 1})
+    assert response.status_code == 422
+    assert str(max_questions) in response.json()["detail"]
+    assert provider.calls == 0
+
+
+@pytest.mark.parametrize("run_async", [False, True])
+def test_document_over_the_limit_is_413(api, provider, monkeypatch, run_async):
+    monkeypatch.setattr(settings, "PROMPT_DOCUMENT_MAX_TOKENS", 100)
+    response = api.post(f"/api/reading/analyze-text?async={str(run_async).lower()}", json={"text": "texto largo " * 100})
+    assert response.status_code == 413
+    assert provider.calls == 0
+
+
+def test_long_tutor_question_is_413(api, provider):
+    question = "¿" + "por qué " * settings.PROMPT_TUTOR_QUESTION_TOKENS + "?"
+    response = api.post("/api/reading/ask-tutor", json={"question": question, "context": "Una lección."})
+    assert response.status_code == 413
+    assert provider.calls == 0
+
+
+# --- USO POR PETICIÓN (contextvar) ---
+async def test_usage_counts_every_call_of_the_request(provider):
+    client = GeminiClient(provider)
+    usage = prompt_budget.track_usage()
+
+    await client.generate_content("a" * 40)
+    # Las tareas hijas (gather) heredan el contexto: suman en el mismo objeto
+    await asyncio.gather(client.generate_content("b" * 80), client.generate_content("c" * 120))
+
+    assert usage.calls == 3
+    assert usage.prompt_tokens == 11 + 21 + 31
+    assert usage.summary()["max_prompt_tokens"] == settings.PROMPT_MAX_INPUT_TOKENS
+
+
+async def test_concurrent_requests_do_not_share_usage(provider):
+    client = GeminiClient(provider)
+
+    async def request(prompts):
+        usage = prompt_budget.track_usage()
+        for prompt in prompts:
+            await client.generate_content(prompt)
+            await asyncio.sleep(0)
+        return usage.calls
+
+    # Cada petición corre en su propia tarea (como en uvicorn) y ve solo su uso
+    assert await asyncio.gather(
+        asyncio.create_task(request(["x", "y", "z"])), asyncio.create_task(request(["w"]))
+    ) == [3, 1]
+
+
+async def test_truncation_is_reported_in_the_usage(provider, monkeypatch):
+    monkeypatch.setattr(settings, "PROMPT_SUMMARY_TRANSCRIPT_TOKENS", 20)
+    usage = prompt_budget.track_usage()
+    transcript = "\n\n".join(f"user: pregunta número {i} sobre la lectura" for i in range(20))
+
+    await GeminiClient(provider).summarize_conversation(None, transcript)
+
+    assert usage.summary()["truncated"] == ["summarize_conversation"]
+    assert usage.calls == 1 and usage.prompt_tokens < 20 + 200  # transcripción recortada + instrucciones
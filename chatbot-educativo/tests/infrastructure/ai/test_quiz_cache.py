@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.infrastructure.ai import quiz_cache as quiz_cache_module
+from app.infrastructure.ai.quiz_cache import QuizCache
+
+QUIZ = [{"question": "¿Quién narra?", "options": ["A) Ana", "B) Luis"], "answer": "A) Ana", "explanation": "Lo dice el párrafo 1."}]
+
+
+# --- CLAVE DE CONTENIDO ---
+def test_key_ignores_whitespace_and_difficulty_case():
+    base = QuizCache.build_key("El  cuento\nde Ana.", 5, "Medio", "m")
+    assert QuizCache.build_key(" El cuento de Ana. ", 5, " medio ", "m") == base
+
+
+@pytest.mark.parametrize("changed", [
+    ("Otro cuento.", 5, "Medio", "m"),
+    ("El cuento de Ana.", 6, "Medio", "m"),
+    ("El cuento de Ana.", 5, "Difícil", "m"),
+    ("El cuento de Ana.", 5, "Medio", "otro-modelo"),
+])
+def test_key_changes_with_text_and_generation_params(changed):
+    assert QuizCache.build_key(*changed) != QuizCache.build_key("El cuento de Ana.", 5, "Medio", "m")
+
+
+def test_key_changes_with_prompt_version(monkeypatch):
+    before = QuizCache.build_key("El cuento de Ana.", 5, "Medio")
+    monkeypatch.setattr(quiz_cache_module, "QUIZ_PROMPT_VERSION", "v-test")
+    assert QuizCache.build_key("El cuento de Ana.", 5, "Medio") != before
+
+
+# --- TTL ---
+async def test_set_writes_expiry_and_ttl_index(db):
+    cache = QuizCache(db_provider=lambda: db, ttl_seconds=600)
+    await cache.set("k", QUIZ)
+
+    doc = await db["quiz_cache"].find_one({"_id": "k"})
+    assert doc["quiz"] == QUIZ
+    assert doc["expires_at"] - doc["created_at"] == timedelta(seconds=600)
+    indexes = await db["quiz_cache"].index_information()
+    assert any(index.get("expireAfterSeconds") == 0 and index["key"] == [("expires_at", 1)] for index in indexes.values())
+
+
+async def test_memory_entry_expires(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(quiz_cache_module.time, "monotonic", lambda: now[0])
+    cache = QuizCache(ttl_seconds=60)
+    await cache.set("k", QUIZ)
+    assert await cache.get("k") == QUIZ
+
+    now[0] += 61
+    assert await cache.get("k") is None
+    assert cache.stats()["entries_memory"] == 0
+
+
+async def test_expired_mongo_document_is_a_miss(db):
+    # Mongo borra por TTL cada ~60 s: entre tanto el documento vencido no se sirve
+    past = datetime.utcnow() - timedelta(seconds=1)
+    await db["quiz_cache"].insert_one({"_id": "k", "quiz": QUIZ, "created_at": past, "expires_at": past})
+    cache = QuizCache(db_provider=lambda: db)
+    assert await cache.get("k") is None
+    assert cache.misses == 1
+
+
+async def test_mongo_hit_warms_memory_and_returns_copies(db):
+    await QuizCache(db_provider=lambda: db).set("k", QUIZ)
+    cache = QuizCache(db_provider=lambda: db)
+
+    first = await cache.get("k")
+    first[0]["options"].reverse()
+    assert await cache.get("k") == QUIZ
+    assert (cache.hits_mongo, cache.hits_memory) == (1, 1)
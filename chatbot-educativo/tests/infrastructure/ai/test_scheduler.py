@@ -0,0 +1,98 @@
+import asyncio
+import json
+
+import pytest
+
+from app.infrastructure.ai import gemini_client
+from app.infrastructure.ai.gemini_client import GeminiClient
+from app.infrastructure.ai.providers.fake_provider import FakeProvider
+from app.infrastructure.ai.scheduler import LLMOverloadedError, LLMScheduler
+from app.main import llm_overloaded_handler
+
+
+class QuotaExhaustedProvider(FakeProvider):
+    """Simula el 429 de Gemini (el proveedor real lo traduce a LLMOverloadedError)."""
+
+    def __init__(self):
+        super().__init__(latency_ms=0)
+
+    async def generate(self, method, contents, generation_config=None, model_name=None):
+        raise LLMOverloadedError(60, "Cuota de Gemini agotada")
+
+
+def test_retry_after_is_a_whole_number_of_seconds():
+    assert LLMOverloadedError(0.2).retry_after == 1
+    assert LLMOverloadedError(2.1).retry_after == 3
+
+
+async def test_full_queue_is_rejected_immediately():
+    scheduler = LLMScheduler(max_in_flight=1, requests_per_minute=60, max_queue=0)
+    async with scheduler.slot():
+        with pytest.raises(LLMOverloadedError) as error:
+            async with scheduler.slot():
+                pass
+    # Vaciar la cola (1 en espera) a 1 solicitud por segundo
+    assert error.value.retry_after == 1
+    assert scheduler.stats()["rejected"] == 1
+
+
+async def test_queue_wait_is_bounded():
+    scheduler = LLMScheduler(max_in_flight=1, requests_per_minute=600, max_queue=5, max_wait_seconds=0.05)
+    async with scheduler.slot():
+        with pytest.raises(LLMOverloadedError) as error:
+            async with scheduler.slot():
+                pass
+    assert "tardó demasiado" in error.value.reason
+    assert scheduler.stats()["waiting"] == 0
+
+
+async def test_wait_for_a_rate_token_is_bounded():
+    # Hay lugar libre (3 simultáneas) pero solo 2 fichas: la tercera espera ficha ~1 s
+    scheduler = LLMScheduler(max_in_flight=3, requests_per_minute=60, max_queue=5, max_wait_seconds=0.05)
+    scheduler._bucket.capacity = scheduler._bucket.tokens = 2
+    for _ in range(2):
+        async with scheduler.slot():
+            pass
+    with pytest.raises(LLMOverloadedError) as error:
+        async with scheduler.slot():
+            pass
+    assert "tardó demasiado" in error.value.reason
+    assert scheduler.stats()["waiting"] == 0 and scheduler.stats()["rejected"] == 1
+
+
+async def test_no_rate_token_with_full_queue_is_rejected_immediately():
+    scheduler = LLMScheduler(max_in_flight=3, requests_per_minute=60, max_queue=0, max_wait_seconds=5)
+    scheduler._bucket.tokens = 0
+    with pytest.raises(LLMOverloadedError) as error:
+        async with scheduler.slot():
+            pass
+    assert error.value.retry_after == 1
+    assert scheduler.stats()["rejected"] == 1
+
+
+async def test_queued_call_runs_when_a_slot_frees():
+    scheduler = LLMScheduler(max_in_flight=1, requests_per_minute=6000, max_queue=5, max_wait_seconds=1)
+    order = []
+
+    async def call(name):
+        async with scheduler.slot():
+            order.append(name)
+            await asyncio.sleep(0.01)
+
+    await asyncio.gather(call("a"), call("b"))
+    assert order == ["a", "b"]
+    assert scheduler.stats()["admitted"] == 2
+
+
+async def test_provider_429_is_raised_not_degraded(db, monkeypatch):
+    monkeypatch.setattr(gemini_client.quiz_cache, "db_provider", lambda: db)
+    client = GeminiClient(QuotaExhaustedProvider())
+    with pytest.raises(LLMOverloadedError):
+        await client.generate_quiz("Un texto breve sobre la lectura diaria en casa.", 3)
+
+
+async def test_overloaded_becomes_429_with_retry_after():
+    response = await llm_overloaded_handler(None, LLMOverloadedError(7.5))
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "8"
+    assert "detail" in json.loads(response.body)
@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+
+from app.infrastructure.ai.gemini_client import GeminiClient
+from app.infrastructure.ai.providers.fake_provider import FakeProvider
+from app.infrastructure.ai.single_flight import SingleFlight
+
+
+class CountingProvider(FakeProvider):
+    """FakeProvider que cuenta las llamadas reales y puede fallar a propósito."""
+
+    def __init__(self, error: Exception = None):
+        super().__init__(latency_ms=50, latency_sigma=0)
+        self.calls = 0
+        self.error = error
+
+    async def generate(self, method, contents, generation_config=None, model_name=None):
+        self.calls += 1
+        response = await super().generate(method, contents, generation_config, model_name)
+        if self.error is not None:
+            raise self.error
+        return response
+
+
+async def test_identical_calls_share_one_request():
+    provider = CountingProvider()
+    client = GeminiClient(provider)
+
+    results = await asyncio.gather(*[client.generate_content("Explica la fotosíntesis") for _ in range(5)])
+
+    assert provider.calls == 1
+    assert len(set(results)) == 1
+    assert client.single_flight.stats() == {"executed": 1, "coalesced": 4, "in_flight": 0}
+
+
+async def test_different_prompts_are_not_grouped():
+    provider = CountingProvider()
+    client = GeminiClient(provider)
+    await asyncio.gather(client.generate_content("Tema A"), client.generate_content("Tema B"))
+    assert provider.calls == 2
+
+
+async def test_error_reaches_every_waiter_and_is_not_cached():
+    flight = SingleFlight()
+    calls = 0
+
+    async def failing():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.02)
+        raise RuntimeError("fallo de la IA")
+
+    results = await asyncio.gather(*[flight.do("k", failing) for _ in range(3)], return_exceptions=True)
+    assert calls == 1
+    assert all(isinstance(r, RuntimeError) and str(r) == "fallo de la IA" for r in results)
+
+    # La clave se libera: la siguiente llamada vuelve a intentarlo
+    with pytest.raises(RuntimeError):
+        await flight.do("k", failing)
+    assert calls == 2
+
+
+async def test_cancelled_waiter_does_not_cancel_the_shared_call():
+    flight = SingleFlight()
+
+    async def slow():
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    first = asyncio.create_task(flight.do("k", slow))
+    second = asyncio.create_task(flight.do("k", slow))
+    await asyncio.sleep(0.01)
+    first.cancel()
+
+    assert await second == "ok"
+    assert first.cancelled()
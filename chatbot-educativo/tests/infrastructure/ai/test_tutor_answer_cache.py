@@ -0,0 +1,46 @@
+import pytest
+
+from app.infrastructure.ai.tutor_answer_cache import TutorAnswerCache, meaning_markers, normalize_question
+
+LESSON = "leccion-fotosintesis"
+
+
+@pytest.mark.parametrize("stored, asked", [
+    ("¿Cuándo ocurre la fotosíntesis?", "¿Dónde ocurre la fotosíntesis?"),
+    ("¿Cuándo ocurre la fotosíntesis?", "¿Por qué ocurre la fotosíntesis?"),
+    ("¿Dónde ocurre la fotosíntesis?", "¿Por qué ocurre la fotosíntesis?"),
+    ("¿Por qué ocurre la fotosíntesis?", "¿Para qué ocurre la fotosíntesis?"),
+    ("¿Quién descubrió la penicilina?", "¿Cuándo se descubrió la penicilina?"),
+    ("¿Qué dice el párrafo 3?", "¿Qué dice el párrafo 4?"),
+    ("¿El personaje quiere volver?", "¿El personaje no quiere volver?"),
+])
+def test_questions_that_differ_in_meaning_do_not_share_an_answer(stored, asked):
+    assert normalize_question(stored) != normalize_question(asked)
+    cache = TutorAnswerCache(threshold=0.5)
+    cache.set(LESSON, stored, "respuesta a otra pregunta")
+    assert cache.get(LESSON, asked) is None
+
+
+def test_two_word_interrogatives_are_one_token():
+    assert normalize_question("¿Por qué ocurre?") == "porque ocurre"
+    assert normalize_question("¿Para qué sirve la clorofila?") == "paraque sirve clorofila"
+    assert meaning_markers("porque ocurre fotosintesi") == {"porque"}
+
+
+def test_same_question_with_different_form_is_a_hit():
+    cache = TutorAnswerCache()
+    cache.set(LESSON, "¿Cuándo ocurre la fotosíntesis?", "De día.")
+    assert cache.get(LESSON, "cuando ocurre la fotosintesis") == "De día."
+
+
+def test_near_duplicate_needs_the_same_interrogative():
+    cache = TutorAnswerCache(threshold=0.6)
+    cache.set(LESSON, "¿Dónde ocurre la fotosíntesis en las plantas?", "En los cloroplastos.")
+    assert cache.get(LESSON, "¿Dónde ocurre la fotosíntesis en la planta verde?") == "En los cloroplastos."
+    assert cache.get(LESSON, "¿Cuándo ocurre la fotosíntesis en la planta verde?") is None
+
+
+def test_questions_without_content_are_not_cached():
+    cache = TutorAnswerCache()
+    cache.set(LESSON, "¿Por qué?", "Depende de la pregunta anterior.")
+    assert cache.get(LESSON, "¿Por qué?") is None
@@ -0,0 +1,79 @@
+import asyncio
+
+from app.domain.entities.conversation import Conversation, Message
+from app.infrastructure.database.mongo.conversation_repository_impl import MongoConversationRepository
+
+
+def messages(*contents):
+    return [Message(role="user" if i % 2 == 0 else "model", content=c) for i, c in enumerate(contents)]
+
+
+async def append(repo, conversation_id: str, *contents):
+    new_messages = messages(*contents)
+    await repo.append_messages(Conversation(id=conversation_id, user_id="u1"), new_messages)
+
+
+async def buckets(db, conversation_id: str):
+    docs = await db["conversation_messages"].find({"conversation_id": conversation_id}).sort("bucket", 1).to_list(None)
+    return {doc["bucket"]: [(m["seq"], m["content"]) for m in doc["messages"]] for doc in docs}
+
+
+async def test_appends_roll_over_to_the_next_bucket(db):
+    repo = MongoConversationRepository(db, bucket_size=3)
+    await append(repo, "s1", "a", "b")
+    await append(repo, "s1", "c", "d", "e", "f", "g")
+
+    assert await buckets(db, "s1") == {
+        0: [(0, "a"), (1, "b"), (2, "c")],
+        1: [(3, "d"), (4, "e"), (5, "f")],
+        2: [(6, "g")],
+    }
+    # El documento principal solo lleva el contador, no los mensajes
+    main = await db["conversations"].find_one({"_id": "s1"})
+    assert main["message_count"] == 7 and main.get("messages") is None
+
+
+async def test_messages_load_in_order_across_buckets(db):
+    repo = MongoConversationRepository(db, bucket_size=2)
+    await append(repo, "s1", "a", "b", "c")
+    await append(repo, "s1", "d")
+    await append(repo, "s1", "e", "f")
+
+    conversation = await repo.get_by_id("s1")
+    assert [m.content for m in conversation.messages] == ["a", "b", "c", "d", "e", "f"]
+
+
+async def test_concurrent_turns_get_disjoint_positions(db):
+    repo = MongoConversationRepository(db, bucket_size=3)
+    await asyncio.gather(*(append(repo, "s1", f"p{i}", f"r{i}") for i in range(5)))
+
+    contents = [m.content for m in (await repo.get_by_id("s1")).messages]
+    assert sorted(contents) == sorted(f"{kind}{i}" for i in range(5) for kind in "pr")
+    # Cada turno reservó dos posiciones seguidas: pregunta y respuesta no se intercalan con otro turno
+    for i in range(5):
+        assert contents.index(f"r{i}") == contents.index(f"p{i}") + 1
+
+
+async def test_appends_continue_after_embedded_messages(db):
+    repo = MongoConversationRepository(db, bucket_size=2)
+    # Sesión guardada entera antes de existir los buckets: sus mensajes siguen en el documento
+    await repo.save(Conversation(id="s1", user_id="u1", messages=messages("a", "b", "c")))
+
+    await append(repo, "s1", "d", "e")
+    await append(repo, "s1", "f")
+
+    # Las posiciones siguen donde terminaban los mensajes embebidos
+    assert await buckets(db, "s1") == {1: [(3, "d")], 2: [(4, "e"), (5, "f")]}
+    conversation = await repo.get_by_id("s1")
+    assert [m.content for m in conversation.messages] == ["a", "b", "c", "d", "e", "f"]
+    assert await repo.get_counts("s1") == (6, 0)
+
+
+async def test_without_buckets_messages_stay_in_the_document(db):
+    repo = MongoConversationRepository(db, bucket_size=0)
+    await append(repo, "s1", "a", "b")
+    await append(repo, "s1", "c")
+
+    main = await db["conversations"].find_one({"_id": "s1"})
+    assert [m["content"] for m in main["messages"]] == ["a", "b", "c"] and main["message_count"] == 3
+    assert await db["conversation_messages"].count_documents({}) == 0
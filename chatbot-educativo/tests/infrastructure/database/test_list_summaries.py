@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.infrastructure.database.mongo.conversation_repository_impl import (
+    MongoConversationRepository, decode_cursor, encode_cursor
+)
+
+BASE = datetime(2026, 1, 1, 12, 0, 0)
+
+
+async def seed(db):
+    # c2, c3 y c4 comparten updated_at: el desempate es por _id descendente
+    updated = {"c0": 0, "c1": 1, "c2": 2, "c3": 2, "c4": 2, "c5": 5}
+    for conversation_id, minutes in updated.items():
+        await db["conversations"].insert_one({
+            "_id": conversation_id, "user_id": "u1", "title": conversation_id,
+            "created_at": BASE, "updated_at": BASE + timedelta(minutes=minutes),
+            "message_count": minutes, "messages": [],
+        })
+    # Otro alumno y una lectura asignada (sin updated_at) no aparecen
+    await db["conversations"].insert_one({"_id": "x", "user_id": "u2", "updated_at": BASE})
+    await db["conversations"].insert_one({"_id": "lectura", "user_id": "u1", "title": "Lectura"})
+
+
+async def all_pages(repo, limit):
+    pages, cursor = [], None
+    while True:
+        page, cursor = await repo.list_summaries("u1", limit=limit, cursor=cursor)
+        pages.append([item["id"] for item in page])
+        if cursor is None:
+            return pages
+
+
+async def test_pages_follow_updated_at_then_id(db):
+    await seed(db)
+    pages = await all_pages(MongoConversationRepository(db, bucket_size=0), limit=2)
+    assert pages == [["c5", "c4"], ["c3", "c2"], ["c1", "c0"]]
+
+
+async def test_last_page_has_no_cursor(db):
+    await seed(db)
+    repo = MongoConversationRepository(db, bucket_size=0)
+    page, cursor = await repo.list_summaries("u1", limit=10)
+    assert len(page) == 6 and cursor is None
+    assert page[0] == {"id": "c5", "title": "c5", "created_at": BASE, "updated_at": BASE + timedelta(minutes=5), "message_count": 5}
+
+
+async def test_new_activity_does_not_repeat_items(db):
+    await seed(db)
+    repo = MongoConversationRepository(db, bucket_size=0)
+    first, cursor = await repo.list_summaries("u1", limit=3)
+    # Una sesión ya listada recibe un mensaje: sube al principio, pero el cursor sigue donde iba
+    await db["conversations"].update_one({"_id": "c5"}, {"$set": {"updated_at": BASE + timedelta(hours=1)}})
+    second, _ = await repo.list_summaries("u1", limit=3, cursor=cursor)
+    assert [item["id"] for item in first] == ["c5", "c4", "c3"]
+    assert [item["id"] for item in second] == ["c2", "c1", "c0"]
+
+
+def test_cursor_round_trip_and_invalid_cursor():
+    assert decode_cursor(encode_cursor(BASE, "c3")) == (BASE, "c3")
+    with pytest.raises(ValueError):
+        decode_cursor("no-es-un-cursor")
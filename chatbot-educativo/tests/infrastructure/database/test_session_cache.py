@@ -0,0 +1,146 @@
+import asyncio
+
+import pytest
+
+from app.domain.entities.conversation import Conversation, Message
+from app.infrastructure.database.mongo.conversation_repository_impl import MongoConversationRepository
+from app.infrastructure.database.session_cache import CachedConversationRepository, SessionCache
+
+
+class FlakyRepository(MongoConversationRepository):
+    """Falla las primeras 'failures' escrituras en lote (Mongo caído un momento)."""
+
+    def __init__(self, db, failures: int = 0):
+        super().__init__(db, bucket_size=50)
+        self.failures = failures
+        self.batches = []
+
+    async def append_many(self, batch):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("Mongo no responde")
+        self.batches.append([(conversation.id, [m.content for m in messages]) for conversation, messages in batch])
+        await super().append_many(batch)
+
+
+def make_worker(inner, flush_interval=60, validate=False):
+    """Un proceso uvicorn: su propia caché sobre la misma base de datos."""
+    cache = SessionCache(lambda: inner, flush_interval=flush_interval, validate=validate)
+    return CachedConversationRepository(inner, cache)
+
+
+def turn(question: str):
+    return [Message(role="user", content=question), Message(role="model", content=f"re: {question}")]
+
+
+async def reply(repo, conversation_id: str, question: str):
+    conversation = await repo.get_by_id(conversation_id)
+    new_messages = turn(question)
+    conversation.messages.extend(new_messages)
+    await repo.append_messages(conversation, new_messages)
+
+
+async def stored_contents(inner, conversation_id: str):
+    return [m.content for m in (await inner.get_by_id(conversation_id)).messages]
+
+
+@pytest.fixture
+async def inner(db):
+    inner = FlakyRepository(db)
+    await inner.save(Conversation(id="s1", user_id="u1"))
+    return inner
+
+
+# --- ESCRITURA DIFERIDA ---
+async def test_turns_are_written_in_one_batch_on_flush(inner):
+    repo = make_worker(inner)
+    await reply(repo, "s1", "a")
+    await reply(repo, "s1", "b")
+
+    # Los turnos se sirven de memoria y aún no están en Mongo
+    assert await stored_contents(inner, "s1") == []
+    assert [m.content for m in (await repo.get_by_id("s1")).messages] == ["a", "re: a", "b", "re: b"]
+
+    await repo.cache.flush()
+
+    assert inner.batches == [[("s1", ["a", "re: a", "b", "re: b"])]]
+    assert await stored_contents(inner, "s1") == ["a", "re: a", "b", "re: b"]
+    assert repo.cache.stats()["flushed_messages"] == 4 and not repo.cache.has_pending()
+    await repo.cache.close()
+
+
+async def test_background_worker_flushes_within_the_interval(inner):
+    repo = make_worker(inner, flush_interval=0.01)
+    await reply(repo, "s1", "a")
+    await asyncio.sleep(0.05)
+    assert await stored_contents(inner, "s1") == ["a", "re: a"]
+    await repo.cache.close()
+
+
+async def test_close_flushes_what_is_pending(inner):
+    repo = make_worker(inner)
+    await reply(repo, "s1", "a")
+    await repo.cache.close()
+    assert await stored_contents(inner, "s1") == ["a", "re: a"]
+
+
+async def test_failed_flush_is_requeued_before_newer_turns(inner):
+    inner.failures = 1
+    repo = make_worker(inner)
+    await reply(repo, "s1", "a")
+
+    with pytest.raises(ConnectionError):
+        await repo.cache.flush()
+    assert repo.cache.has_pending("s1") and repo.cache.flush_errors == 1
+
+    await reply(repo, "s1", "b")
+    await repo.cache.flush()
+
+    assert await stored_contents(inner, "s1") == ["a", "re: a", "b", "re: b"]
+    assert not repo.cache.has_pending()
+    await repo.cache.close()
+
+
+# --- VARIOS WORKERS (validate=True) ---
+async def test_hit_is_reloaded_when_another_worker_wrote_the_session(inner):
+    first, second = make_worker(inner, validate=True), make_worker(inner, validate=True)
+    await reply(first, "s1", "a")
+    await first.cache.flush()
+
+    await reply(second, "s1", "b")
+    await second.cache.flush()
+
+    # La copia del primer worker tiene 2 mensajes y Mongo 4: se descarta y se recarga
+    conversation = await first.get_by_id("s1")
+    assert [m.content for m in conversation.messages] == ["a", "re: a", "b", "re: b"]
+    assert first.cache.stale == 1
+    await first.cache.close()
+    await second.cache.close()
+
+
+async def test_own_pending_turns_do_not_make_the_hit_stale(inner):
+    repo = make_worker(inner, validate=True)
+    await reply(repo, "s1", "a")
+    await reply(repo, "s1", "b")
+
+    # Mongo aún no tiene los 4 mensajes de la copia, pero están en la cola de este worker
+    assert await repo.get_by_id("s1") is not None
+    assert repo.cache.stale == 0 and repo.cache.has_pending("s1")
+    await repo.cache.close()
+
+
+async def test_stale_hit_flushes_own_pending_turns_first(inner):
+    first, second = make_worker(inner, validate=True), make_worker(inner, validate=True)
+    await reply(first, "s1", "a")
+    await first.cache.flush()
+    await reply(first, "s1", "c")
+    await reply(second, "s1", "b")
+    await second.cache.flush()
+
+    conversation = await first.get_by_id("s1")
+
+    # El turno pendiente del primer worker se guarda antes de recargar: no se pierde
+    assert [m.content for m in conversation.messages] == ["a", "re: a", "b", "re: b", "c", "re: c"]
+    assert first.cache.stale == 1 and not first.cache.has_pending()
+    await first.cache.close()
+    await second.cache.close()
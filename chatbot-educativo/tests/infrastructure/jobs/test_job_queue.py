@@ -0,0 +1,173 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.infrastructure.jobs.job_queue import DONE, FAILED, QUEUED, RUNNING, JobQueue, JobQueueDisabledError
+
+
+def make_queue(db, tmp_path, **kwargs) -> JobQueue:
+    # Sin start(): los trabajos quedan en Mongo y cada prueba los toma a mano
+    options = {"workers": 1, "max_attempts": 2, "lease_seconds": 30, "upload_dir": str(tmp_path)}
+    options.update(kwargs)
+    queue = JobQueue(lambda: db, **options)
+
+    async def echo(job, progress):
+        await progress("procesando", 50)
+        return {"echo": job["payload"]["value"]}
+
+    queue.register("echo", echo)
+    return queue
+
+
+# --- TOMA DE TRABAJOS ---
+async def test_only_one_worker_claims_a_job(db, tmp_path):
+    first, second = make_queue(db, tmp_path), make_queue(db, tmp_path)
+    job = await first.submit("echo", "u1", {"value": 1})
+
+    claims = await asyncio.gather(first._claim(job["_id"]), second._claim(job["_id"]))
+    winners = [claim for claim in claims if claim is not None]
+    assert len(winners) == 1
+    assert winners[0]["status"] == RUNNING and winners[0]["attempts"] == 1
+    assert winners[0]["worker_id"] in (first.worker_id, second.worker_id)
+    assert winners[0]["lease_until"] > datetime.utcnow()
+
+
+async def test_submitted_job_runs_to_done(db, tmp_path):
+    queue = make_queue(db, tmp_path, workers=1)
+    await queue.start()
+    try:
+        job = await queue.submit("echo", "u1", {"value": 7})
+        for _ in range(100):
+            stored = await queue.get(job["_id"], "u1")
+            if stored["status"] == DONE:
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        await queue.stop()
+    assert stored["status"] == DONE and stored["progress"] == 100
+    assert stored["result"] == {"echo": 7}
+
+
+async def test_idempotency_key_returns_existing_job(db, tmp_path):
+    queue = make_queue(db, tmp_path)
+    first = await queue.submit("echo", "u1", {"value": 1}, idempotency_key="abc")
+    again = await queue.submit("echo", "u1", {"value": 2}, idempotency_key="abc")
+    assert again["_id"] == first["_id"]
+    assert await db["jobs"].count_documents({}) == 1
+
+
+async def test_concurrent_submits_with_the_same_key_create_one_job(db, tmp_path):
+    queue = make_queue(db, tmp_path)
+    uploads = []
+    for name in ("a", "b"):
+        path = tmp_path / f"subida-{name}"
+        path.write_text("contenido")
+        uploads.append(str(path))
+
+    jobs = await asyncio.gather(*(
+        queue.submit("echo", "u1", {"value": 1}, upload_path=path, idempotency_key="abc") for path in uploads
+    ))
+
+    assert jobs[0]["_id"] == jobs[1]["_id"]
+    assert await db["jobs"].count_documents({}) == 1
+    # Los dos temporales se movieron; el del envío repetido se borra y queda solo el del trabajo
+    assert [p.name for p in tmp_path.iterdir()] == [jobs[0]["_id"]]
+    assert await queue.submit("echo", "u2", {"value": 1}, idempotency_key="abc")  # otro usuario, otro trabajo
+
+
+async def test_submit_is_refused_without_workers(db, tmp_path):
+    queue = make_queue(db, tmp_path, workers=0)
+    with pytest.raises(JobQueueDisabledError):
+        await queue.submit("echo", "u1", {"value": 1})
+    assert await db["jobs"].count_documents({}) == 0
+
+
+# --- REANUDACIÓN ---
+async def insert_running(db, job_id, attempts, lease_until=None):
+    job = {"_id": job_id, "kind": "echo", "user_id": "u1", "status": RUNNING, "payload": {"value": 1},
+           "attempts": attempts, "created_at": datetime.utcnow()}
+    if lease_until is not None:
+        job["lease_until"] = lease_until
+    await db["jobs"].insert_one(job)
+
+
+async def test_resume_reclaims_only_expired_leases(db, tmp_path):
+    now = datetime.utcnow()
+    await insert_running(db, "vivo", 1, now + timedelta(seconds=20))
+    await insert_running(db, "vencido", 1, now - timedelta(seconds=1))
+    await insert_running(db, "sin_lease", 1)
+    queue = make_queue(db, tmp_path)
+    queue._queue = asyncio.Queue()
+
+    await queue.resume()
+
+    statuses = {doc["_id"]: doc["status"] for doc in await db["jobs"].find({}).to_list(None)}
+    assert statuses == {"vivo": RUNNING, "vencido": QUEUED, "sin_lease": QUEUED}
+    assert sorted([queue._queue.get_nowait() for _ in range(queue._queue.qsize())]) == ["sin_lease", "vencido"]
+
+
+async def test_resume_fails_jobs_that_used_all_attempts(db, tmp_path):
+    await insert_running(db, "agotado", 2, datetime.utcnow() - timedelta(seconds=1))
+    queue = make_queue(db, tmp_path)
+    queue._queue = asyncio.Queue()
+
+    await queue.resume()
+
+    job = await db["jobs"].find_one({"_id": "agotado"})
+    assert job["status"] == FAILED and job["error"]
+    assert "expires_at" in job
+    assert queue._queue.empty()
+
+
+async def test_heartbeat_extends_the_lease(db, tmp_path):
+    queue = make_queue(db, tmp_path, lease_seconds=0.3)
+    job = await queue.submit("echo", "u1", {"value": 1})
+    claimed = await queue._claim(job["_id"])
+
+    heartbeat = asyncio.create_task(queue._heartbeat(claimed))
+    await asyncio.sleep(0.25)
+    heartbeat.cancel()
+
+    renewed = await db["jobs"].find_one({"_id": job["_id"]})
+    assert renewed["lease_until"] > claimed["lease_until"]
+
+
+async def test_lost_lease_cancels_the_job_without_writing(db, tmp_path):
+    queue = make_queue(db, tmp_path, lease_seconds=0.15)
+    cancelled = asyncio.Event()
+
+    async def slow(job, progress):
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        return {"ok": True}
+
+    queue.register("slow", slow)
+    job = await queue.submit("slow", "u1", {})
+    run = asyncio.create_task(queue._run_job(job["_id"]))
+    await asyncio.sleep(0.01)
+    # Otro proceso lo retoma (reaper) y lo vuelve a tomar: el lease ya no es de esta toma
+    await db["jobs"].update_one({"_id": job["_id"]}, {"$set": {"worker_id": "otro-worker"}})
+
+    await asyncio.wait_for(run, 1)
+
+    assert cancelled.is_set()
+    stored = await db["jobs"].find_one({"_id": job["_id"]})
+    assert stored["status"] == RUNNING and stored["worker_id"] == "otro-worker"
+    assert queue.completed == 0 and queue.failed == 0
+
+
+async def test_finish_after_losing_the_lease_is_not_saved(db, tmp_path):
+    queue = make_queue(db, tmp_path)
+    job = await queue.submit("echo", "u1", {"value": 1})
+    claimed = await queue._claim(job["_id"])
+    await db["jobs"].update_one({"_id": job["_id"]}, {"$set": {"worker_id": "otro-worker"}})
+
+    await queue._finish(claimed, DONE, result={"echo": 1}, owned=True)
+
+    stored = await db["jobs"].find_one({"_id": job["_id"]})
+    assert stored["status"] == RUNNING and stored["result"] is None
+    assert queue.completed == 0
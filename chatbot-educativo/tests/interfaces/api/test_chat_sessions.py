@@ -0,0 +1,98 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.domain.entities.conversation import Conversation, Message
+from app.domain.entities.user import User
+from app.domain.repositories.conversation_repository import ConversationRepository
+from app.infrastructure.ai.gemini_client import GeminiClient
+from app.infrastructure.ai.providers.fake_provider import FakeProvider
+from app.infrastructure.security.jwt_handler import JWTHandler
+from app.interfaces.api import dependencies
+from app.main import app
+
+
+class UserRepository:
+    async def get_by_email(self, email: str):
+        return User(_id=email, email=email, hashed_password="x")
+
+
+class MemoryConversationRepository(ConversationRepository):
+    def __init__(self):
+        self.items = {}
+        self.reads = 0
+
+    async def save(self, conversation):
+        self.items[conversation.id] = conversation.model_copy(update={"messages": list(conversation.messages)})
+
+    async def get_by_id(self, id):
+        self.reads += 1
+        stored = self.items.get(id)
+        return stored.model_copy(update={"messages": list(stored.messages)}) if stored else None
+
+    async def get_all_by_user(self, user_id):
+        return [c for c in self.items.values() if c.user_id == user_id]
+
+    async def list_summaries(self, user_id, limit=50, cursor=None):
+        return [], None
+
+
+@pytest.fixture
+def repo():
+    repo = MemoryConversationRepository()
+    repo.items["ajena"] = Conversation(id="ajena", user_id="otro@test", messages=[Message(role="user", content="secreto")])
+    client = GeminiClient(FakeProvider(latency_ms=0, stream_chunk_ms=0))
+    app.dependency_overrides[dependencies.get_conversation_repository] = lambda: repo
+    app.dependency_overrides[dependencies.get_user_repository] = lambda: UserRepository()
+    app.dependency_overrides[dependencies.get_gemini_client] = lambda: client
+    yield repo
+    app.dependency_overrides.clear()
+
+
+def ask(ws, message: str, session_id: str = None) -> dict:
+    ws.send_json({"message": message, "session_id": session_id})
+    while True:
+        event = ws.receive_json()
+        if event["type"] in ("done", "error"):
+            return event
+
+
+def test_websocket_binds_the_session_once(repo):
+    token = JWTHandler().create_token("alumno@test")
+    with TestClient(app).websocket_connect(f"/api/chat/ws?token={token}") as ws:
+        assert ws.receive_json()["type"] == "ready"
+        first = ask(ws, "hola")
+        second = ask(ws, "¿y después?")
+
+    assert first["type"] == "done" and second["session_id"] == first["session_id"]
+    # Sesión nueva: ninguna lectura; el segundo turno usa la de la conexión
+    assert repo.reads == 0
+    assert [m.role for m in repo.items[first["session_id"]].messages] == ["user", "model", "user", "model"]
+
+
+def test_websocket_rejects_a_session_of_another_user(repo):
+    token = JWTHandler().create_token("alumno@test")
+    with TestClient(app).websocket_connect(f"/api/chat/ws?token={token}") as ws:
+        ws.receive_json()
+        own = ask(ws, "hola")
+        rejected = ask(ws, "dime lo que hay aquí", session_id="ajena")
+        after = ask(ws, "sigo aquí")
+
+    assert rejected == {"type": "error", "detail": "No tienes permiso para usar este chat", "status": 403}
+    assert after["session_id"] == own["session_id"]
+    assert [m.content for m in repo.items["ajena"].messages] == ["secreto"]
+
+
+def test_http_send_rejects_a_session_of_another_user(repo):
+    token = JWTHandler().create_token("alumno@test")
+    response = TestClient(app).post(
+        "/api/chat/send", json={"message": "hola", "session_id": "ajena"}, headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 403
+    assert [m.content for m in repo.items["ajena"].messages] == ["secreto"]
+
+
+def test_history_limit_is_optional_but_positive(repo):
+    headers = {"Authorization": f"Bearer {JWTHandler().create_token('alumno@test')}"}
+    client = TestClient(app)
+    assert client.get("/api/chat/history", headers=headers).status_code == 200
+    assert client.get("/api/chat/history?limit=0", headers=headers).status_code == 422
@@ -0,0 +1,47 @@
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+
+from app.infrastructure.metrics import current_route
+from app.interfaces.api.middleware import UNMATCHED_ROUTE, RouteContextMiddleware
+
+router = APIRouter()
+
+
+@router.get("/items/{item_id}")
+async def get_item(item_id: str):
+    return {"route": current_route.get()}
+
+
+@router.post("/items")
+async def create_item():
+    return {"route": current_route.get()}
+
+
+def make_app():
+    app = FastAPI()
+    app.add_middleware(RouteContextMiddleware)
+    app.include_router(router, prefix="/api/tienda")
+
+    @app.get("/salud")
+    async def health():
+        return {"route": current_route.get()}
+
+    return app
+
+
+def test_label_is_the_template_with_the_router_prefix():
+    client = TestClient(make_app())
+    assert client.get("/api/tienda/items/42").json() == {"route": "/api/tienda/items/{item_id}"}
+    assert client.post("/api/tienda/items").json() == {"route": "/api/tienda/items"}
+    assert client.get("/salud").json() == {"route": "/salud"}
+
+
+def test_unknown_paths_are_labelled_other():
+    app = make_app()
+    assert RouteContextMiddleware(app)._route_template({"type": "http", "path": "/wp-admin/123", "method": "GET", "app": app}) == UNMATCHED_ROUTE
+
+
+def test_wrong_method_keeps_the_route_template():
+    app = make_app()
+    scope = {"type": "http", "path": "/api/tienda/items", "method": "GET", "app": app}
+    assert RouteContextMiddleware(app)._route_template(scope) == "/api/tienda/items"